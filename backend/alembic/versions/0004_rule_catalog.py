@@ -0,0 +1,114 @@
+"""move rule text into a versioned rulecatalog table
+
+Revision ID: 0004_rule_catalog
+Revises: 0003_host_ssh_config_columns
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_rule_catalog"
+down_revision = "0003_host_ssh_config_columns"
+branch_labels = None
+depends_on = None
+
+# Rows written before the catalog existed carry no content version.
+LEGACY_VERSION = "legacy"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rulecatalog",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content_version", sa.String(), nullable=False),
+        sa.Column("rule_id", sa.String(), nullable=False),
+        sa.Column("severity", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("rationale", sa.Text(), nullable=False),
+        sa.Column("fixtext", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("content_version", "rule_id"),
+    )
+    op.add_column(
+        "scanresult",
+        sa.Column("content_version", sa.String(), server_default="", nullable=False),
+    )
+    op.add_column(
+        "scanruleresult",
+        sa.Column("rule_catalog_id", sa.Integer(), nullable=True),
+    )
+
+    # Backfill: one catalog entry per legacy rule, using its most recent text.
+    op.execute(
+        sa.text(
+            """
+            INSERT INTO rulecatalog
+                (content_version, rule_id, severity, title, description,
+                 rationale, fixtext, created_at)
+            SELECT :version, s.rule_id, s.severity, COALESCE(s.title, ''),
+                   COALESCE(s.description, ''), COALESCE(s.rationale, ''),
+                   COALESCE(s.fixtext, ''), CURRENT_TIMESTAMP
+            FROM scanruleresult s
+            WHERE s.id IN (
+                SELECT MAX(id) FROM scanruleresult GROUP BY rule_id
+            )
+            """
+        ).bindparams(version=LEGACY_VERSION)
+    )
+    op.execute(
+        sa.text(
+            """
+            UPDATE scanruleresult SET rule_catalog_id = (
+                SELECT c.id FROM rulecatalog c
+                WHERE c.content_version = :version
+                  AND c.rule_id = scanruleresult.rule_id
+            )
+            """
+        ).bindparams(version=LEGACY_VERSION)
+    )
+    op.execute(
+        sa.text("UPDATE scanresult SET content_version = :version").bindparams(
+            version=LEGACY_VERSION
+        )
+    )
+
+    with op.batch_alter_table("scanruleresult") as batch_op:
+        batch_op.create_foreign_key(
+            "fk_scanruleresult_rule_catalog_id",
+            "rulecatalog",
+            ["rule_catalog_id"],
+            ["id"],
+        )
+        batch_op.drop_column("fixtext")
+        batch_op.drop_column("rationale")
+        batch_op.drop_column("description")
+        batch_op.drop_column("title")
+        batch_op.drop_column("rule_id")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("scanruleresult") as batch_op:
+        batch_op.add_column(sa.Column("rule_id", sa.String(), server_default="", nullable=False))
+        batch_op.add_column(sa.Column("title", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("description", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("rationale", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("fixtext", sa.Text(), nullable=True))
+
+    for column in ("rule_id", "title", "description", "rationale", "fixtext"):
+        op.execute(
+            f"""
+            UPDATE scanruleresult SET {column} = (
+                SELECT c.{column} FROM rulecatalog c
+                WHERE c.id = scanruleresult.rule_catalog_id
+            )
+            WHERE rule_catalog_id IS NOT NULL
+            """
+        )
+
+    with op.batch_alter_table("scanruleresult") as batch_op:
+        batch_op.drop_constraint("fk_scanruleresult_rule_catalog_id", type_="foreignkey")
+        batch_op.drop_column("rule_catalog_id")
+    op.drop_column("scanresult", "content_version")
+    op.drop_table("rulecatalog")
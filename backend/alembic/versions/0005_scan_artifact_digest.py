@@ -0,0 +1,25 @@
+"""add artifact_digest to scanresult
+
+Revision ID: 0005_scan_artifact_digest
+Revises: 0004_rule_catalog
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_scan_artifact_digest"
+down_revision = "0004_rule_catalog"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "scanresult",
+        sa.Column("artifact_digest", sa.String(), server_default="", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("scanresult", "artifact_digest")
@@ -0,0 +1,44 @@
+"""add audittask queue table for distributed audit workers
+
+Revision ID: 0006_audit_task_queue
+Revises: 0005_scan_artifact_digest
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_audit_task_queue"
+down_revision = "0005_scan_artifact_digest"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "audittask",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("audit_job_id", sa.Integer(), sa.ForeignKey("auditjob.id"), nullable=False),
+        sa.Column("host", sa.String(), nullable=False),
+        sa.Column("distro", sa.String(), nullable=False),
+        sa.Column("profile_name", sa.String(), nullable=False),
+        sa.Column("profile_path", sa.String(), nullable=False),
+        sa.Column("reaudit", sa.Boolean(), nullable=False),
+        sa.Column("rule_ids", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("worker_id", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("claimed_at", sa.DateTime(), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_audittask_audit_job_id", "audittask", ["audit_job_id"])
+    op.create_index("ix_audittask_status", "audittask", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_audittask_status", table_name="audittask")
+    op.drop_index("ix_audittask_audit_job_id", table_name="audittask")
+    op.drop_table("audittask")
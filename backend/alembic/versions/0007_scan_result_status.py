@@ -0,0 +1,31 @@
+"""add per-host status and error to scanresult
+
+Revision ID: 0007_scan_result_status
+Revises: 0006_audit_task_queue
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_scan_result_status"
+down_revision = "0006_audit_task_queue"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "scanresult",
+        sa.Column("status", sa.String(), server_default="completed", nullable=False),
+    )
+    op.add_column(
+        "scanresult",
+        sa.Column("error", sa.Text(), server_default="", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("scanresult") as batch_op:
+        batch_op.drop_column("error")
+        batch_op.drop_column("status")
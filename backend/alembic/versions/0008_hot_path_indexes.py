@@ -0,0 +1,46 @@
+"""index the export, dashboard and host lookup query paths
+
+Revision ID: 0008_hot_path_indexes
+Revises: 0007_scan_result_status
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_hot_path_indexes"
+down_revision = "0007_scan_result_status"
+branch_labels = None
+depends_on = None
+
+FAILED = sa.text("status = 'fail'")
+
+# (name, table, columns, extra keyword arguments)
+INDEXES = [
+    ("ix_scanruleresult_scan_result_id", "scanruleresult", ["scan_result_id"], {}),
+    (
+        "ix_scanruleresult_fail_severity",
+        "scanruleresult",
+        ["severity", "rule_catalog_id"],
+        {"postgresql_where": FAILED, "sqlite_where": FAILED},
+    ),
+    ("ix_scanresult_audit_job_id", "scanresult", ["audit_job_id"], {}),
+    ("ix_scanresult_host_id_created_at", "scanresult", ["host_id", "created_at"], {}),
+    ("ix_host_hostname", "host", ["hostname"], {}),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY on PostgreSQL so that ingest is not blocked while large
+    # tables are indexed; it cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name, table, columns, postgresql_concurrently=True, **kwargs
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
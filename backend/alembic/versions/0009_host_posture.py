@@ -0,0 +1,92 @@
+"""add hostlatestscan and hostruleposture, backfilled from scan history
+
+Revision ID: 0009_host_posture
+Revises: 0008_hot_path_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_host_posture"
+down_revision = "0008_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "hostlatestscan",
+        sa.Column("host_id", sa.Integer(), sa.ForeignKey("host.id"), primary_key=True),
+        sa.Column("scan_result_id", sa.Integer(), sa.ForeignKey("scanresult.id"), nullable=False),
+        sa.Column("audit_job_id", sa.Integer(), sa.ForeignKey("auditjob.id"), nullable=True),
+        sa.Column("distro", sa.String(), nullable=False),
+        sa.Column("profile_name", sa.String(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("passed", sa.Integer(), nullable=False),
+        sa.Column("failed", sa.Integer(), nullable=False),
+        sa.Column("other", sa.Integer(), nullable=False),
+        sa.Column("scanned_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "hostruleposture",
+        sa.Column("host_id", sa.Integer(), sa.ForeignKey("host.id"), primary_key=True),
+        sa.Column("rule_id", sa.String(), primary_key=True),
+        sa.Column("rule_catalog_id", sa.Integer(), sa.ForeignKey("rulecatalog.id"), nullable=True),
+        sa.Column("scan_result_id", sa.Integer(), sa.ForeignKey("scanresult.id"), nullable=False),
+        sa.Column("severity", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("scanned_at", sa.DateTime(), nullable=False),
+    )
+    failed = sa.text("status = 'fail'")
+    op.create_index(
+        "ix_hostruleposture_fail_severity",
+        "hostruleposture",
+        ["severity", "rule_id"],
+        postgresql_where=failed,
+        sqlite_where=failed,
+    )
+
+    # Backfill: each host's latest completed scan ...
+    op.execute(
+        """
+        INSERT INTO hostlatestscan
+            (host_id, scan_result_id, audit_job_id, distro, profile_name,
+             score, passed, failed, other, scanned_at)
+        SELECT host_id, id, audit_job_id, distro, profile_name,
+               score, passed, failed, other, created_at
+        FROM scanresult
+        WHERE id IN (
+            SELECT MAX(id) FROM scanresult
+            WHERE status = 'completed' AND host_id IS NOT NULL
+            GROUP BY host_id
+        )
+        """
+    )
+    # ... and the newest result of every rule on every host
+    op.execute(
+        """
+        INSERT INTO hostruleposture
+            (host_id, rule_id, rule_catalog_id, scan_result_id, severity,
+             status, scanned_at)
+        SELECT s.host_id, c.rule_id, r.rule_catalog_id, r.scan_result_id,
+               r.severity, r.status, s.created_at
+        FROM scanruleresult r
+        JOIN scanresult s ON s.id = r.scan_result_id
+        JOIN rulecatalog c ON c.id = r.rule_catalog_id
+        WHERE r.id IN (
+            SELECT MAX(r2.id)
+            FROM scanruleresult r2
+            JOIN scanresult s2 ON s2.id = r2.scan_result_id
+            JOIN rulecatalog c2 ON c2.id = r2.rule_catalog_id
+            WHERE s2.status = 'completed' AND s2.host_id IS NOT NULL
+            GROUP BY s2.host_id, c2.rule_id
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_hostruleposture_fail_severity", table_name="hostruleposture")
+    op.drop_table("hostruleposture")
+    op.drop_table("hostlatestscan")
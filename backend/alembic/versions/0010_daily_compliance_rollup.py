@@ -0,0 +1,54 @@
+"""add host groups and the dailycompliancerollup table
+
+Revision ID: 0010_daily_compliance_rollup
+Revises: 0009_host_posture
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_daily_compliance_rollup"
+down_revision = "0009_host_posture"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "host",
+        sa.Column("host_group", sa.String(), server_default="", nullable=False),
+    )
+    op.create_table(
+        "dailycompliancerollup",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("distro", sa.String(), primary_key=True),
+        sa.Column("profile_name", sa.String(), primary_key=True),
+        sa.Column("host_group", sa.String(), primary_key=True),
+        sa.Column("scans", sa.Integer(), nullable=False),
+        sa.Column("score_sum", sa.Float(), nullable=False),
+        sa.Column("passed", sa.Integer(), nullable=False),
+        sa.Column("failed", sa.Integer(), nullable=False),
+        sa.Column("other", sa.Integer(), nullable=False),
+    )
+
+    # Backfill from the completed scans so far (same as ``python -m
+    # services.rollups``); every existing host is in the default group.
+    op.execute(
+        """
+        INSERT INTO dailycompliancerollup
+            (day, distro, profile_name, host_group, scans, score_sum,
+             passed, failed, other)
+        SELECT DATE(created_at), distro, profile_name, '', COUNT(*),
+               SUM(score), SUM(passed), SUM(failed), SUM(other)
+        FROM scanresult
+        WHERE status = 'completed'
+        GROUP BY DATE(created_at), distro, profile_name
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("dailycompliancerollup")
+    with op.batch_alter_table("host") as batch_op:
+        batch_op.drop_column("host_group")
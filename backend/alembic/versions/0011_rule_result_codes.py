@@ -0,0 +1,97 @@
+"""store per-rule severity and status as normalized smallint codes
+
+Revision ID: 0011_rule_result_codes
+Revises: 0010_daily_compliance_rollup
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_rule_result_codes"
+down_revision = "0010_daily_compliance_rollup"
+branch_labels = None
+depends_on = None
+
+# Frozen copies of ``models.types``; codes must never change once stored
+SEVERITY_CODES = {"unknown": 0, "low": 1, "medium": 2, "high": 3}
+SEVERITY_ALIASES = {
+    "critical": "high",
+    "cat1": "high",
+    "cat2": "medium",
+    "cat3": "low",
+    "info": "low",
+}
+STATUS_CODES = {
+    "unknown": 0,
+    "pass": 1,
+    "fail": 2,
+    "error": 3,
+    "notapplicable": 4,
+    "notchecked": 5,
+    "notselected": 6,
+    "informational": 7,
+    "fixed": 8,
+}
+TABLES = {
+    "scanruleresult": ("ix_scanruleresult_fail_severity", ["severity", "rule_catalog_id"]),
+    "hostruleposture": ("ix_hostruleposture_fail_severity", ["severity", "rule_id"]),
+}
+
+
+def _to_code(column: str, mapping: dict) -> str:
+    cases = " ".join(f"WHEN '{label}' THEN '{code}'" for label, code in mapping.items())
+    return f"CASE LOWER(TRIM({column})) {cases} ELSE '0' END"
+
+
+def _to_label(column: str, codes: dict) -> str:
+    cases = " ".join(f"WHEN '{code}' THEN '{label}'" for label, code in codes.items())
+    return f"CASE {column} {cases} ELSE 'unknown' END"
+
+
+def _fail_index(table: str, predicate: str) -> None:
+    name, columns = TABLES[table]
+    where = sa.text(predicate)
+    op.create_index(name, table, columns, postgresql_where=where, sqlite_where=where)
+
+
+def upgrade() -> None:
+    severities = dict(SEVERITY_CODES)
+    severities.update(
+        (alias, SEVERITY_CODES[label]) for alias, label in SEVERITY_ALIASES.items()
+    )
+    for table, (index, _) in TABLES.items():
+        op.drop_index(index, table_name=table)
+        op.execute(
+            f"UPDATE {table} SET severity = {_to_code('severity', severities)}, "
+            f"status = {_to_code('status', STATUS_CODES)}"
+        )
+        with op.batch_alter_table(table) as batch_op:
+            for column in ("severity", "status"):
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.String(),
+                    type_=sa.SmallInteger(),
+                    existing_nullable=False,
+                    postgresql_using=f"{column}::smallint",
+                )
+        _fail_index(table, f"status = {STATUS_CODES['fail']}")
+
+
+def downgrade() -> None:
+    for table, (index, _) in TABLES.items():
+        op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            for column in ("severity", "status"):
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.SmallInteger(),
+                    type_=sa.String(),
+                    existing_nullable=False,
+                    postgresql_using=f"{column}::varchar",
+                )
+        op.execute(
+            f"UPDATE {table} SET severity = {_to_label('severity', SEVERITY_CODES)}, "
+            f"status = {_to_label('status', STATUS_CODES)}"
+        )
+        _fail_index(table, "status = 'fail'")
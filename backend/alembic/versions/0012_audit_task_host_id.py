@@ -0,0 +1,38 @@
+"""record the host id on audittask rows
+
+Revision ID: 0012_audit_task_host_id
+Revises: 0011_rule_result_codes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012_audit_task_host_id"
+down_revision = "0011_rule_result_codes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("audittask") as batch_op:
+        batch_op.add_column(sa.Column("host_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_audittask_host_id", "host", ["host_id"], ["id"])
+
+    # Resolve existing tasks the way enqueueing does: hostname first, then
+    # alias, then IP address
+    op.execute(
+        """
+        UPDATE audittask SET host_id = COALESCE(
+            (SELECT MIN(id) FROM host WHERE host.hostname = audittask.host),
+            (SELECT MIN(id) FROM host WHERE host.alias = audittask.host),
+            (SELECT MIN(id) FROM host WHERE host.ip_address = audittask.host)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("audittask") as batch_op:
+        batch_op.drop_constraint("fk_audittask_host_id", type_="foreignkey")
+        batch_op.drop_column("host_id")
@@ -0,0 +1,26 @@
+"""count straggler retries on audittask rows
+
+Revision ID: 0013_audit_task_retries
+Revises: 0012_audit_task_host_id
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013_audit_task_retries"
+down_revision = "0012_audit_task_host_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("audittask") as batch_op:
+        batch_op.add_column(
+            sa.Column("retries", sa.Integer(), server_default="0", nullable=False)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("audittask") as batch_op:
+        batch_op.drop_column("retries")
@@ -0,0 +1,109 @@
+"""Benchmark: streaming XCCDF result parser vs. the legacy DOM parser.
+
+Generates a synthetic results file shaped like ``oscap xccdf eval --results``
+output (benchmark rules, OVAL check references and a TestResult block) and
+compares wall time and peak RSS for both parsers.  The streaming parser is
+``iter_rule_result_rows``, which the audit parse stage runs over every stored
+artifact.  Each parser runs in its own child process so that lxml's native
+allocations are accounted for.
+
+Usage::
+
+    python backend/benchmarks/bench_xccdf_parse.py --rules 2000
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from xml.etree import ElementTree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.xccdf import iter_rule_result_rows  # noqa: E402
+
+
+_NS = "http://checklists.nist.gov/xccdf/1.2"
+
+
+def _write_results_file(path: Path, rule_count: int) -> None:
+    statuses = ["pass", "fail", "notapplicable", "pass"]
+    with path.open("w") as fh:
+        fh.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<Benchmark xmlns="{_NS}">\n')
+        for idx in range(rule_count):
+            fh.write(
+                f'<Rule id="xccdf_rule_{idx}" severity="medium">'
+                f"<title>Rule {idx}</title>"
+                f"<description>{'Lorem ipsum dolor sit amet. ' * 40}</description>"
+                f"<check system=\"urn:oval\"><check-content-ref name=\"oval:{idx}\"/>"
+                f"</check></Rule>\n"
+            )
+        fh.write('<TestResult id="xccdf_result">\n')
+        for idx in range(rule_count):
+            fh.write(
+                f'<rule-result idref="xccdf_rule_{idx}" severity="medium">'
+                f"<result>{statuses[idx % len(statuses)]}</result>"
+                f"<ident system=\"cce\">CCE-{idx}</ident>"
+                f"<check system=\"urn:oval\"><check-content-ref name=\"oval:{idx}\"/>"
+                f"</check></rule-result>\n"
+            )
+        fh.write("</TestResult>\n</Benchmark>\n")
+
+
+def _legacy_parse(path: Path) -> int:
+    root = ElementTree.parse(path).getroot()
+    namespace = {"xccdf": root.tag.split("}")[0].strip("{")}
+    count = 0
+    for rule_result in root.findall(".//{*}rule-result"):
+        rule_result.attrib.get("idref", "")
+        rule_result.findtext("xccdf:result", default="unknown", namespaces=namespace)
+        count += 1
+    return count
+
+
+def _streaming_parse(path: Path) -> int:
+    return sum(1 for _ in iter_rule_result_rows(path))
+
+
+_PARSERS = {"legacy": _legacy_parse, "streaming": _streaming_parse}
+
+
+def _run_single(name: str, path: Path) -> None:
+    started = time.perf_counter()
+    count = _PARSERS[name](path)
+    elapsed = time.perf_counter() - started
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"{name:<10} rules={count:<7} time={elapsed * 1000:8.1f} ms "
+        f"peak_rss={peak_kib / 1024:7.1f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=2000)
+    parser.add_argument("--parser", choices=sorted(_PARSERS), help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parser:
+        _run_single(args.parser, Path(args.path))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "results.xml"
+        _write_results_file(path, args.rules)
+        size_mib = path.stat().st_size / 1024 / 1024
+        print(f"results file: {size_mib:.1f} MiB, {args.rules} rules")
+        for name in ("legacy", "streaming"):
+            subprocess.run(
+                [sys.executable, __file__, "--parser", name, "--path", str(path)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,35 @@ class Settings(BaseSettings):
     github_token: str = ""
     ssh_key_path: str = ""
     ssh_user: str = "root"
+    ssh_connect_timeout: int = 10
+    ssh_control_dir: str = ""  # default: <tmp>/streamguard-ssh
+    ssh_pool_idle_seconds: int = 300
+    remote_scan_driver: str = "cached"  # cached / oscap-ssh
+    remote_cache_dir: str = ".cache/streamguard"  # relative to the remote home
+    remote_cache_retention_days: int = 30  # 0 = never prune
     max_concurrent_hosts: int = 10
+    max_hosts_per_proxy: int = 5  # 0 = only the global limit applies
+    max_hosts_per_subnet: int = 0
+    scheduler_subnet_prefix: int = 24
+    scheduler_latency_threshold: float = 60.0  # seconds to first rule result
+    rule_metadata_cache_size: int = 4
+    ingest_batch_size: int = 1000
+    export_batch_size: int = 5000  # rows fetched per round trip when exporting
+    audit_parse_workers: int = 0  # 0 = one per CPU
+    audit_db_writers: int = 1
+    audit_host_timeout: int = 3600  # seconds per host scan, 0 = no limit
+    audit_job_timeout: int = 0  # seconds per audit job, 0 = no limit
+    audit_straggler_retries: int = 0  # re-runs of timed-out/unreachable hosts
+    audit_progress_interval: float = 0.5
+    audit_dispatch: str = "local"  # local (API process) / queue (services.worker)
+    worker_concurrency: int = 0  # hosts per worker process, 0 = MAX_CONCURRENT_HOSTS
+    worker_poll_interval: float = 2.0
+    worker_heartbeat_timeout: int = 120  # requeue tasks of workers silent this long
+    worker_max_attempts: int = 3
+    artifacts_dir: str = ""  # default: backend/scan_results
+    artifact_compression: str = "auto"  # auto (zstd if installed) / zstd / gzip
+    artifact_retention_days: int = 30  # 0 = keep forever
+    artifact_gc_interval_hours: float = 6.0
     ansible_inventory: str = ""
     base_iso_urls: str = ""
     cors_origins: str = "*"
@@ -1,10 +1,16 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from core.config import settings
 from db import init_db
+from services.artifacts import run_artifact_gc
+from services.jobs import executor
+from services.pipeline import shutdown_pipeline
+from services.ssh_pool import run_ssh_pool_maintenance, ssh_pool
 from services.ssh_discovery import sync_known_hosts_to_db
+from services.task_queue import run_task_monitor
 from routers.audit import router as audit_router
 from routers.cac import router as cac_router
 from routers.dashboard import router as dashboard_router
@@ -14,6 +20,11 @@ from routers.iso import router as iso_router
 from routers.profiles import router as profiles_router
 from routers.ws import router as ws_router
 
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # optional dependency
+    BrotliMiddleware = None
+
 
 app = FastAPI(title="StreamGuard API", version="0.1.0")
 
@@ -25,6 +36,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Large JSON bodies (audit results, exports) compress 10-20x; brotli is used
+# when ``brotli-asgi`` is installed and the client accepts it
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
@@ -45,6 +63,21 @@ def on_startup():
     sync_known_hosts_to_db()
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    executor.submit("artifact-gc", run_artifact_gc())
+    executor.submit("ssh-pool-maintenance", run_ssh_pool_maintenance())
+    if settings.audit_dispatch == "queue":
+        executor.submit("audit-task-monitor", run_task_monitor())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await executor.shutdown()
+    await ssh_pool.close_all()
+    shutdown_pipeline()
+
+
 app.include_router(cac_router, prefix="/api/cac")
 app.include_router(audit_router, prefix="/api")
 app.include_router(mitigate_router, prefix="/api")
@@ -1,13 +1,21 @@
 from models.host import Host
-from models.job import AuditJob, MitigationJob
+from models.job import AuditJob, AuditTask, MitigationJob
+from models.posture import HostLatestScan, HostRulePosture
 from models.profile import Profile
+from models.rollup import DailyComplianceRollup
+from models.rule_catalog import RuleCatalog
 from models.scan import ScanResult, ScanRuleResult
 
 __all__ = [
     "Host",
     "AuditJob",
+    "AuditTask",
+    "DailyComplianceRollup",
+    "HostLatestScan",
+    "HostRulePosture",
     "MitigationJob",
     "Profile",
+    "RuleCatalog",
     "ScanResult",
     "ScanRuleResult",
 ]
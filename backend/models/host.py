@@ -7,11 +7,12 @@ from sqlmodel import Field, SQLModel
 class Host(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     alias: str = ""            # Host directive (short name)
-    hostname: str              # HostName (resolved address)
+    hostname: str = Field(index=True)  # HostName (resolved address)
     ssh_user: str = "root"     # User
     port: int = 22             # Port
     identity_file: str = ""    # IdentityFile
     proxy_jump: str = ""       # ProxyJump
+    host_group: str = ""       # free-form grouping for dashboard breakdowns
     # Legacy / extra fields (kept for migration compat)
     ip_address: str = ""
     os_distro: str = ""
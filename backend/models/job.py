@@ -6,7 +6,8 @@ from sqlmodel import Field, SQLModel
 
 class AuditJob(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    status: str = "pending"
+    # queued → running → completed / partial (some hosts not scanned) / failed / cancelled
+    status: str = "queued"
     distro: str
     profile_name: str
     host_count: int = 0
@@ -14,6 +15,29 @@ class AuditJob(SQLModel, table=True):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class AuditTask(SQLModel, table=True):
+    """One host of a queued audit job, claimed by ``services.worker``."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    audit_job_id: int = Field(foreign_key="auditjob.id", index=True)
+    host: str
+    host_id: Optional[int] = Field(default=None, foreign_key="host.id")  # the Host ``host`` names
+    distro: str
+    profile_name: str
+    profile_path: str
+    reaudit: bool = False
+    rule_ids: str = ""         # newline-separated, re-audit only
+    status: str = Field(default="queued", index=True)  # queued → running → completed / failed / cancelled
+    worker_id: str = ""
+    attempts: int = 0
+    retries: int = 0           # straggler rounds the host was requeued for
+    error: str = ""
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class MitigationJob(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     status: str = "pending"
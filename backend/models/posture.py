@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, Index, text
+from sqlmodel import Field, SQLModel
+
+from models.types import FAILED_PREDICATE, EnumCode, RuleStatus, Severity
+
+
+class HostLatestScan(SQLModel, table=True):
+    """Summary of each host's most recent completed scan."""
+
+    host_id: int = Field(foreign_key="host.id", primary_key=True)
+    scan_result_id: int = Field(foreign_key="scanresult.id")
+    audit_job_id: Optional[int] = Field(default=None, foreign_key="auditjob.id")
+    distro: str
+    profile_name: str
+    score: float = 0.0
+    passed: int = 0
+    failed: int = 0
+    other: int = 0
+    scanned_at: datetime
+
+
+class HostRulePosture(SQLModel, table=True):
+    """Latest known status of every rule on every host."""
+
+    __table_args__ = (
+        Index(
+            "ix_hostruleposture_fail_severity",
+            "severity",
+            "rule_id",
+            postgresql_where=text(FAILED_PREDICATE),
+            sqlite_where=text(FAILED_PREDICATE),
+        ),
+    )
+
+    host_id: int = Field(foreign_key="host.id", primary_key=True)
+    rule_id: str = Field(primary_key=True)
+    rule_catalog_id: Optional[int] = Field(default=None, foreign_key="rulecatalog.id")
+    scan_result_id: int = Field(foreign_key="scanresult.id")
+    severity: str = Field(sa_column=Column(EnumCode(Severity), nullable=False))
+    status: str = Field(sa_column=Column(EnumCode(RuleStatus), nullable=False))
+    scanned_at: datetime
@@ -0,0 +1,21 @@
+from datetime import date
+
+from sqlmodel import Field, SQLModel
+
+
+class DailyComplianceRollup(SQLModel, table=True):
+    """Completed scans per day, distro, profile and host group.
+
+    ``score_sum / scans`` is the day's average score; rows are added to as
+    scans are stored (see ``services.rollups``).
+    """
+
+    day: date = Field(primary_key=True)
+    distro: str = Field(primary_key=True)
+    profile_name: str = Field(primary_key=True)
+    host_group: str = Field(default="", primary_key=True)
+    scans: int = 0
+    score_sum: float = 0.0
+    passed: int = 0
+    failed: int = 0
+    other: int = 0
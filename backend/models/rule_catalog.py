@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import UniqueConstraint
+from sqlmodel import Field, SQLModel
+
+
+class RuleCatalog(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("content_version", "rule_id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    content_version: str       # sha256 prefix of the source datastream
+    rule_id: str
+    severity: str = "unknown"
+    title: str = ""
+    description: str = ""
+    rationale: str = ""
+    fixtext: str = ""
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,15 +1,28 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Column, Index, text
 from sqlmodel import Field, SQLModel
 
+from models.types import FAILED_PREDICATE, EnumCode, RuleStatus, Severity
+
+# Failed results only: what the dashboard's critical-fails / top-failures read
+_FAILED = text(FAILED_PREDICATE)
+
 
 class ScanResult(SQLModel, table=True):
+    # Latest scan per host (dashboard) and a host's scan history
+    __table_args__ = (Index("ix_scanresult_host_id_created_at", "host_id", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    audit_job_id: Optional[int] = Field(default=None, foreign_key="auditjob.id")
+    audit_job_id: Optional[int] = Field(default=None, foreign_key="auditjob.id", index=True)
     host_id: Optional[int] = Field(default=None, foreign_key="host.id")
     distro: str
     profile_name: str
+    content_version: str = ""
+    artifact_digest: str = ""  # raw results in the artifact store
+    status: str = "completed"  # completed / timeout / unreachable / error
+    error: str = ""
     score: float = 0.0
     passed: int = 0
     failed: int = 0
@@ -18,14 +31,23 @@ class ScanResult(SQLModel, table=True):
 
 
 class ScanRuleResult(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_scanruleresult_fail_severity",
+            "severity",
+            "rule_catalog_id",
+            postgresql_where=_FAILED,
+            sqlite_where=_FAILED,
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     scan_result_id: Optional[int] = Field(
-        default=None, foreign_key="scanresult.id"
+        default=None, foreign_key="scanresult.id", index=True
+    )
+    rule_catalog_id: Optional[int] = Field(
+        default=None, foreign_key="rulecatalog.id"
     )
-    rule_id: str
-    severity: str
-    status: str
-    title: str = ""
-    description: str = ""
-    rationale: str = ""
-    fixtext: str = ""
+    # SMALLINT codes, read back as labels (see ``models.types``)
+    severity: str = Field(sa_column=Column(EnumCode(Severity), nullable=False))
+    status: str = Field(sa_column=Column(EnumCode(RuleStatus), nullable=False))
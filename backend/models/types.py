@@ -0,0 +1,114 @@
+"""Compact enum columns for per-rule severity and status.
+
+``ScanRuleResult`` and ``HostRulePosture`` store severity and status as
+``SMALLINT`` codes.  Values are normalized once, at ingest: ``cat1`` and
+``critical`` become ``high``, unrecognised values ``unknown``.  Filters
+given by users go through the strict ``parse`` instead, which rejects
+values it does not recognise rather than matching ``unknown``.  The column
+type binds either a code or any spelling of a value, and reads back the
+canonical label, so queries and API responses keep using strings such as
+``"fail"`` while the database filters and groups on integers.
+"""
+
+from enum import IntEnum
+from typing import Optional, Union
+
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+
+class Severity(IntEnum):
+    UNKNOWN = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+    @classmethod
+    def normalize(cls, value: Union[str, int, None]) -> "Severity":
+        if isinstance(value, int):
+            return cls(value)
+        return _SEVERITY_ALIASES.get((value or "").strip().lower(), cls.UNKNOWN)
+
+    @classmethod
+    def parse(cls, value: str) -> "Severity":
+        key = value.strip().lower()
+        if key == cls.UNKNOWN.label:
+            return cls.UNKNOWN
+        if key not in _SEVERITY_ALIASES:
+            raise ValueError(f"unknown severity {value!r}")
+        return _SEVERITY_ALIASES[key]
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+_SEVERITY_ALIASES = {
+    "high": Severity.HIGH,
+    "critical": Severity.HIGH,
+    "cat1": Severity.HIGH,
+    "medium": Severity.MEDIUM,
+    "cat2": Severity.MEDIUM,
+    "low": Severity.LOW,
+    "cat3": Severity.LOW,
+    "info": Severity.LOW,
+}
+
+
+class RuleStatus(IntEnum):
+    """XCCDF rule results."""
+
+    UNKNOWN = 0
+    PASS = 1
+    FAIL = 2
+    ERROR = 3
+    NOTAPPLICABLE = 4
+    NOTCHECKED = 5
+    NOTSELECTED = 6
+    INFORMATIONAL = 7
+    FIXED = 8
+
+    @classmethod
+    def normalize(cls, value: Union[str, int, None]) -> "RuleStatus":
+        if isinstance(value, int):
+            return cls(value)
+        return cls.__members__.get((value or "").strip().upper(), cls.UNKNOWN)
+
+    @classmethod
+    def parse(cls, value: str) -> "RuleStatus":
+        key = value.strip().upper()
+        if key not in cls.__members__:
+            raise ValueError(f"unknown status {value!r}")
+        return cls.__members__[key]
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class EnumCode(TypeDecorator):
+    """``SMALLINT`` column holding an ``IntEnum`` code, read back as its label."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum) -> None:
+        super().__init__()
+        self.enum = enum
+
+    def process_bind_param(self, value, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        return int(self.enum.normalize(value))
+
+    def process_literal_param(self, value, dialect) -> str:
+        return str(self.process_bind_param(value, dialect))
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return self.enum(value).label
+
+
+# Predicate of the partial indexes over failed results
+FAILED_PREDICATE = f"status = {int(RuleStatus.FAIL)}"
@@ -1,25 +1,66 @@
-import csv
-import io
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 from sqlmodel import Session, select
 
 from db import get_session
 from models.job import AuditJob
-from models.scan import ScanResult, ScanRuleResult
+from models.types import RuleStatus, Severity
 from schemas.job import JobHistoryItem
 
-from schemas.audit import AuditRequest, AuditResponse
-from services.audit import run_audit
+from schemas.audit import AuditRequest, AuditResponse, AuditSubmitResponse
+from services.artifacts import artifact_store
+from services.audit import (
+    cancel_audit,
+    find_scan_artifact,
+    load_audit_results,
+    load_compact_audit_results,
+    submit_audit,
+)
 from services.cac_fetch import ensure_cac_content, resolve_content_paths
+from services.export import (
+    ENCODERS,
+    EXPORT_MEDIA_TYPES,
+    ExportFilters,
+    format_available,
+    iter_export_rows,
+    split_values,
+)
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
 
 
 router = APIRouter(tags=["audit"])
 
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _negotiated(model: BaseModel, request: Request) -> Response:
+    """Serialize ``model`` as msgpack when the client asks for it, else JSON."""
+    accept = request.headers.get("accept", "")
+    headers = {"Vary": "Accept"}
+    if msgpack is not None and any(media in accept for media in MSGPACK_MEDIA_TYPES):
+        return Response(
+            msgpack.packb(model.model_dump(), use_bin_type=True),
+            media_type="application/msgpack",
+            headers=headers,
+        )
+    return Response(model.model_dump_json(), media_type="application/json", headers=headers)
 
-@router.post("/audit", response_model=AuditResponse)
+
+@router.post("/audit", response_model=AuditSubmitResponse)
 async def audit_hosts(payload: AuditRequest):
+    """Queue an audit and return its job id immediately.
+
+    Progress is pushed over ``/ws/audit/{job_id}``; results are read from
+    ``GET /api/audit/results/{job_id}``.
+    """
     # Auto-resolve profile_path from CAC cache when not provided
     if not payload.profile_path:
         ds_path, _ = resolve_content_paths(payload.distro, payload.profile_name)
@@ -37,10 +78,23 @@ async def audit_hosts(payload: AuditRequest):
                     "Fetch content first via /api/cac/fetch/{distro}."
                 ),
             )
-    job_id, results = await run_audit(
-        payload.hosts, payload.distro, payload.profile_name, payload.profile_path
+    job_id = submit_audit(
+        payload.hosts,
+        payload.distro,
+        payload.profile_name,
+        payload.profile_path,
+        reaudit=payload.mode == "reaudit",
+        rule_ids=payload.rule_ids,
     )
-    return AuditResponse(job_id=job_id, results=results)
+    return AuditSubmitResponse(job_id=job_id, status="queued")
+
+
+@router.post("/audit/{job_id}/cancel", response_model=AuditSubmitResponse)
+def cancel_audit_job(job_id: int):
+    """Cancel a queued or running audit; in-flight scans are killed."""
+    if not cancel_audit(job_id):
+        raise HTTPException(status_code=409, detail="Audit job is not running")
+    return AuditSubmitResponse(job_id=job_id, status="cancelling")
 
 
 @router.get("/audit/history", response_model=list[JobHistoryItem])
@@ -59,64 +113,117 @@ def audit_history():
     ]
 
 
-@router.get("/audit/results/{job_id}/export/{format}")
-def export_audit_results(job_id: int, format: str):
-    session: Session = get_session()
-    with session:
-        results = session.exec(
-            select(
-                ScanResult.id,
-                ScanResult.host_id,
-                ScanRuleResult.rule_id,
-                ScanRuleResult.severity,
-                ScanRuleResult.status,
-                ScanRuleResult.title,
-                ScanRuleResult.description,
-                ScanRuleResult.rationale,
-                ScanRuleResult.fixtext,
-            )
-            .join(ScanRuleResult, ScanRuleResult.scan_result_id == ScanResult.id)
-            .where(ScanResult.audit_job_id == job_id)
-        ).all()
-
-    rows = [
-        {
-            "scan_result_id": scan_id,
-            "host_id": host_id,
-            "rule_id": rule_id,
-            "severity": severity,
-            "status": status,
-            "title": title,
-            "description": description,
-            "rationale": rationale,
-            "fixtext": fixtext,
-        }
-        for (
-            scan_id,
-            host_id,
-            rule_id,
-            severity,
-            status,
-            title,
-            description,
-            rationale,
-            fixtext,
-        ) in results
-    ]
+@router.get("/audit/results/{job_id}", response_model=AuditResponse)
+def audit_results(
+    job_id: int, request: Request, format: Literal["full", "compact"] = "full"
+):
+    """Per-host results of a job.
 
-    if format.lower() == "json":
-        return rows
+    ``format=compact`` returns a ``CompactAuditResponse`` instead: the rule
+    text once in ``rules`` and per host ``[rule index, status index]`` pairs.
+    It is sent as msgpack when the client accepts ``application/msgpack``
+    (and the optional ``msgpack`` package is installed).
+    """
+    if format == "compact":
+        compact = load_compact_audit_results(job_id)
+        if compact is None:
+            raise HTTPException(status_code=404, detail="Audit job not found")
+        return _negotiated(compact, request)
+    results = load_audit_results(job_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Audit job not found")
+    return results
 
-    if format.lower() == "csv":
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=rows[0].keys() if rows else [])
-        if rows:
-            writer.writeheader()
-            writer.writerows(rows)
-        return Response(
-            content=output.getvalue(),
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=audit_results.csv"},
+
+@router.get("/audit/results/{job_id}/artifacts/{host}")
+def download_scan_artifact(job_id: int, host: str):
+    """Stream a host's raw XCCDF results (decompressed on the fly)."""
+    digest = find_scan_artifact(job_id, host)
+    if not digest or artifact_store.path_for(digest) is None:
+        raise HTTPException(status_code=404, detail="Raw results not available")
+    return StreamingResponse(
+        artifact_store.iter_chunks(digest),
+        media_type="application/xml",
+        headers={"Content-Disposition": f'attachment; filename="{host}_results.xml"'},
+    )
+
+
+def _enum_values(enum, values: List[str]) -> List[str]:
+    """``split_values`` for a severity or status filter, rejecting unknown values."""
+    try:
+        return [enum.parse(value).label for value in split_values(values)]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {exc}") from None
+
+
+def _export_response(format: str, filters: ExportFilters) -> StreamingResponse:
+    format = format.lower()
+    if format not in ENCODERS:
+        raise HTTPException(status_code=400, detail="Unsupported export format")
+    if not format_available(format):
+        raise HTTPException(
+            status_code=501, detail=f"{format} export requires the pyarrow package"
         )
+    headers = {}
+    if format != "json":
+        headers["Content-Disposition"] = f"attachment; filename=audit_results.{format}"
+    return StreamingResponse(
+        ENCODERS[format](iter_export_rows(filters)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+
+@router.get("/audit/results/export/{format}")
+def export_results_range(
+    format: str,
+    job_id: List[int] = Query([]),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    status: List[str] = Query([]),
+    severity: List[str] = Query([]),
+    host: List[str] = Query([]),
+):
+    """Stream rule results of several jobs and/or scans in ``[since, until)``.
+
+    Formats and filters are those of the per-job export; at least one
+    ``job_id`` or ``since`` is required.
+    """
+    if not job_id and since is None:
+        raise HTTPException(status_code=400, detail="Pass job_id and/or since")
+    filters = ExportFilters(
+        job_ids=job_id,
+        since=since,
+        until=until,
+        statuses=_enum_values(RuleStatus, status),
+        severities=_enum_values(Severity, severity),
+        hosts=split_values(host),
+    )
+    return _export_response(format, filters)
+
+
+@router.get("/audit/results/{job_id}/export/{format}")
+def export_audit_results(
+    job_id: int,
+    format: str,
+    status: List[str] = Query([]),
+    severity: List[str] = Query([]),
+    host: List[str] = Query([]),
+):
+    """Stream a job's rule results as CSV, NDJSON, JSON, Parquet or Arrow.
 
-    raise HTTPException(status_code=400, detail="Unsupported export format")
+    ``status``, ``severity`` and ``host`` (hostname or alias) may be repeated
+    or comma-separated and are applied in the database query.
+    """
+    session: Session = get_session()
+    with session:
+        if session.get(AuditJob, job_id) is None:
+            raise HTTPException(status_code=404, detail="Audit job not found")
+
+    filters = ExportFilters(
+        job_ids=[job_id],
+        statuses=_enum_values(RuleStatus, status),
+        severities=_enum_values(Severity, severity),
+        hosts=split_values(host),
+    )
+    return _export_response(format, filters)
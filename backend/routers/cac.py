@@ -7,6 +7,7 @@ from core.config import settings
 from schemas.cac import (
     CACCacheStatus,
     CACFetchResponse,
+    CACProfileRulesResponse,
     CACProfilesResponse,
     CACStatusResponse,
 )
@@ -18,6 +19,7 @@ from services.cac_fetch import (
     _products_for_distro,
     _read_metadata,
     ensure_cac_content,
+    get_profile_rules,
     get_profiles_for_distro,
     get_cache_status,
     get_supported_products,
@@ -94,6 +96,18 @@ def cac_profiles(distro: str):
     return CACProfilesResponse(distro=distro, profiles=profiles)
 
 
+@router.get(
+    "/profiles/{distro}/{profile_id}/rules", response_model=CACProfileRulesResponse
+)
+def cac_profile_rules(distro: str, profile_id: str):
+    """List the rules a profile selects, read from the compiled content index."""
+    try:
+        rules = get_profile_rules(distro, profile_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return CACProfileRulesResponse(distro=distro, profile_id=profile_id, rules=rules)
+
+
 @router.post("/offline-mode")
 def set_offline_mode(payload: OfflineModeUpdate):
     """Toggle between online and offline fetch mode."""
@@ -1,12 +1,16 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
-import paramiko
 from sqlmodel import Session, select
 
-from core.config import settings
 from db import get_session
 from models.host import Host
 from schemas.host import HostConnectionTest, HostCreate, HostResponse, HostUpdate
+from services.dashboard_cache import dashboard_cache
+from services.hosts import hosts_by_name
+from services.posture import clear_host_posture
 from services.ssh_discovery import sync_known_hosts_to_db
+from services.ssh_pool import endpoint_for, ssh_pool
 
 
 router = APIRouter(tags=["hosts"])
@@ -36,6 +40,7 @@ def create_host(payload: HostCreate):
         host = Host(**payload.model_dump())
         session.add(host)
         session.commit()
+        dashboard_cache.invalidate()
         session.refresh(host)
         return host
 
@@ -62,8 +67,10 @@ def delete_host(host_id: int):
         host = session.get(Host, host_id)
         if not host:
             raise HTTPException(status_code=404, detail="Host not found")
+        clear_host_posture(session, host_id)
         session.delete(host)
         session.commit()
+        dashboard_cache.invalidate()
         return {"ok": True}
 
 
@@ -71,37 +78,25 @@ def delete_host(host_id: int):
 def refresh_hosts():
     """Re-scan ~/.ssh/config and import any new hosts."""
     discovered, created = sync_known_hosts_to_db()
+    if created:
+        dashboard_cache.invalidate()
     return {"discovered": discovered, "created": created}
 
 
 @router.post("/hosts/test-connection")
-def test_connection(payload: HostConnectionTest):
-    hostname = payload.hostname
-    ssh_user = payload.ssh_user or settings.ssh_user
-    port = payload.port
-
-    # Look up host-specific key from database
-    session: Session = get_session()
-    key_path = settings.ssh_key_path
-    with session:
-        host = session.exec(
-            select(Host).where(Host.hostname == hostname)
-        ).first()
-        if host and host.identity_file:
-            key_path = host.identity_file
-
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+async def test_connection(payload: HostConnectionTest):
+    # Host-specific key, port and jump host come from the database
+    known = await asyncio.to_thread(hosts_by_name, [payload.hostname])
+    endpoint = endpoint_for(
+        payload.hostname,
+        known.get(payload.hostname),
+        user=payload.ssh_user or "",
+        port=payload.port,
+    )
     try:
-        client.connect(
-            hostname=hostname,
-            username=ssh_user,
-            key_filename=key_path,
-            port=port,
-            timeout=10,
-        )
-        return {"success": True}
-    except Exception as exc:
-        return {"success": False, "error": str(exc)}
-    finally:
-        client.close()
+        returncode, _, stderr = await ssh_pool.run(endpoint, "true", timeout=30)
+    except (ConnectionError, TimeoutError) as exc:
+        return {"success": False, "error": str(exc) or "Connection timed out"}
+    if returncode != 0:
+        return {"success": False, "error": stderr.decode(errors="replace").strip()}
+    return {"success": True}
@@ -1,5 +1,13 @@
+import asyncio
+import json
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from db import get_session
+from models.job import AuditJob
+from services import dashboard as widgets
+from services.dashboard_cache import dashboard_cache
+from services.dashboard_feed import DASHBOARD_CHANNEL, dashboard_feed
 from services.ws_manager import manager
 
 
@@ -9,6 +17,12 @@ router = APIRouter(tags=["ws"])
 @router.websocket("/ws/audit/{job_id}")
 async def ws_audit(websocket: WebSocket, job_id: str):
     await manager.connect(job_id, websocket)
+    # Late subscribers still learn the job state (it may already be finished)
+    if job_id.isdigit():
+        with get_session() as session:
+            job = session.get(AuditJob, int(job_id))
+        if job:
+            await websocket.send_json({"event": "audit.job", "status": job.status})
     try:
         while True:
             await websocket.receive_text()
@@ -24,3 +38,22 @@ async def ws_mitigate(websocket: WebSocket, job_id: str):
             await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(job_id, websocket)
+
+
+@router.websocket("/ws/dashboard")
+async def ws_dashboard(websocket: WebSocket):
+    try:
+        # Deltas wait while a viewer subscribes, so none reaches it before its
+        # snapshot or falls between the snapshot and the subscription
+        async with dashboard_feed.lock:
+            _, body = await asyncio.to_thread(
+                dashboard_cache.get, ("/ws/dashboard",), widgets.dashboard
+            )
+            await manager.connect(DASHBOARD_CHANNEL, websocket)
+            await websocket.send_json({"event": "dashboard.snapshot", **json.loads(body)})
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(DASHBOARD_CHANNEL, websocket)
@@ -1,4 +1,10 @@
-from schemas.audit import AuditRequest, AuditResponse, HostAuditResult, RuleResult
+from schemas.audit import (
+    AuditRequest,
+    AuditResponse,
+    AuditSubmitResponse,
+    HostAuditResult,
+    RuleResult,
+)
 from schemas.cac import CACArtifact, CACCacheStatus, CACFetchResponse
 from schemas.host import HostConnectionTest, HostResponse
 from schemas.job import JobHistoryItem
@@ -11,6 +17,7 @@ __all__ = [
     "CACFetchResponse",
     "AuditRequest",
     "AuditResponse",
+    "AuditSubmitResponse",
     "HostAuditResult",
     "RuleResult",
     "HostResponse",
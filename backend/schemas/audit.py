@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal, Tuple
 
 from pydantic import BaseModel
 
@@ -8,6 +8,10 @@ class AuditRequest(BaseModel):
     distro: str
     profile_name: str
     profile_path: str = ""
+    # "reaudit" re-checks only the rules that failed in each host's latest
+    # scan (or ``rule_ids`` when given) and merges them with the rest
+    mode: Literal["full", "reaudit"] = "full"
+    rule_ids: List[str] = []
 
 
 class RuleResult(BaseModel):
@@ -27,8 +31,48 @@ class HostAuditResult(BaseModel):
     failed: int
     other: int
     rules: List[RuleResult]
+    # completed, or why the host was not scanned: timeout / unreachable / error
+    status: str = "completed"
+    error: str = ""
+
+
+class AuditSubmitResponse(BaseModel):
+    job_id: int
+    status: str
 
 
 class AuditResponse(BaseModel):
     job_id: int
+    status: str = "completed"
     results: List[HostAuditResult]
+
+
+class RuleDefinition(BaseModel):
+    rule_id: str
+    severity: str
+    title: str = ""
+    description: str = ""
+    rationale: str = ""
+    fixtext: str = ""
+
+
+class CompactHostResult(BaseModel):
+    host: str
+    score: float
+    passed: int
+    failed: int
+    other: int
+    status: str = "completed"
+    error: str = ""
+    # [index into CompactAuditResponse.rules, index into .statuses]
+    results: List[Tuple[int, int]]
+
+
+class CompactAuditResponse(BaseModel):
+    """``?format=compact``: rule text is sent once, not once per host."""
+
+    job_id: int
+    status: str = "completed"
+    statuses: List[str]
+    rules: List[RuleDefinition]
+    results: List[CompactHostResult]
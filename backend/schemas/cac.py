@@ -2,6 +2,8 @@ from typing import Dict, List
 
 from pydantic import BaseModel
 
+from schemas.audit import RuleResult
+
 
 class CACArtifact(BaseModel):
     path: str
@@ -41,3 +43,9 @@ class CACProfileInfo(BaseModel):
 class CACProfilesResponse(BaseModel):
     distro: str
     profiles: List[CACProfileInfo]
+
+
+class CACProfileRulesResponse(BaseModel):
+    distro: str
+    profile_id: str
+    rules: List[RuleResult]
@@ -12,6 +12,7 @@ class HostResponse(BaseModel):
     port: int
     identity_file: str
     proxy_jump: str
+    host_group: str
     ip_address: str
     os_distro: str
     os_version: str
@@ -25,6 +26,7 @@ class HostCreate(BaseModel):
     port: int = 22
     identity_file: str = ""
     proxy_jump: str = ""
+    host_group: str = ""
     ip_address: str = ""
     os_distro: str = ""
     os_version: str = ""
@@ -37,6 +39,7 @@ class HostUpdate(BaseModel):
     port: Optional[int] = None
     identity_file: Optional[str] = None
     proxy_jump: Optional[str] = None
+    host_group: Optional[str] = None
     ip_address: Optional[str] = None
     os_distro: Optional[str] = None
     os_version: Optional[str] = None
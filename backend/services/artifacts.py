@@ -0,0 +1,211 @@
+"""Content-addressed store for raw scan result files.
+
+oscap writes each host's XCCDF results to a scratch file; the file is then
+moved into the store compressed and named after the SHA-256 of its
+*uncompressed* content::
+
+    scan_results/objects/3f/3f9a...e1.xml.zst
+
+Identical results are stored once, and ``ScanResult.artifact_digest`` points
+at the object.  Compression is zstd when the optional ``zstandard`` package
+is installed (``ARTIFACT_COMPRESSION=auto``, the default) and gzip
+otherwise.  Readers get a streaming, decompressing file object, so the
+parser and the download endpoint never inflate a whole file in memory.
+
+Retention: ``collect_garbage()`` (run every ``ARTIFACT_GC_INTERVAL_HOURS``)
+detaches artifacts from scans older than ``ARTIFACT_RETENTION_DAYS`` and
+deletes objects no scan references any more.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from core.config import settings
+from db import get_session
+from models.scan import ScanResult
+from services.xccdf import RuleResultRow, iter_rule_result_rows
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+_SUFFIXES = {"zstd": ".xml.zst", "gzip": ".xml.gz"}
+# Objects younger than this are never collected: their scan row may not be
+# committed yet.
+_GC_GRACE_SECONDS = 3600
+
+
+def _codec() -> str:
+    choice = settings.artifact_compression.lower()
+    if choice == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if choice == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed; storing artifacts with gzip")
+        return "gzip"
+    return choice
+
+
+class ArtifactStore:
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    @property
+    def objects_dir(self) -> Path:
+        return self.root / "objects"
+
+    def path_for(self, digest: str) -> Optional[Path]:
+        """Return the stored object for ``digest``, whatever its codec."""
+        for suffix in _SUFFIXES.values():
+            candidate = self.objects_dir / digest[:2] / f"{digest}{suffix}"
+            if candidate.exists():
+                return candidate
+        return None
+
+    def put(self, source: Path, remove_source: bool = True) -> str:
+        """Compress ``source`` into the store and return its content digest."""
+        codec = _codec()
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        sha = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw_out, open(source, "rb") as src:
+                if codec == "zstd":
+                    writer = zstandard.ZstdCompressor(level=3).stream_writer(raw_out)
+                else:
+                    writer = gzip.GzipFile(fileobj=raw_out, mode="wb", compresslevel=6)
+                with writer:
+                    while chunk := src.read(_CHUNK_SIZE):
+                        sha.update(chunk)
+                        writer.write(chunk)
+            digest = sha.hexdigest()
+            existing = self.path_for(digest)
+            if existing is not None:
+                # Refresh the mtime so GC's grace period covers the new reference
+                os.utime(existing)
+            else:
+                target = self.objects_dir / digest[:2] / f"{digest}{_SUFFIXES[codec]}"
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, target)
+        finally:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+        if remove_source:
+            source.unlink(missing_ok=True)
+        return digest
+
+    def open(self, digest: str) -> IO[bytes]:
+        """Open a stored artifact as a streaming, decompressed byte stream."""
+        path = self.path_for(digest)
+        if path is None:
+            raise FileNotFoundError(f"artifact {digest} not found")
+        if path.name.endswith(_SUFFIXES["zstd"]):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd artifacts")
+            return zstandard.ZstdDecompressor().stream_reader(
+                open(path, "rb"), closefd=True
+            )
+        return gzip.open(path, "rb")
+
+    def iter_chunks(self, digest: str) -> Iterator[bytes]:
+        with self.open(digest) as stream:
+            while chunk := stream.read(_CHUNK_SIZE):
+                yield chunk
+
+    def scratch_path(self, job_id: int, name: str) -> Path:
+        """Working file for oscap output before it is stored."""
+        return self.root / "scratch" / str(job_id) / name
+
+    def delete_unreferenced(self, referenced: set) -> int:
+        """Delete objects whose digest is not in ``referenced``."""
+        if not self.objects_dir.exists():
+            return 0
+        cutoff = time.time() - _GC_GRACE_SECONDS
+        removed = 0
+        for path in self.objects_dir.glob("*/*.xml.*"):
+            digest = path.name.split(".", 1)[0]
+            if digest in referenced or path.stat().st_mtime > cutoff:
+                continue
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+ARTIFACTS_DIR = Path(settings.artifacts_dir) if settings.artifacts_dir else (
+    Path(__file__).resolve().parents[1] / "scan_results"
+)
+artifact_store = ArtifactStore(ARTIFACTS_DIR)
+
+
+def iter_artifact_rows(root: str, digest: str) -> Iterator[RuleResultRow]:
+    """Stream the rows of a stored artifact, decompressing on the fly.
+
+    Picklable entry point for the audit parse process pool.
+    """
+    with ArtifactStore(Path(root)).open(digest) as stream:
+        yield from iter_rule_result_rows(stream)
+
+
+def collect_garbage(store: ArtifactStore = artifact_store) -> int:
+    """Apply the retention policy; return the number of objects deleted."""
+    if settings.artifact_retention_days > 0:
+        cutoff = datetime.utcnow() - timedelta(days=settings.artifact_retention_days)
+        session: Session = get_session()
+        with session:
+            session.execute(
+                update(ScanResult)
+                .where(ScanResult.created_at < cutoff, ScanResult.artifact_digest != "")
+                .values(artifact_digest="")
+            )
+            session.commit()
+
+    session = get_session()
+    with session:
+        referenced = set(
+            session.exec(
+                select(ScanResult.artifact_digest)
+                .where(ScanResult.artifact_digest != "")
+                .distinct()
+            ).all()
+        )
+    removed = store.delete_unreferenced(referenced)
+    _remove_empty_scratch_dirs(store)
+    if removed:
+        logger.info("Artifact GC removed %d unreferenced result files", removed)
+    return removed
+
+
+def _remove_empty_scratch_dirs(store: ArtifactStore) -> None:
+    scratch = store.root / "scratch"
+    if not scratch.exists():
+        return
+    cutoff = time.time() - _GC_GRACE_SECONDS
+    for directory in scratch.iterdir():
+        if directory.is_dir() and directory.stat().st_mtime < cutoff:
+            if not any(directory.iterdir()):
+                directory.rmdir()
+
+
+async def run_artifact_gc() -> None:
+    """Background loop applying the retention policy periodically."""
+    interval = settings.artifact_gc_interval_hours * 3600
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(collect_garbage)
+        except Exception:
+            logger.exception("Artifact GC failed")
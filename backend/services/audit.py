@@ -1,236 +1,978 @@
 import asyncio
-import os
-import subprocess
+import contextlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
-from xml.etree import ElementTree
-
-from sqlmodel import Session, select
+from typing import (
+    Awaitable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from sqlmodel import Session, func, select
 
 from core.config import settings
 from db import get_session
 from models.host import Host
 from models.job import AuditJob
+from models.rule_catalog import RuleCatalog
 from models.scan import ScanResult, ScanRuleResult
-from schemas.audit import HostAuditResult, RuleResult
+from schemas.audit import (
+    AuditResponse,
+    CompactAuditResponse,
+    CompactHostResult,
+    HostAuditResult,
+    RuleDefinition,
+    RuleResult,
+)
+from services.artifacts import artifact_store, iter_artifact_rows
+from services.content_index import open_content_index
+from services.dashboard_cache import dashboard_cache
+from services.dashboard_feed import dashboard_feed
+from services.hosts import get_or_create_host, hosts_by_name
+from services.ingest import bulk_insert_rule_results, copy_rule_results
+from services.jobs import executor
+from services.oscap_runner import (
+    OscapSshRun,
+    ProgressThrottle,
+    ResultCallback,
+    StartHook,
+    build_oscap_command,
+    is_local_host,
+    oscap_ssh_env,
+    run_oscap,
+)
+from services.pipeline import run_streamed, run_write
+from services.posture import update_host_posture
+from services.remote_scan import run_remote_scan
+from services.rollups import record_scan_rollup
+from services.rule_catalog import CatalogResolver, ensure_rule_catalog
+from services.rule_metadata import get_content_version, get_rule_metadata
+from services.scheduler import (
+    Lease,
+    ScheduleTarget,
+    is_connection_failure,
+    scheduler,
+    target_for,
+)
+from services.ssh_pool import SSHEndpoint, endpoint_for, ssh_pool
+from services.task_queue import (
+    DEADLINE_ERROR,
+    RETRYABLE_HOST_STATUSES,
+    cancel_job_tasks,
+    enqueue_audit_tasks,
+)
 from services.ws_manager import manager
+from services.xccdf import RuleResultRow, build_tailoring
 
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
 
-ARTIFACTS_DIR = Path(__file__).resolve().parents[1] / "scan_results"
-_MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT_HOSTS", "10"))
-_SEMAPHORE = asyncio.Semaphore(_MAX_CONCURRENT)
+# Tailored profile used by re-audits, and the statuses they re-check by default
+REAUDIT_PROFILE_ID = "xccdf_org.streamguard_profile_reaudit"
+REAUDIT_STATUSES = {"fail", "error"}
 
 
-def _text_content(element: ElementTree.Element | None) -> str:
-    if element is None:
-        return ""
-    return " ".join(chunk.strip() for chunk in element.itertext() if chunk.strip()).strip()
+@dataclass
+class ScanTally:
+    """Running pass/fail/other counts for one host's scan."""
 
+    passed: int = 0
+    failed: int = 0
+    other: int = 0
 
-def _load_rule_metadata(xccdf_path: str) -> Dict[str, RuleResult]:
-    metadata: Dict[str, RuleResult] = {}
-    if not xccdf_path:
-        return metadata
-    try:
-        tree = ElementTree.parse(xccdf_path)
-    except (FileNotFoundError, ElementTree.ParseError):
-        return metadata
-
-    root = tree.getroot()
-    for rule in root.findall(".//{*}Rule"):
-        rule_id = rule.attrib.get("id", "")
-        if not rule_id:
-            continue
-        title = _text_content(rule.find(".//{*}title"))
-        description = _text_content(rule.find(".//{*}description"))
-        rationale = _text_content(rule.find(".//{*}rationale"))
-        fixtext = _text_content(rule.find(".//{*}fixtext"))
-        severity = rule.attrib.get("severity", "unknown")
-        metadata[rule_id] = RuleResult(
-            rule_id=rule_id,
-            severity=severity,
-            status="unknown",
-            title=title,
-            description=description,
-            rationale=rationale,
-            fixtext=fixtext,
-        )
-    return metadata
-
-
-def _parse_xccdf_results(
-    result_path: Path, benchmark_path: str
-) -> Tuple[List[RuleResult], int, int, int]:
-    tree = ElementTree.parse(result_path)
-    root = tree.getroot()
-    namespace = {"xccdf": root.tag.split("}")[0].strip("{")} if "}" in root.tag else {}
-
-    metadata = _load_rule_metadata(benchmark_path)
-    rules = []
-    passed = failed = other = 0
-
-    for rule_result in root.findall(".//{*}rule-result"):
-        rule_id = rule_result.attrib.get("idref", "")
-        severity = rule_result.attrib.get("severity", "unknown")
-        result_text = rule_result.findtext(
-            "xccdf:result", default="unknown", namespaces=namespace
-        )
-        status = result_text.lower()
+    def add(self, status: str, count: int = 1) -> None:
         if status == "pass":
-            passed += 1
+            self.passed += count
         elif status == "fail":
-            failed += 1
+            self.failed += count
         else:
-            other += 1
-
-        meta = metadata.get(rule_id)
-        rules.append(
-            RuleResult(
-                rule_id=rule_id,
-                severity=severity if severity != "unknown" else (meta.severity if meta else "unknown"),
-                status=status,
-                title=meta.title if meta else "",
-                description=meta.description if meta else "",
-                rationale=meta.rationale if meta else "",
-                fixtext=meta.fixtext if meta else "",
+            self.other += count
+
+    @property
+    def score(self) -> float:
+        total = self.passed + self.failed + self.other
+        if not total:
+            return 0.0
+        return round((self.passed / total) * 100.0, 2)
+
+
+def _enrich_results(
+    results: Iterable[RuleResult], metadata: Dict[str, RuleResult], tally: ScanTally
+) -> Iterator[RuleResult]:
+    """Fill in rule text from ``metadata`` and count statuses as rules stream by."""
+    for result in results:
+        tally.add(result.status)
+        meta = metadata.get(result.rule_id)
+        if meta:
+            if result.severity == "unknown":
+                result.severity = meta.severity
+            result.title = meta.title
+            result.description = meta.description
+            result.rationale = meta.rationale
+            result.fixtext = meta.fixtext
+        yield result
+
+
+@dataclass
+class ReauditPlan:
+    """Rules to re-check on a host, relative to its latest scan."""
+
+    base_scan_id: int
+    rule_ids: List[str]
+    base_rule_ids: List[str]
+
+
+def _plan_reaudit(
+    host: str, profile_name: str, rule_ids: Iterable[str]
+) -> Optional[ReauditPlan]:
+    """Pick the rules to re-check from the host's latest scan of the profile.
+
+    Uses ``rule_ids`` when given, otherwise every rule whose last status is
+    in ``REAUDIT_STATUSES``.  Returns ``None`` when the host has no previous
+    scan of this profile (it then gets a full scan).
+    """
+    session: Session = get_session()
+    with session:
+        base = session.exec(
+            select(ScanResult)
+            .join(Host, Host.id == ScanResult.host_id)
+            .where(
+                Host.hostname == host,
+                ScanResult.profile_name == profile_name,
+                ScanResult.status == "completed",
+            )
+            .order_by(ScanResult.created_at.desc(), ScanResult.id.desc())
+        ).first()
+        if base is None:
+            return None
+        previous = session.exec(
+            select(RuleCatalog.rule_id, ScanRuleResult.status)
+            .join(RuleCatalog, RuleCatalog.id == ScanRuleResult.rule_catalog_id)
+            .where(ScanRuleResult.scan_result_id == base.id)
+        ).all()
+
+    requested = sorted(set(rule_ids)) or sorted(
+        rule_id for rule_id, status in previous if status in REAUDIT_STATUSES
+    )
+    return ReauditPlan(
+        base_scan_id=base.id,
+        rule_ids=requested,
+        base_rule_ids=[rule_id for rule_id, _ in previous],
+    )
+
+
+def _write_tailoring(
+    plan: ReauditPlan, profile_name: str, xccdf_path: str, tailoring_path: Path
+) -> None:
+    """Write a tailoring that narrows ``profile_name`` to the plan's rules.
+
+    ``profile_name`` may be a short name such as ``stig``; the tailored
+    profile extends its full id, which is what oscap matches ``extends`` on.
+    """
+    deselect = set(plan.base_rule_ids)
+    base_profile = profile_name
+    index = open_content_index(xccdf_path)
+    if index is not None:
+        with index:
+            base_profile = index.resolve_profile_id(profile_name) or profile_name
+            deselect.update(index.profile_rule_ids(base_profile))
+    tailoring_path.parent.mkdir(parents=True, exist_ok=True)
+    tailoring_path.write_bytes(
+        build_tailoring(
+            Path(xccdf_path).name, base_profile, REAUDIT_PROFILE_ID, plan.rule_ids, deselect
+        )
+    )
+
+
+async def _run_oscap_eval(
+    host: str,
+    profile_name: str,
+    xccdf_path: str,
+    output_path: Path,
+    on_result: Optional[ResultCallback] = None,
+    tailoring_path: Optional[Path] = None,
+    endpoint: Optional[SSHEndpoint] = None,
+    on_start: Optional[StartHook] = None,
+) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    env = oscap_ssh = None
+    if not is_local_host(host):
+        endpoint = endpoint or endpoint_for(host)
+        if settings.remote_scan_driver == "cached":
+            await run_remote_scan(
+                endpoint,
+                profile_name,
+                xccdf_path,
+                output_path,
+                on_result=on_result,
+                tailoring_path=tailoring_path,
+                on_start=on_start,
             )
+            return
+        env = oscap_ssh_env(endpoint)
+        oscap_ssh = OscapSshRun(endpoint)
+    async with contextlib.AsyncExitStack() as stack:
+        if env is not None:
+            # Fails fast (ConnectionError) for unreachable hosts; oscap-ssh
+            # then multiplexes all of its ssh/scp calls over this master
+            await stack.enter_async_context(ssh_pool.lease(endpoint))
+        await run_oscap(
+            build_oscap_command(
+                host, profile_name, xccdf_path, output_path, tailoring_path, endpoint
+            ),
+            on_result=on_result,
+            env=env,
+            on_abort=oscap_ssh.on_abort if oscap_ssh else None,
+            on_start=on_start,
+            on_output=oscap_ssh.on_output if oscap_ssh else None,
         )
 
-    return rules, passed, failed, other
 
+def _profile_rule_count(profile_path: str, profile_name: str) -> int:
+    """Number of rules the profile selects (0 when the index is unavailable)."""
+    index = open_content_index(profile_path)
+    if index is None:
+        return 0
+    with index:
+        return len(index.profile_rule_ids(profile_name))
+
+
+class _ProgressReporter:
+    """``on_result`` callback broadcasting rate-limited progress.
+
+    The delay from ``start()`` until the first rule result is reported to the
+    scheduler as the host's connection latency.  ``start()`` is the
+    ``on_start`` hook of ``run_oscap``, so uploading the datastream to the
+    target beforehand does not count as latency.
+    """
+
+    def __init__(self, job_id: int, host: str, total: int, lease: Lease) -> None:
+        self.job_id = job_id
+        self.host = host
+        self.total = total
+        self.lease = lease
+        self._throttle = ProgressThrottle(settings.audit_progress_interval)
+        self._started = time.monotonic()
+        self._done = 0
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+
+    async def __call__(self, rule_id: str, result: str) -> None:
+        self._done += 1
+        if self._done == 1:
+            self.lease.observe_latency(time.monotonic() - self._started)
+        if self._throttle.ready() or self._done == self.total:
+            await manager.broadcast(
+                str(self.job_id),
+                {
+                    "event": "audit.progress",
+                    "host": self.host,
+                    "rule_id": rule_id,
+                    "result": result,
+                    "done": self._done,
+                    "total": self.total,
+                },
+            )
 
-def _run_oscap_eval(host: str, profile_name: str, xccdf_path: str, output_path: Path) -> None:
-    output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if host in {"localhost", "127.0.0.1"}:
-        command = [
-            "oscap",
-            "xccdf",
-            "eval",
-            "--profile",
-            profile_name,
-            "--results",
-            str(output_path),
-            xccdf_path,
-        ]
-    else:
-        command = [
-            "oscap-ssh",
+def _persist_scan_result(
+    host: str,
+    distro: str,
+    profile_name: str,
+    job_id: int,
+    content_version: str,
+    catalog_ids: Dict[str, int],
+    rules: Iterable[RuleResult],
+    tally: ScanTally,
+    base_scan_id: Optional[int] = None,
+    replaced_rule_ids: Collection[str] = (),
+    artifact_digest: str = "",
+) -> ScanResult:
+    """Store a host's scan and stream its rule results in one transaction.
+
+    ``tally`` is filled while ``rules`` is consumed, so the summary counts
+    are written to the ``ScanResult`` row after the bulk insert.
+
+    For a re-audit, ``rules`` only holds the re-evaluated rules; every other
+    result of ``base_scan_id`` is carried over unchanged (all but
+    ``replaced_rule_ids``) and ``tally`` is recounted over the merged set.
+    """
+    session: Session = get_session()
+    with session:
+        host_row = get_or_create_host(session, host)
+        scan_result = ScanResult(
+            audit_job_id=job_id,
+            host_id=host_row.id,
+            distro=distro,
+            profile_name=profile_name,
+            content_version=content_version,
+            artifact_digest=artifact_digest,
+        )
+        session.add(scan_result)
+        session.flush()
+
+        catalog = CatalogResolver(session, content_version, catalog_ids)
+        bulk_insert_rule_results(session, scan_result.id, rules, catalog)
+        if base_scan_id is not None:
+            copy_rule_results(session, base_scan_id, scan_result.id, replaced_rule_ids)
+            merged = ScanTally()
+            for status, count in session.exec(
+                select(ScanRuleResult.status, func.count())
+                .where(ScanRuleResult.scan_result_id == scan_result.id)
+                .group_by(ScanRuleResult.status)
+            ):
+                merged.add(status, count)
+            tally.passed, tally.failed, tally.other = merged.passed, merged.failed, merged.other
+
+        scan_result.score = tally.score
+        scan_result.passed = tally.passed
+        scan_result.failed = tally.failed
+        scan_result.other = tally.other
+        session.add(scan_result)
+        session.flush()
+        update_host_posture(session, scan_result)
+        record_scan_rollup(session, scan_result, host_row.host_group)
+        session.commit()
+        session.refresh(scan_result)
+        dashboard_cache.invalidate()
+        return scan_result
+
+
+def _store_scan_rows(
+    rows: Iterable[RuleResultRow],
+    host: str,
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    job_id: int,
+    plan: Optional[ReauditPlan] = None,
+    artifact_digest: str = "",
+) -> ScanTally:
+    """DB writer stage: enrich parsed rows from rule metadata and persist them.
+
+    ``rows`` is consumed as it streams in from the parse stage.  With a
+    re-audit ``plan``, only the re-checked rules are taken from ``rows``
+    (oscap reports everything else as ``notselected``) and merged with the
+    base scan.
+    """
+    metadata = get_rule_metadata(profile_path)
+    content_version = get_content_version(profile_path)
+    catalog_ids = ensure_rule_catalog(content_version, metadata)
+    tally = ScanTally()
+    wanted = set(plan.rule_ids) if plan is not None else None
+    # Filled as rows stream by; only read once they are all inserted
+    replaced_rule_ids = set()
+
+    def results() -> Iterator[RuleResult]:
+        for rule_id, severity, status in rows:
+            if wanted is not None and rule_id not in wanted:
+                continue
+            replaced_rule_ids.add(rule_id)
+            yield RuleResult(rule_id=rule_id, severity=severity, status=status)
+
+    _persist_scan_result(
+        host,
+        distro,
+        profile_name,
+        job_id,
+        content_version,
+        catalog_ids,
+        _enrich_results(results(), metadata, tally),
+        tally,
+        base_scan_id=plan.base_scan_id if plan else None,
+        replaced_rule_ids=replaced_rule_ids,
+        artifact_digest=artifact_digest,
+    )
+    return tally
+
+
+async def _scan_host(
+    host: str,
+    profile_name: str,
+    profile_path: str,
+    job_id: int,
+    output_path: Path,
+    lease: Lease,
+    reaudit: bool,
+    rule_ids: Optional[List[str]],
+    endpoint: Optional[SSHEndpoint],
+) -> Tuple[Optional[ReauditPlan], str]:
+    """Run oscap for one host and store its raw results; return (plan, digest)."""
+    plan = None
+    if reaudit:
+        plan = await asyncio.to_thread(_plan_reaudit, host, profile_name, rule_ids or [])
+
+    digest = ""
+    if plan is None:
+        total = await asyncio.to_thread(_profile_rule_count, profile_path, profile_name)
+        progress = _ProgressReporter(job_id, host, total, lease)
+        await _run_oscap_eval(
             host,
-            "22",
-            settings.ssh_key_path,
-            "xccdf",
-            "eval",
-            "--profile",
             profile_name,
-            "--results",
-            str(output_path),
-            xccdf_path,
-        ]
-
-    subprocess.run(command, check=True)
+            profile_path,
+            output_path,
+            on_result=progress,
+            on_start=progress.start,
+            endpoint=endpoint,
+        )
+        digest = await asyncio.to_thread(artifact_store.put, output_path)
+    elif plan.rule_ids:
+        tailoring_path = output_path.with_name(f"{host}_tailoring.xml")
+        await asyncio.to_thread(
+            _write_tailoring, plan, profile_name, profile_path, tailoring_path
+        )
+        progress = _ProgressReporter(job_id, host, len(plan.rule_ids), lease)
+        try:
+            await _run_oscap_eval(
+                host,
+                REAUDIT_PROFILE_ID,
+                profile_path,
+                output_path,
+                on_result=progress,
+                on_start=progress.start,
+                tailoring_path=tailoring_path,
+                endpoint=endpoint,
+            )
+        finally:
+            tailoring_path.unlink(missing_ok=True)
+        digest = await asyncio.to_thread(artifact_store.put, output_path)
+    # else: nothing left to re-check, the latest results are carried forward
+    return plan, digest
+
+
+async def _run_to_completion(coro: Awaitable[T]) -> T:
+    """Await ``coro`` to the end even if cancelled meanwhile, absorbing the cancellation.
+
+    Used for storing a scan: the writer thread commits whatever it was
+    given, so a job deadline or cancellation arriving during the write
+    cannot undo it, and the host must then count as scanned rather than
+    also get a ``timeout`` result.
+    """
+    done = asyncio.ensure_future(coro)
+    task = asyncio.current_task()
+    while not done.done():
+        try:
+            # Unlike awaiting ``done`` itself, this leaves it running when cancelled
+            await asyncio.wait([done])
+        except asyncio.CancelledError:
+            task.uncancel()
+    return done.result()
 
 
 async def run_audit_for_host(
-    host: str, distro: str, profile_name: str, profile_path: str, job_id: int
+    host: str,
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    job_id: int,
+    target: Optional[ScheduleTarget] = None,
+    reaudit: bool = False,
+    rule_ids: Optional[List[str]] = None,
+    endpoint: Optional[SSHEndpoint] = None,
 ) -> HostAuditResult:
-    async with _SEMAPHORE:
+    """Scan one host and persist the result.
+
+    With ``reaudit``, only the host's previously failed rules (or
+    ``rule_ids``) are evaluated through a tailoring file and merged with the
+    rest of its latest scan.
+    """
+    target = target or ScheduleTarget(host=host)
+    async with scheduler.slot(f"audit-{job_id}", [target]) as lease:
         await manager.broadcast(
             str(job_id), {"event": "audit.start", "host": host}
         )
-        output_path = ARTIFACTS_DIR / str(job_id) / f"{host}_results.xml"
-
-        await asyncio.to_thread(
-            _run_oscap_eval, host, profile_name, profile_path, output_path
-        )
-
-        rules, passed, failed, other = _parse_xccdf_results(output_path, profile_path)
-        score = 0.0
-        total = passed + failed + other
-        if total:
-            score = round((passed / total) * 100.0, 2)
-
-        session: Session = get_session()
-        with session:
-            host_row = session.exec(
-                select(Host).where(Host.hostname == host)
-            ).first()
-            if not host_row:
-                host_row = Host(hostname=host, ssh_user=settings.ssh_user)
-                session.add(host_row)
-                session.commit()
-                session.refresh(host_row)
-
-            scan_result = ScanResult(
-                audit_job_id=job_id,
-                host_id=host_row.id,
-                distro=distro,
-                profile_name=profile_name,
-                score=score,
-                passed=passed,
-                failed=failed,
-                other=other,
-            )
-            session.add(scan_result)
-            session.commit()
-            session.refresh(scan_result)
-
-            for rule in rules:
-                session.add(
-                    ScanRuleResult(
-                        scan_result_id=scan_result.id,
-                        rule_id=rule.rule_id,
-                        severity=rule.severity,
-                        status=rule.status,
-                        title=rule.title,
-                        description=rule.description,
-                        rationale=rule.rationale,
-                        fixtext=rule.fixtext,
-                    )
+        output_path = artifact_store.scratch_path(job_id, f"{host}_results.xml")
+
+        # The deadline covers connecting, scanning and fetching results;
+        # parsing and the DB write are not interrupted half-way
+        try:
+            async with asyncio.timeout(settings.audit_host_timeout or None):
+                plan, digest = await _scan_host(
+                    host,
+                    profile_name,
+                    profile_path,
+                    job_id,
+                    output_path,
+                    lease,
+                    reaudit,
+                    rule_ids,
+                    endpoint,
                 )
-            session.commit()
+        except BaseException:
+            # A failed or timed-out scan leaves no partial results in scratch
+            output_path.unlink(missing_ok=True)
+            raise
 
-        await manager.broadcast(
-            str(job_id), {"event": "audit.complete", "host": host}
+        return await _run_to_completion(
+            _store_scan(host, distro, profile_name, profile_path, job_id, plan, digest)
         )
 
-        return HostAuditResult(
-            host=host,
-            score=score,
-            passed=passed,
-            failed=failed,
-            other=other,
-            rules=rules,
+
+async def _store_scan(
+    host: str,
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    job_id: int,
+    plan: Optional[ReauditPlan],
+    digest: str,
+) -> HostAuditResult:
+    """Persist a fetched scan and announce it."""
+    write_args = (host, distro, profile_name, profile_path, job_id, plan, digest)
+    if digest:
+        tally = await run_streamed(
+            iter_artifact_rows, (str(artifact_store.root), digest),
+            _store_scan_rows, *write_args,
         )
+    else:
+        tally = await run_write(_store_scan_rows, [], *write_args)
+
+    summary = HostAuditResult(
+        host=host,
+        score=tally.score,
+        passed=tally.passed,
+        failed=tally.failed,
+        other=tally.other,
+        rules=[],
+    )
+    await manager.broadcast(
+        str(job_id),
+        {"event": "audit.complete", **summary.model_dump(exclude={"rules"})},
+    )
+    await dashboard_feed.scan_stored(host, tally.score)
+    return summary
+
+
+def _set_job_status(job_id: int, status: str) -> None:
+    session: Session = get_session()
+    with session:
+        job = session.get(AuditJob, job_id)
+        if job:
+            job.status = status
+            job.updated_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+    if status not in ("queued", "running"):
+        dashboard_cache.invalidate()
 
 
-async def run_audit(
-    hosts: List[str], distro: str, profile_name: str, profile_path: str
-) -> tuple[int, List[HostAuditResult]]:
+def create_audit_job(hosts: List[str], distro: str, profile_name: str) -> int:
+    """Record a new audit job in the ``queued`` state and return its id."""
     session: Session = get_session()
     with session:
         job = AuditJob(
             distro=distro,
             profile_name=profile_name,
-            status="running",
+            status="queued",
             host_count=len(hosts),
         )
         session.add(job)
         session.commit()
         session.refresh(job)
+        return job.id
+
+
+def classify_host_failure(exc: BaseException) -> str:
+    """Map a per-host exception to a ``ScanResult.status``."""
+    if isinstance(exc, TimeoutError):
+        return "timeout"
+    if is_connection_failure(exc):
+        return "unreachable"
+    return "error"
+
+
+def record_host_failure(
+    host: str, distro: str, profile_name: str, job_id: int, status: str, error: str
+) -> None:
+    """Persist a ``ScanResult`` saying why ``host`` has no results in the job."""
+    session: Session = get_session()
+    with session:
+        host_row = get_or_create_host(session, host)
+        session.add(
+            ScanResult(
+                audit_job_id=job_id,
+                host_id=host_row.id,
+                distro=distro,
+                profile_name=profile_name,
+                status=status,
+                error=error,
+            )
+        )
+        session.commit()
+
+
+async def audit_host(
+    host: str,
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    job_id: int,
+    target: Optional[ScheduleTarget] = None,
+    reaudit: bool = False,
+    rule_ids: Optional[List[str]] = None,
+    endpoint: Optional[SSHEndpoint] = None,
+) -> HostAuditResult:
+    """``run_audit_for_host`` that reports failures instead of raising them.
 
-    tasks = [
-        run_audit_for_host(host, distro, profile_name, profile_path, job.id)
+    A failed host comes back with ``status`` timeout / unreachable / error;
+    nothing is persisted for it yet (the caller may retry it).
+    """
+    try:
+        return await run_audit_for_host(
+            host, distro, profile_name, profile_path, job_id, target,
+            reaudit=reaudit, rule_ids=rule_ids, endpoint=endpoint,
+        )
+    except Exception as exc:
+        status = classify_host_failure(exc)
+        error = str(exc) or type(exc).__name__
+        logger.warning("Audit of %s in job %s: %s (%s)", host, job_id, status, error)
+        await manager.broadcast(
+            str(job_id), {"event": "audit.error", "host": host, "status": status, "error": error}
+        )
+        return _unscanned(host, status, error)
+
+
+def _unscanned(host: str, status: str, error: str) -> HostAuditResult:
+    return HostAuditResult(
+        host=host, score=0.0, passed=0, failed=0, other=0, rules=[],
+        status=status, error=error,
+    )
+
+
+async def _audit_hosts(
+    hosts: List[str],
+    known: Dict[str, Host],
+    deadline: Optional[float],
+    **kwargs,
+) -> Dict[str, HostAuditResult]:
+    """Audit ``hosts`` concurrently until ``deadline`` (loop time).
+
+    Hosts still running at the deadline are cancelled and reported as
+    ``timeout``, except those already storing their scan, which finish it;
+    the others keep whatever outcome they reached.
+    """
+    if not hosts:
+        return {}
+    tasks = {
+        host: asyncio.create_task(
+            audit_host(
+                host,
+                target=target_for(host, known.get(host)),
+                endpoint=endpoint_for(host, known.get(host)),
+                **kwargs,
+            )
+        )
         for host in hosts
-    ]
-    results = await asyncio.gather(*tasks)
+    }
+    timeout = None
+    if deadline is not None:
+        timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+    try:
+        await asyncio.wait(tasks.values(), timeout=timeout)
+    finally:
+        # Deadline reached, or the job itself was cancelled
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results = {}
+    for host, task in tasks.items():
+        if task.cancelled():
+            results[host] = _unscanned(host, "timeout", DEADLINE_ERROR)
+        else:
+            results[host] = task.result()
+    return results
+
+
+async def execute_audit_job(
+    job_id: int,
+    hosts: List[str],
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    reaudit: bool = False,
+    rule_ids: Optional[List[str]] = None,
+) -> List[HostAuditResult]:
+    """Scan every host of a queued job, moving it to running → completed/partial/failed.
+
+    One host's failure never fails the job: each host ends up scanned or with
+    a timeout / unreachable / error ``ScanResult``.  ``AUDIT_JOB_TIMEOUT``
+    bounds the whole job, and up to ``AUDIT_STRAGGLER_RETRIES`` extra rounds
+    re-run hosts that timed out or were unreachable, within that deadline.
+    """
+    _set_job_status(job_id, "running")
+    await manager.broadcast(str(job_id), {"event": "audit.job", "status": "running"})
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.audit_job_timeout if settings.audit_job_timeout else None
+    options = dict(
+        distro=distro,
+        profile_name=profile_name,
+        profile_path=profile_path,
+        job_id=job_id,
+        reaudit=reaudit,
+        rule_ids=rule_ids,
+    )
+    try:
+        known = await asyncio.to_thread(hosts_by_name, hosts)
+        results = await _audit_hosts(hosts, known, deadline, **options)
+        for _ in range(settings.audit_straggler_retries):
+            stragglers = [
+                host for host in hosts if results[host].status in RETRYABLE_HOST_STATUSES
+            ]
+            if not stragglers or (deadline is not None and loop.time() >= deadline):
+                break
+            await manager.broadcast(
+                str(job_id), {"event": "audit.retry", "hosts": stragglers}
+            )
+            results.update(await _audit_hosts(stragglers, known, deadline, **options))
+
+        for result in results.values():
+            if result.status != "completed":
+                await asyncio.to_thread(
+                    record_host_failure,
+                    result.host, distro, profile_name, job_id, result.status, result.error,
+                )
+    except asyncio.CancelledError:
+        _set_job_status(job_id, "cancelled")
+        await manager.broadcast(str(job_id), {"event": "audit.job", "status": "cancelled"})
+        raise
+    except Exception as exc:
+        _set_job_status(job_id, "failed")
+        await manager.broadcast(
+            str(job_id), {"event": "audit.job", "status": "failed", "error": str(exc)}
+        )
+        raise
+
+    ordered = [results[host] for host in hosts]
+    scanned = sum(result.status == "completed" for result in ordered)
+    status = job_outcome(scanned, len(ordered))
+    _set_job_status(job_id, status)
+    event = {"event": "audit.job", "status": status}
+    if status != "completed":
+        event["error"] = f"{len(ordered) - scanned} of {len(ordered)} hosts were not scanned"
+    await manager.broadcast(str(job_id), event)
+    return ordered
+
+
+def job_outcome(scanned: int, total: int) -> str:
+    """Final job status from the number of hosts scanned successfully."""
+    if scanned == total:
+        return "completed"
+    return "partial" if scanned else "failed"
+
+
+def submit_audit(
+    hosts: List[str],
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    reaudit: bool = False,
+    rule_ids: Optional[List[str]] = None,
+) -> int:
+    """Queue an audit and return its job id.
+
+    With ``AUDIT_DISPATCH=queue`` the hosts become ``AuditTask`` rows for
+    ``services.worker`` processes; otherwise the job runs on the in-process
+    background executor.
+    """
+    job_id = create_audit_job(hosts, distro, profile_name)
+    if settings.audit_dispatch == "queue":
+        enqueue_audit_tasks(
+            job_id, hosts, distro, profile_name, profile_path, reaudit, rule_ids
+        )
+        return job_id
+    executor.submit(
+        f"audit-{job_id}",
+        execute_audit_job(
+            job_id, hosts, distro, profile_name, profile_path, reaudit, rule_ids
+        ),
+    )
+    return job_id
+
+
+def cancel_audit(job_id: int) -> bool:
+    """Cancel a running audit; its oscap processes are killed.
+
+    Queued jobs are cancelled in the task table; workers notice on their
+    next heartbeat.
+    """
+    if executor.cancel(f"audit-{job_id}"):
+        return True
+    return cancel_job_tasks(job_id) > 0
+
 
-    session = get_session()
+def find_scan_artifact(job_id: int, host: str) -> Optional[str]:
+    """Digest of the raw results stored for ``host`` in ``job_id``, if any."""
+    session: Session = get_session()
     with session:
-        job = session.get(AuditJob, job.id)
-        if job:
-            job.status = "completed"
-            session.add(job)
-            session.commit()
+        digest = session.exec(
+            select(ScanResult.artifact_digest)
+            .join(Host, Host.id == ScanResult.host_id)
+            .where(ScanResult.audit_job_id == job_id, Host.hostname == host)
+            .order_by(ScanResult.id.desc())
+        ).first()
+    return digest or None
+
+
+def load_audit_results(job_id: int) -> Optional[AuditResponse]:
+    """Build the per-host results of a job from the database."""
+    session: Session = get_session()
+    with session:
+        job = session.get(AuditJob, job_id)
+        if not job:
+            return None
+        scans = session.exec(
+            select(ScanResult, Host.hostname)
+            .join(Host, Host.id == ScanResult.host_id, isouter=True)
+            .where(ScanResult.audit_job_id == job_id)
+            .order_by(ScanResult.id)
+        ).all()
+        rule_rows = session.exec(
+            select(
+                ScanRuleResult.scan_result_id,
+                RuleCatalog.rule_id,
+                ScanRuleResult.severity,
+                ScanRuleResult.status,
+                RuleCatalog.title,
+                RuleCatalog.description,
+                RuleCatalog.rationale,
+                RuleCatalog.fixtext,
+            )
+            .join(ScanResult, ScanResult.id == ScanRuleResult.scan_result_id)
+            .join(RuleCatalog, RuleCatalog.id == ScanRuleResult.rule_catalog_id)
+            .where(ScanResult.audit_job_id == job_id)
+            .order_by(ScanRuleResult.id)
+        ).all()
+
+    rules_by_scan: Dict[int, List[RuleResult]] = {}
+    for scan_id, rule_id, severity, status, title, description, rationale, fixtext in rule_rows:
+        rules_by_scan.setdefault(scan_id, []).append(
+            RuleResult(
+                rule_id=rule_id,
+                severity=severity,
+                status=status,
+                title=title,
+                description=description,
+                rationale=rationale,
+                fixtext=fixtext,
+            )
+        )
 
-    return job.id, results
+    return AuditResponse(
+        job_id=job_id,
+        status=job.status,
+        results=[
+            HostAuditResult(
+                host=hostname or "",
+                score=scan.score,
+                passed=scan.passed,
+                failed=scan.failed,
+                other=scan.other,
+                rules=rules_by_scan.get(scan.id, []),
+                status=scan.status,
+                error=scan.error,
+            )
+            for scan, hostname in scans
+        ],
+    )
+
+
+def load_compact_audit_results(job_id: int) -> Optional[CompactAuditResponse]:
+    """Build the ``?format=compact`` results of a job.
+
+    Rule text is read once per catalog entry instead of once per host and
+    rule, and each host carries ``(rule index, status index)`` pairs.
+    """
+    session: Session = get_session()
+    with session:
+        job = session.get(AuditJob, job_id)
+        if not job:
+            return None
+        scans = session.exec(
+            select(ScanResult, Host.hostname)
+            .join(Host, Host.id == ScanResult.host_id, isouter=True)
+            .where(ScanResult.audit_job_id == job_id)
+            .order_by(ScanResult.id)
+        ).all()
+        job_scan_ids = select(ScanResult.id).where(ScanResult.audit_job_id == job_id)
+        catalog = {
+            entry.id: entry
+            for entry in session.exec(
+                select(RuleCatalog).where(
+                    RuleCatalog.id.in_(
+                        select(ScanRuleResult.rule_catalog_id)
+                        .where(ScanRuleResult.scan_result_id.in_(job_scan_ids))
+                        .distinct()
+                    )
+                )
+            )
+        }
+        rule_rows = session.exec(
+            select(
+                ScanRuleResult.scan_result_id,
+                ScanRuleResult.rule_catalog_id,
+                ScanRuleResult.severity,
+                ScanRuleResult.status,
+            )
+            .where(ScanRuleResult.scan_result_id.in_(job_scan_ids))
+            .order_by(ScanRuleResult.id)
+        ).all()
+
+    rules: List[RuleDefinition] = []
+    rule_index: Dict[Tuple[int, str], int] = {}
+    statuses: List[str] = []
+    status_index: Dict[str, int] = {}
+    pairs_by_scan: Dict[int, List[Tuple[int, int]]] = {}
+    for scan_id, catalog_id, severity, status in rule_rows:
+        # Severity is part of the key: a result may override the catalog's
+        key = (catalog_id, severity)
+        index = rule_index.get(key)
+        if index is None:
+            entry = catalog[catalog_id]
+            index = rule_index[key] = len(rules)
+            rules.append(
+                RuleDefinition(
+                    rule_id=entry.rule_id,
+                    severity=severity,
+                    title=entry.title,
+                    description=entry.description,
+                    rationale=entry.rationale,
+                    fixtext=entry.fixtext,
+                )
+            )
+        code = status_index.get(status)
+        if code is None:
+            code = status_index[status] = len(statuses)
+            statuses.append(status)
+        pairs_by_scan.setdefault(scan_id, []).append((index, code))
+
+    return CompactAuditResponse(
+        job_id=job_id,
+        status=job.status,
+        statuses=statuses,
+        rules=rules,
+        results=[
+            CompactHostResult.model_construct(
+                host=hostname or "",
+                score=scan.score,
+                passed=scan.passed,
+                failed=scan.failed,
+                other=scan.other,
+                status=scan.status,
+                error=scan.error,
+                results=pairs_by_scan.get(scan.id, []),
+            )
+            for scan, hostname in scans
+        ],
+    )
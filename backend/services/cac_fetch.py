@@ -12,10 +12,11 @@ from typing import Dict, List, Optional, Tuple
 
 import requests
 import yaml
-from lxml import etree
 
 from core.config import settings
+from schemas.audit import RuleResult
 from schemas.cac import CACArtifact, CACProfileInfo
+from services.content_index import ensure_content_index, open_content_index
 
 logger = logging.getLogger(__name__)
 
@@ -368,6 +369,9 @@ def _update_metadata_from_artifacts(
         )
         if art.artifact_type in ("datastream", "xccdf"):
             prod_meta["datastream"] = art.path
+            if art.artifact_type == "datastream":
+                index_path = ensure_content_index(art.path)
+                prod_meta["index"] = str(index_path) if index_path else ""
         elif art.artifact_type in ("playbook", "ansible") and art.profile:
             prod_meta["playbooks"][art.profile] = art.path
     _write_metadata(meta)
@@ -589,34 +593,44 @@ def get_cache_status() -> dict:
     return result
 
 
-def _parse_profiles_from_datastream(distro: str) -> List[CACProfileInfo]:
-    """Parse XCCDF/datastream XML to extract Profile ids and titles."""
+def _datastream_paths(distro: str) -> List[str]:
+    """Return cached datastream paths for every product of ``distro``."""
     meta = _read_metadata()
-    products = _products_for_distro(distro)
-    profiles: List[CACProfileInfo] = []
-
-    for product in products:
+    paths: List[str] = []
+    for product in _products_for_distro(distro):
         prod_meta = meta.get("distros", {}).get(product, {})
         ds_path = prod_meta.get("datastream", "")
-        if not ds_path or not Path(ds_path).exists():
-            continue
-        try:
-            tree = etree.parse(ds_path)
-            for profile_el in tree.iter("{*}Profile"):
-                pid = profile_el.get("id", "")
-                title_el = profile_el.find("{*}title")
-                title = (
-                    title_el.text
-                    if title_el is not None and title_el.text
-                    else pid
-                )
-                profiles.append(CACProfileInfo(id=pid, title=title))
-        except (etree.XMLSyntaxError, OSError) as exc:
-            logger.warning("Failed to parse datastream %s: %s", ds_path, exc)
+        if ds_path and Path(ds_path).exists():
+            paths.append(ds_path)
+    return paths
 
+
+def _parse_profiles_from_datastream(distro: str) -> List[CACProfileInfo]:
+    """Read Profile ids and titles from the compiled datastream index."""
+    profiles: List[CACProfileInfo] = []
+    for ds_path in _datastream_paths(distro):
+        index = open_content_index(ds_path)
+        if index is None:
+            continue
+        with index:
+            profiles.extend(index.profiles())
     return profiles
 
 
+def get_profile_rules(distro: str, profile_id: str) -> List[RuleResult]:
+    """Return metadata for every rule selected by ``profile_id``."""
+    for ds_path in _datastream_paths(distro):
+        index = open_content_index(ds_path)
+        if index is None:
+            continue
+        with index:
+            rule_ids = index.profile_rule_ids(profile_id)
+            if rule_ids:
+                rules = index.rules(rule_ids)
+                return [rules[rule_id] for rule_id in rule_ids if rule_id in rules]
+    return []
+
+
 def get_profiles_for_distro(distro: str) -> List[CACProfileInfo]:
     """Resolve profile list with live GitHub fetch + fallback chain."""
     products = _products_for_distro(distro)
@@ -0,0 +1,323 @@
+"""Precompiled SQLite index of a SCAP datastream.
+
+Parsing a 50–150 MB ``ssg-*-ds.xml`` just to list profiles or look up rule
+text is far too slow to do per request.  When CAC content is fetched, each
+datastream is compiled once into ``<datastream>.index.sqlite`` next to it
+(e.g. ``cac_cache/releases/<version>/ssg-rhel9-ds.index.sqlite``) holding:
+
+- ``profiles``: profile id, title and description
+- ``profile_rules``: the rules each profile selects (``extends`` resolved)
+- ``rules``: severity, title, description, rationale and fixtext per rule
+
+Profile listing, rule lookups and audit enrichment read from the index; the
+XML is only parsed again when the datastream file itself changes.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from lxml import etree
+
+from schemas.audit import RuleResult
+from schemas.cac import CACProfileInfo
+from services.xccdf import find_descendant, iter_elements, local_name, text_content
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".index.sqlite"
+# SSG profile ids are this prefix plus the short name (``stig``, ``cis``...)
+PROFILE_ID_PREFIX = "xccdf_org.ssgproject.content_profile_"
+SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE profiles (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE TABLE rules (
+    id TEXT PRIMARY KEY,
+    severity TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    rationale TEXT NOT NULL,
+    fixtext TEXT NOT NULL
+);
+CREATE TABLE profile_rules (
+    profile_id TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    PRIMARY KEY (profile_id, rule_id)
+) WITHOUT ROWID;
+"""
+
+_build_lock = threading.Lock()
+
+
+def index_path_for(datastream_path: str | Path) -> Path:
+    """Return the index location for a datastream (next to the XML file)."""
+    path = Path(datastream_path)
+    return path.with_name(path.name.rsplit(".", 1)[0] + INDEX_SUFFIX)
+
+
+def _source_signature(datastream_path: Path) -> Tuple[str, str]:
+    stat = os.stat(datastream_path)
+    return str(stat.st_mtime_ns), str(stat.st_size)
+
+
+def _child(element: etree._Element, name: str) -> etree._Element | None:
+    for child in element:
+        if isinstance(child.tag, str) and local_name(child.tag) == name:
+            return child
+    return None
+
+
+def _is_selected(value: str | None, default: bool) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() in {"true", "1"}
+
+
+def _resolve_profile_rules(
+    profile_id: str,
+    profile_selects: Dict[str, List[Tuple[str, bool]]],
+    profile_extends: Dict[str, str],
+    default_rules: Dict[str, bool],
+    group_members: Dict[str, List[str]],
+    seen: Optional[set] = None,
+) -> Dict[str, bool]:
+    """Apply ``select`` overrides (including inherited ones) to the defaults."""
+    seen = seen or set()
+    parent = profile_extends.get(profile_id)
+    if parent and parent not in seen and parent in profile_selects:
+        seen.add(profile_id)
+        selection = _resolve_profile_rules(
+            parent, profile_selects, profile_extends, default_rules, group_members, seen
+        )
+    else:
+        selection = dict(default_rules)
+
+    for idref, selected in profile_selects.get(profile_id, []):
+        if idref in selection:
+            selection[idref] = selected
+        for rule_id in group_members.get(idref, []):
+            selection[rule_id] = selected
+    return selection
+
+
+def build_content_index(datastream_path: str | Path) -> Path:
+    """Compile ``datastream_path`` into its SQLite index and return the index path.
+
+    The index is written to a temporary file and renamed into place, so
+    readers never observe a partially written index.
+    """
+    source = Path(datastream_path)
+    target = index_path_for(source)
+    tmp_target = target.with_name(target.name + ".tmp")
+    mtime_ns, size = _source_signature(source)
+
+    profile_rows: List[Tuple[str, str, str]] = []
+    profile_selects: Dict[str, List[Tuple[str, bool]]] = {}
+    profile_extends: Dict[str, str] = {}
+    rule_rows: List[Tuple[str, str, str, str, str, str]] = []
+    default_rules: Dict[str, bool] = {}
+    group_members: Dict[str, List[str]] = {}
+
+    for element in iter_elements(source, {"Profile", "Rule"}):
+        element_id = element.get("id", "")
+        if not element_id:
+            continue
+        if local_name(element.tag) == "Profile":
+            profile_rows.append(
+                (
+                    element_id,
+                    text_content(_child(element, "title")) or element_id,
+                    text_content(_child(element, "description")),
+                )
+            )
+            if element.get("extends"):
+                profile_extends[element_id] = element.get("extends")
+            profile_selects[element_id] = [
+                (select.get("idref", ""), _is_selected(select.get("selected"), True))
+                for select in element
+                if isinstance(select.tag, str) and local_name(select.tag) == "select"
+            ]
+            continue
+
+        rule_rows.append(
+            (
+                element_id,
+                element.get("severity", "unknown"),
+                text_content(find_descendant(element, "title")),
+                text_content(find_descendant(element, "description")),
+                text_content(find_descendant(element, "rationale")),
+                text_content(find_descendant(element, "fixtext")),
+            )
+        )
+        default_rules[element_id] = _is_selected(element.get("selected"), True)
+        # Enclosing Groups are still open while the Rule is yielded
+        for ancestor in element.iterancestors():
+            if local_name(ancestor.tag) == "Group" and ancestor.get("id"):
+                group_members.setdefault(ancestor.get("id"), []).append(element_id)
+
+    if tmp_target.exists():
+        tmp_target.unlink()
+    conn = sqlite3.connect(tmp_target)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("schema_version", SCHEMA_VERSION),
+                ("source", str(source)),
+                ("source_mtime_ns", mtime_ns),
+                ("source_size", size),
+            ],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO profiles (id, title, description) VALUES (?, ?, ?)",
+            profile_rows,
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO rules "
+            "(id, severity, title, description, rationale, fixtext) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rule_rows,
+        )
+        for profile_id, _, _ in profile_rows:
+            selection = _resolve_profile_rules(
+                profile_id, profile_selects, profile_extends, default_rules, group_members
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO profile_rules (profile_id, rule_id) VALUES (?, ?)",
+                [(profile_id, rule_id) for rule_id, selected in selection.items() if selected],
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_target, target)
+    logger.info(
+        "Built content index %s (%d profiles, %d rules)",
+        target,
+        len(profile_rows),
+        len(rule_rows),
+    )
+    return target
+
+
+class ContentIndex:
+    """Read-only accessor for a compiled datastream index."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ContentIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def meta(self) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT key, value FROM meta"))
+
+    def profiles(self) -> List[CACProfileInfo]:
+        rows = self._conn.execute("SELECT id, title FROM profiles ORDER BY rowid")
+        return [CACProfileInfo(id=pid, title=title) for pid, title in rows]
+
+    def resolve_profile_id(self, profile_id: str) -> Optional[str]:
+        """Return the full id of ``profile_id``, which may be a short name."""
+        row = self._conn.execute(
+            "SELECT id FROM profiles WHERE id IN (?, ?) ORDER BY id = ? DESC LIMIT 1",
+            (profile_id, PROFILE_ID_PREFIX + profile_id, profile_id),
+        ).fetchone()
+        return row[0] if row else None
+
+    def profile_rule_ids(self, profile_id: str) -> List[str]:
+        """Rules selected by ``profile_id`` (full id or short name such as ``stig``)."""
+        rows = self._conn.execute(
+            "SELECT rule_id FROM profile_rules WHERE profile_id = ? ORDER BY rule_id",
+            (self.resolve_profile_id(profile_id),),
+        )
+        return [rule_id for (rule_id,) in rows]
+
+    def _rule_rows(self, rule_ids: Optional[Iterable[str]] = None):
+        query = "SELECT id, severity, title, description, rationale, fixtext FROM rules"
+        if rule_ids is None:
+            return self._conn.execute(query)
+        ids = list(rule_ids)
+        if not ids:
+            return []
+        placeholders = ",".join("?" for _ in ids)
+        return self._conn.execute(f"{query} WHERE id IN ({placeholders})", ids)
+
+    def rules(self, rule_ids: Optional[Iterable[str]] = None) -> Dict[str, RuleResult]:
+        """Return rule metadata, optionally restricted to ``rule_ids``."""
+        return {
+            rule_id: RuleResult(
+                rule_id=rule_id,
+                severity=severity,
+                status="unknown",
+                title=title,
+                description=description,
+                rationale=rationale,
+                fixtext=fixtext,
+            )
+            for rule_id, severity, title, description, rationale, fixtext in self._rule_rows(
+                rule_ids
+            )
+        }
+
+
+def _is_current(index_path: Path, datastream_path: Path) -> bool:
+    if not index_path.exists():
+        return False
+    try:
+        with ContentIndex(index_path) as index:
+            meta = index.meta()
+    except sqlite3.Error:
+        return False
+    mtime_ns, size = _source_signature(datastream_path)
+    return (
+        meta.get("schema_version") == SCHEMA_VERSION
+        and meta.get("source_mtime_ns") == mtime_ns
+        and meta.get("source_size") == size
+    )
+
+
+def ensure_content_index(datastream_path: str | Path) -> Optional[Path]:
+    """Return an up-to-date index for the datastream, building it if needed.
+
+    Returns ``None`` when the datastream is missing or cannot be compiled.
+    """
+    source = Path(datastream_path)
+    if not source.exists():
+        return None
+    index_path = index_path_for(source)
+    if _is_current(index_path, source):
+        return index_path
+    with _build_lock:
+        if _is_current(index_path, source):
+            return index_path
+        try:
+            return build_content_index(source)
+        except (OSError, sqlite3.Error, etree.XMLSyntaxError) as exc:
+            logger.warning("Failed to build content index for %s: %s", source, exc)
+            return None
+
+
+def open_content_index(datastream_path: str | Path) -> Optional[ContentIndex]:
+    """Open the (possibly freshly built) index for a datastream."""
+    index_path = ensure_content_index(datastream_path)
+    if index_path is None:
+        return None
+    return ContentIndex(index_path)
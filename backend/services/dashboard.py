@@ -0,0 +1,159 @@
+"""Dashboard widgets, read from the posture and rollup tables.
+
+Each widget takes the session to read with, so several of them can share one
+transaction: ``dashboard()`` computes the whole page from a single snapshot,
+and the live feed (``services.dashboard_feed``) reuses the same queries.
+"""
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import func, literal, true
+from sqlmodel import Session, select
+
+from db import get_session
+from models.host import Host
+from models.posture import HostLatestScan, HostRulePosture
+from models.rollup import DailyComplianceRollup
+from models.rule_catalog import RuleCatalog
+from models.types import RuleStatus, Severity
+
+TIMELINE_DAYS = {"30d": 30, "90d": 90, "1y": 365}
+# group_by value -> rollup column
+TIMELINE_GROUPS = {
+    "distro": DailyComplianceRollup.distro,
+    "profile": DailyComplianceRollup.profile_name,
+    "host_group": DailyComplianceRollup.host_group,
+}
+
+
+@contextmanager
+def snapshot() -> Iterator[Session]:
+    """A session whose reads all see one snapshot.
+
+    On PostgreSQL the transaction is REPEATABLE READ and read-only; SQLite
+    serialises writers, so its reads are consistent as they are.
+    """
+    session: Session = get_session()
+    with session:
+        if session.get_bind().dialect.name == "postgresql":
+            session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+            )
+        yield session
+
+
+def fleet(session: Session):
+    """``(summary, severity breakdown)`` from a single query."""
+    totals = select(
+        select(func.count(Host.id)).scalar_subquery().label("total_hosts"),
+        select(func.avg(HostLatestScan.score)).scalar_subquery().label("fleet_score"),
+    ).subquery("totals")
+    fails = (
+        select(HostRulePosture.severity, func.count().label("fails"))
+        .where(HostRulePosture.status == RuleStatus.FAIL)
+        .group_by(HostRulePosture.severity)
+        .subquery("fails")
+    )
+    rows = session.exec(
+        select(totals.c.total_hosts, totals.c.fleet_score, fails.c.severity, fails.c.fails)
+        .select_from(totals.outerjoin(fails, true()))
+    ).all()
+
+    breakdown = {"high": 0, "medium": 0, "low": 0}
+    for _, _, severity, count in rows:
+        if severity is None:
+            continue
+        # Rules without a severity count as low, as they always have
+        bucket = severity if severity in breakdown else "low"
+        breakdown[bucket] += int(count or 0)
+    total_hosts, fleet_score = rows[0][0], rows[0][1]
+    summary = {
+        "fleet_score": round(float(fleet_score or 0.0), 2),
+        "total_hosts": int(total_hosts or 0),
+        "critical_fails": breakdown[Severity.HIGH.label],
+    }
+    return summary, breakdown
+
+
+def top_failures(session: Session):
+    failing = (
+        select(
+            HostRulePosture.rule_id,
+            func.max(HostRulePosture.rule_catalog_id).label("rule_catalog_id"),
+            func.count().label("fail_count"),
+        )
+        .where(HostRulePosture.status == RuleStatus.FAIL)
+        .group_by(HostRulePosture.rule_id)
+        .order_by(func.count().desc(), HostRulePosture.rule_id)
+        .limit(10)
+        .subquery()
+    )
+    results = session.exec(
+        select(failing.c.rule_id, RuleCatalog.title, failing.c.fail_count)
+        .join(RuleCatalog, RuleCatalog.id == failing.c.rule_catalog_id, isouter=True)
+        .order_by(failing.c.fail_count.desc(), failing.c.rule_id)
+    ).all()
+
+    return [
+        {"rule_id": rule_id, "title": title or "", "count": int(count or 0)}
+        for rule_id, title, count in results
+    ]
+
+
+def today() -> date:
+    """The day the timeline ends on; the dashboard cache expires with it."""
+    return date.today()
+
+
+def daily_scores(session: Session, days: int, group_by: Optional[str] = None):
+    """Average score of each of the last ``days`` days, today included.
+
+    With ``group_by`` there is one series per group; grouped points carry a
+    ``group`` key and every series covers all the days.
+    """
+    end_date = today()
+    start_date = end_date - timedelta(days=days - 1)
+    group = TIMELINE_GROUPS[group_by] if group_by else literal("")
+
+    results = session.exec(
+        select(
+            DailyComplianceRollup.day,
+            group,
+            func.sum(DailyComplianceRollup.score_sum),
+            func.sum(DailyComplianceRollup.scans),
+        )
+        .where(DailyComplianceRollup.day >= start_date)
+        .group_by(DailyComplianceRollup.day, group)
+    ).all()
+
+    score_map = {}
+    for day, name, score_sum, scans in results:
+        score_map[(name, day)] = float(score_sum or 0.0) / scans if scans else 0.0
+    groups = sorted({name for name, _ in score_map}) if group_by else [""]
+    series = []
+    for name in groups:
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            point = {"date": day.isoformat(), "score": round(score_map.get((name, day), 0.0), 2)}
+            if group_by:
+                point["group"] = name
+            series.append(point)
+    return series
+
+
+def timeline(session: Session, period: str, group_by: Optional[str]):
+    return daily_scores(session, TIMELINE_DAYS[period], group_by)
+
+
+def dashboard(period: str = "30d", group_by: Optional[str] = None):
+    """Every widget of the page, read in one transaction."""
+    with snapshot() as session:
+        summary, breakdown = fleet(session)
+        return {
+            "summary": summary,
+            "severity_breakdown": breakdown,
+            "top_failures": top_failures(session),
+            "timeline": timeline(session, period, group_by),
+        }
@@ -0,0 +1,68 @@
+"""In-process cache of dashboard responses.
+
+Dashboard data only changes when scans are stored, audit jobs finish or
+hosts are added or removed; those paths call ``invalidate()``, which bumps a
+generation counter.  Responses are cached per endpoint and query string for
+the current generation and day (the timeline ends today, so a new day
+changes it without any write), and the two double as the ``ETag``: a poll
+whose ``If-None-Match`` matches is answered with 304 without touching the
+database.
+
+The cache lives in the API process.  Scans stored by queue workers reach it
+through the task monitor, which invalidates when it sees hosts or jobs
+finish.
+"""
+
+import json
+import threading
+import uuid
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from services import dashboard as widgets
+
+# (day, generation) a response was computed for
+Version = Tuple[str, int]
+
+
+class DashboardCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Distinguishes ETags issued before and after a restart
+        self._instance = uuid.uuid4().hex[:8]
+        self._generation = 0
+        self._entries: Dict[Hashable, Tuple[Version, bytes]] = {}
+
+    def _version(self) -> Version:
+        return widgets.today().isoformat(), self._generation
+
+    def _etag(self, version: Version) -> str:
+        return f'"{self._instance}-{version[0]}-{version[1]}"'
+
+    def etag(self) -> str:
+        return self._etag(self._version())
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[str, bytes]:
+        """Return ``(etag, JSON body)`` for ``key``, computing it on a miss.
+
+        The version is read before computing, so a result that raced with
+        an invalidation or a day rollover is never stored under the newer one.
+        """
+        with self._lock:
+            version = self._version()
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return self._etag(version), entry[1]
+
+        body = json.dumps(compute()).encode()
+        with self._lock:
+            if self._version() == version:
+                self._entries[key] = (version, body)
+        return self._etag(version), body
+
+
+dashboard_cache = DashboardCache()
@@ -0,0 +1,99 @@
+"""Live dashboard updates pushed over ``/ws/dashboard``.
+
+Viewers subscribe to the ``dashboard`` channel of the shared
+``ConnectionManager`` and get a ``dashboard.snapshot`` of the whole page on
+connect.  Each stored scan then triggers one ``dashboard.delta``: the
+scanned host's score plus whatever changed since the previous delta in the
+summary, the severity breakdown, the top-failure ranks and today's timeline
+point.  The change is computed once per scan and sent to every viewer, so
+open dashboards no longer poll.
+
+Deltas carry new values, never increments, so a viewer that connected in
+between simply overwrites what its snapshot already had.
+"""
+
+import asyncio
+import logging
+
+from services import dashboard as widgets
+from services.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CHANNEL = "dashboard"
+
+
+def _read_state() -> dict:
+    with widgets.snapshot() as session:
+        summary, breakdown = widgets.fleet(session)
+        return {
+            "summary": summary,
+            "severity_breakdown": breakdown,
+            "top_failures": widgets.top_failures(session),
+            "timeline": widgets.daily_scores(session, 1)[0],
+        }
+
+
+def diff_state(old: dict, new: dict) -> dict:
+    """What a viewer holding ``old`` needs to get to ``new``; ``old`` may be None.
+
+    ``top_failures`` lists only the ranks (1-based) whose entry changed, and
+    ``size`` truncates the table when rules dropped out of it.
+    """
+    delta = {}
+    for key in ("summary", "severity_breakdown"):
+        changed = {
+            name: value for name, value in new[key].items()
+            if old is None or old[key].get(name) != value
+        }
+        if changed:
+            delta[key] = changed
+
+    old_top = old["top_failures"] if old else []
+    ranks = [
+        {"rank": rank, **entry}
+        for rank, entry in enumerate(new["top_failures"], start=1)
+        if rank > len(old_top) or old_top[rank - 1] != entry
+    ]
+    if ranks or len(old_top) != len(new["top_failures"]):
+        delta["top_failures"] = {"size": len(new["top_failures"]), "ranks": ranks}
+
+    if old is None or old["timeline"] != new["timeline"]:
+        delta["timeline"] = new["timeline"]
+    return delta
+
+
+class DashboardFeed:
+    def __init__(self) -> None:
+        # Held while a delta is computed and sent, and while a viewer
+        # subscribes (``/ws/dashboard``), so each viewer gets its snapshot
+        # first and every delta after it, in order
+        self.lock = asyncio.Lock()
+        # State the last delta brought viewers to; None when nobody watches
+        self._state = None
+
+    async def scan_stored(self, host: str, score: float) -> None:
+        """Push the dashboard changes caused by ``host``'s new scan.
+
+        Never raises: a failed update must not fail the audit that stored
+        the scan.
+        """
+        if not manager.subscribers(DASHBOARD_CHANNEL):
+            self._state = None
+            return
+        try:
+            async with self.lock:
+                state = await asyncio.to_thread(_read_state)
+                delta = diff_state(self._state, state)
+                await manager.broadcast(
+                    DASHBOARD_CHANNEL,
+                    {"event": "dashboard.delta", "host": {"host": host, "score": round(score, 2)}, **delta},
+                )
+                # Only once sent: after a failed broadcast the next delta
+                # repeats these changes
+                self._state = state
+        except Exception:
+            logger.exception("Dashboard update for %s failed", host)
+
+
+dashboard_feed = DashboardFeed()
@@ -0,0 +1,314 @@
+"""Streaming export of audit rule results.
+
+Rows come off a server-side cursor (``yield_per`` implies
+``stream_results`` on PostgreSQL) in batches of ``EXPORT_BATCH_SIZE`` and
+are encoded as they arrive, so memory stays flat however many hosts and
+rules are exported.  Job, time-range, status, severity and host filters are
+applied in SQL.
+
+CSV, NDJSON and JSON are always available.  Parquet and Arrow IPC (stream
+format) need the optional ``pyarrow`` package; each database batch becomes
+one record batch (one Parquet row group), with the repeated text columns
+dictionary-encoded.
+"""
+
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from core.config import settings
+from db import get_session
+from models.host import Host
+from models.rule_catalog import RuleCatalog
+from models.scan import ScanResult, ScanRuleResult
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+EXPORT_COLUMNS = [
+    "audit_job_id",
+    "scan_result_id",
+    "host_id",
+    "host",
+    "scanned_at",
+    "rule_id",
+    "severity",
+    "status",
+    "title",
+    "description",
+    "rationale",
+    "fixtext",
+]
+# Text columns holding few distinct values per batch
+DICTIONARY_COLUMNS = {
+    "host",
+    "rule_id",
+    "severity",
+    "status",
+    "title",
+    "description",
+    "rationale",
+    "fixtext",
+}
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+COLUMNAR_FORMATS = {"parquet", "arrow"}
+# Rows encoded before a chunk is handed to the response
+_ROWS_PER_CHUNK = 500
+
+
+@dataclass
+class ExportFilters:
+    job_ids: List[int] = field(default_factory=list)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    statuses: List[str] = field(default_factory=list)
+    severities: List[str] = field(default_factory=list)
+    hosts: List[str] = field(default_factory=list)
+
+
+def format_available(format: str) -> bool:
+    return format not in COLUMNAR_FORMATS or pyarrow is not None
+
+
+def split_values(values: Iterable[str]) -> List[str]:
+    """Accept both ``?status=fail&status=error`` and ``?status=fail,error``."""
+    return [item.strip() for value in values for item in value.split(",") if item.strip()]
+
+
+def export_statement(filters: ExportFilters):
+    statement = (
+        select(
+            ScanResult.audit_job_id,
+            ScanResult.id,
+            ScanResult.host_id,
+            Host.hostname,
+            ScanResult.created_at,
+            RuleCatalog.rule_id,
+            ScanRuleResult.severity,
+            ScanRuleResult.status,
+            RuleCatalog.title,
+            RuleCatalog.description,
+            RuleCatalog.rationale,
+            RuleCatalog.fixtext,
+        )
+        .join(ScanRuleResult, ScanRuleResult.scan_result_id == ScanResult.id)
+        .join(RuleCatalog, RuleCatalog.id == ScanRuleResult.rule_catalog_id)
+        .join(Host, Host.id == ScanResult.host_id, isouter=True)
+        .order_by(ScanRuleResult.id)
+    )
+    if filters.job_ids:
+        statement = statement.where(ScanResult.audit_job_id.in_(filters.job_ids))
+    if filters.since is not None:
+        statement = statement.where(ScanResult.created_at >= filters.since)
+    if filters.until is not None:
+        statement = statement.where(ScanResult.created_at < filters.until)
+    if filters.statuses:
+        statement = statement.where(ScanRuleResult.status.in_(filters.statuses))
+    if filters.severities:
+        statement = statement.where(ScanRuleResult.severity.in_(filters.severities))
+    if filters.hosts:
+        statement = statement.where(
+            or_(Host.hostname.in_(filters.hosts), Host.alias.in_(filters.hosts))
+        )
+    return statement
+
+
+def iter_export_rows(filters: ExportFilters) -> Iterator[Sequence]:
+    """Yield result rows (in ``EXPORT_COLUMNS`` order) off a streaming cursor."""
+    session: Session = get_session()
+    with session:
+        result = session.execute(
+            export_statement(filters).execution_options(yield_per=settings.export_batch_size)
+        )
+        for row in result:
+            yield tuple(row)
+
+
+def _chunked(
+    rows: Iterable[Sequence], encoder: Callable[[io.StringIO], Callable[[Sequence], None]]
+) -> Iterator[str]:
+    """Encode ``rows`` into a reused buffer, yielding it every few hundred rows."""
+    buffer = io.StringIO()
+    encode = encoder(buffer)
+    pending = 0
+    for row in rows:
+        encode(row)
+        pending += 1
+        if pending >= _ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def _json_row(row: Sequence) -> str:
+    return json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat)
+
+
+def _csv_encoder(buffer: io.StringIO) -> Callable[[Sequence], None]:
+    return csv.writer(buffer).writerow
+
+
+def _json_array_encoder(buffer: io.StringIO) -> Callable[[Sequence], None]:
+    first = True
+
+    def encode(row: Sequence) -> None:
+        nonlocal first
+        if not first:
+            buffer.write(",")
+        first = False
+        buffer.write(_json_row(row))
+
+    return encode
+
+
+def iter_csv(rows: Iterable[Sequence]) -> Iterator[str]:
+    header = io.StringIO()
+    csv.writer(header).writerow(EXPORT_COLUMNS)
+    yield header.getvalue()
+    yield from _chunked(rows, _csv_encoder)
+
+
+def _ndjson_encoder(buffer: io.StringIO) -> Callable[[Sequence], None]:
+    def encode(row: Sequence) -> None:
+        buffer.write(_json_row(row))
+        buffer.write("\n")
+
+    return encode
+
+
+def iter_ndjson(rows: Iterable[Sequence]) -> Iterator[str]:
+    yield from _chunked(rows, _ndjson_encoder)
+
+
+def iter_json_array(rows: Iterable[Sequence]) -> Iterator[str]:
+    """A JSON array written element by element (same shape as before)."""
+    yield "["
+    yield from _chunked(rows, _json_array_encoder)
+    yield "]"
+
+
+def arrow_schema():
+    text = pyarrow.string()
+    types = {
+        "audit_job_id": pyarrow.int64(),
+        "scan_result_id": pyarrow.int64(),
+        "host_id": pyarrow.int64(),
+        "scanned_at": pyarrow.timestamp("us"),
+    }
+    return pyarrow.schema(
+        [
+            (
+                name,
+                pyarrow.dictionary(pyarrow.int32(), text)
+                if name in DICTIONARY_COLUMNS
+                else types[name],
+            )
+            for name in EXPORT_COLUMNS
+        ]
+    )
+
+
+def _batches(rows: Iterable[Sequence], schema) -> Iterator:
+    """Group rows into record batches of ``EXPORT_BATCH_SIZE``."""
+
+    def to_batch(batch: List[Sequence]):
+        columns = []
+        for index, column in enumerate(schema):
+            values = [row[index] for row in batch]
+            if column.name in DICTIONARY_COLUMNS:
+                columns.append(pyarrow.array(values, pyarrow.string()).dictionary_encode())
+            else:
+                columns.append(pyarrow.array(values, column.type))
+        return pyarrow.RecordBatch.from_arrays(columns, schema=schema)
+
+    batch: List[Sequence] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= settings.export_batch_size:
+            yield to_batch(batch)
+            batch = []
+    if batch:
+        yield to_batch(batch)
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose bytes are handed to the response as they come.
+
+    Keeps counting positions after a drain, as Parquet records absolute
+    offsets of its row groups in the footer.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_columnar(rows: Iterable[Sequence], open_writer) -> Iterator[bytes]:
+    schema = arrow_schema()
+    sink = _Drain()
+    writer = open_writer(sink, schema)
+    for batch in _batches(rows, schema):
+        writer.write_batch(batch)
+        if data := sink.drain():
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def iter_parquet(rows: Iterable[Sequence]) -> Iterator[bytes]:
+    return _iter_columnar(
+        rows,
+        lambda sink, schema: pyarrow.parquet.ParquetWriter(
+            sink, schema, use_dictionary=sorted(DICTIONARY_COLUMNS), compression="zstd"
+        ),
+    )
+
+
+def iter_arrow(rows: Iterable[Sequence]) -> Iterator[bytes]:
+    return _iter_columnar(rows, pyarrow.ipc.new_stream)
+
+
+ENCODERS: Dict[str, Callable[[Iterable[Sequence]], Iterator]] = {
+    "csv": iter_csv,
+    "json": iter_json_array,
+    "ndjson": iter_ndjson,
+    "parquet": iter_parquet,
+    "arrow": iter_arrow,
+}
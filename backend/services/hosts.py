@@ -0,0 +1,50 @@
+"""Lookup and registration of ``Host`` rows by the names jobs use.
+
+Jobs and API requests name hosts by hostname, alias or IP address; these
+helpers map such names onto the ``Host`` table.
+"""
+
+from typing import Dict, Iterable
+
+from sqlmodel import Session, or_, select
+
+from core.config import settings
+from db import get_session
+from models.host import Host
+
+
+def hosts_by_name(names: Iterable[str]) -> Dict[str, Host]:
+    """Load ``Host`` rows matching ``names`` by hostname, alias or IP address."""
+    names = list(names)
+    session: Session = get_session()
+    with session:
+        rows = session.exec(
+            select(Host).where(
+                or_(Host.hostname.in_(names), Host.alias.in_(names), Host.ip_address.in_(names))
+            )
+        ).all()
+    known: Dict[str, Host] = {}
+    for row in rows:
+        known.setdefault(row.hostname, row)
+        for name in (row.alias, row.ip_address):
+            if name:
+                known.setdefault(name, row)
+    return known
+
+
+def get_or_create_host(session: Session, host: str) -> Host:
+    """The ``Host`` named ``host``, adding one for names nothing matches.
+
+    A hostname match wins over an alias or IP address match, as in
+    ``hosts_by_name``.
+    """
+    host_row = session.exec(
+        select(Host)
+        .where(or_(Host.hostname == host, Host.alias == host, Host.ip_address == host))
+        .order_by(Host.hostname != host, Host.id)
+    ).first()
+    if not host_row:
+        host_row = Host(hostname=host, ssh_user=settings.ssh_user)
+        session.add(host_row)
+        session.flush()
+    return host_row
@@ -0,0 +1,129 @@
+"""Bulk ingest of per-rule scan results.
+
+A STIG scan produces thousands of ``ScanRuleResult`` rows per host.  Rather
+than building an ORM instance for each one, rows (catalog id, severity and
+status codes) are streamed straight from the parser into the database in
+batches:
+
+- PostgreSQL: ``COPY ... FROM STDIN`` on the session's psycopg2 connection
+- Other dialects (SQLite): batched ``executemany`` of a Core ``INSERT``
+
+Rows go through the caller's session/transaction, so a scan and its rule
+results are committed (or rolled back) together.
+"""
+
+import csv
+import io
+from itertools import islice
+from typing import Collection, Iterable, Iterator, List
+
+from sqlalchemy import insert, literal, select
+from sqlmodel import Session
+
+from core.config import settings
+from models.rule_catalog import RuleCatalog
+from models.scan import ScanRuleResult
+from models.types import RuleStatus, Severity
+from schemas.audit import RuleResult
+from services.rule_catalog import CatalogResolver
+
+
+_COLUMNS = ("scan_result_id", "rule_catalog_id", "severity", "status")
+
+
+def _batches(rules: Iterable[RuleResult], size: int) -> Iterator[List[RuleResult]]:
+    iterator = iter(rules)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _rows(
+    scan_result_id: int, batch: List[RuleResult], catalog: CatalogResolver
+) -> List[tuple]:
+    # Severity and status are normalized to their SMALLINT codes here, once
+    return [
+        (
+            scan_result_id,
+            catalog.id_for(rule),
+            int(Severity.normalize(rule.severity)),
+            int(RuleStatus.normalize(rule.status)),
+        )
+        for rule in batch
+    ]
+
+
+def _copy_batch(session: Session, rows: List[tuple]) -> None:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    raw_connection = session.connection().connection.driver_connection
+    with raw_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {ScanRuleResult.__tablename__} ({', '.join(_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def _insert_batch(session: Session, rows: List[tuple]) -> None:
+    session.execute(
+        insert(ScanRuleResult.__table__), [dict(zip(_COLUMNS, row)) for row in rows]
+    )
+
+
+def bulk_insert_rule_results(
+    session: Session,
+    scan_result_id: int,
+    rules: Iterable[RuleResult],
+    catalog: CatalogResolver,
+    batch_size: int | None = None,
+) -> int:
+    """Insert ``rules`` for ``scan_result_id`` in batches; return the row count.
+
+    ``rules`` may be a generator — it is consumed one batch at a time, so the
+    full result set never has to be materialised.  Rule text is not stored
+    per row; ``catalog`` maps each rule to its ``RuleCatalog`` id.  The
+    caller commits.
+    """
+    size = batch_size or settings.ingest_batch_size
+    use_copy = session.get_bind().dialect.name == "postgresql"
+    write_batch = _copy_batch if use_copy else _insert_batch
+
+    inserted = 0
+    for batch in _batches(rules, size):
+        write_batch(session, _rows(scan_result_id, batch, catalog))
+        inserted += len(batch)
+    return inserted
+
+
+def copy_rule_results(
+    session: Session,
+    source_scan_id: int,
+    target_scan_id: int,
+    exclude_rule_ids: Collection[str] = (),
+) -> int:
+    """Copy a scan's rule results to another scan inside the database.
+
+    Rules in ``exclude_rule_ids`` are skipped (they were re-evaluated).  Rows
+    keep their original catalog entry.  Returns the number of rows copied.
+    """
+    query = select(
+        literal(target_scan_id),
+        ScanRuleResult.rule_catalog_id,
+        ScanRuleResult.severity,
+        ScanRuleResult.status,
+    ).where(ScanRuleResult.scan_result_id == source_scan_id)
+    if exclude_rule_ids:
+        query = query.where(
+            ScanRuleResult.rule_catalog_id.not_in(
+                select(RuleCatalog.id).where(RuleCatalog.rule_id.in_(list(exclude_rule_ids)))
+            )
+        )
+    result = session.execute(
+        insert(ScanRuleResult.__table__).from_select(list(_COLUMNS), query)
+    )
+    return result.rowcount
@@ -0,0 +1,48 @@
+"""In-process executor for long-running background jobs.
+
+Request handlers submit a coroutine and return immediately; the executor
+keeps a reference to the running task (so it is not garbage collected),
+logs failures, and cancels whatever is still running on shutdown.
+"""
+
+import asyncio
+import logging
+from typing import Coroutine, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class JobExecutor:
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, key: str, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=key)
+        self._tasks[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        self._tasks.pop(key, None)
+        if task.cancelled():
+            logger.warning("Background job %s was cancelled", key)
+        elif task.exception() is not None:
+            logger.error("Background job %s failed", key, exc_info=task.exception())
+
+    def is_running(self, key: str) -> bool:
+        return key in self._tasks
+
+    def cancel(self, key: str) -> bool:
+        task = self._tasks.get(key)
+        if task is None:
+            return False
+        return task.cancel()
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+executor = JobExecutor()
@@ -1,5 +1,4 @@
 import asyncio
-import os
 from typing import List
 
 import ansible_runner
@@ -8,11 +7,10 @@ from sqlmodel import Session
 from core.config import settings
 from db import get_session
 from models.job import MitigationJob
+from services.scheduler import scheduler, targets_for_hosts
 from services.ws_manager import manager
 
 
-_MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT_HOSTS", "10"))
-_SEMAPHORE = asyncio.Semaphore(_MAX_CONCURRENT)
 def _emit(job_id: str, payload: dict) -> None:
     asyncio.run(manager.broadcast(job_id, payload))
 
@@ -50,6 +48,16 @@ def _run_ansible(
     _emit(job_id, {"event": "mitigate.complete", "status": runner.status})
 
 
+def _set_job_status(job_id: int, status: str) -> None:
+    session: Session = get_session()
+    with session:
+        job = session.get(MitigationJob, job_id)
+        if job:
+            job.status = status
+            session.add(job)
+            session.commit()
+
+
 async def run_mitigation(
     hosts: List[str],
     distro: str,
@@ -57,32 +65,29 @@ async def run_mitigation(
     playbook_path: str,
     dry_run: bool,
 ) -> tuple[int, str]:
-    async with _SEMAPHORE:
-        session: Session = get_session()
-        with session:
-            job = MitigationJob(
-                distro=distro,
-                profile_name=profile_name,
-                dry_run=dry_run,
-                status="running",
-                host_count=len(hosts),
-            )
-            session.add(job)
-            session.commit()
-            session.refresh(job)
+    session: Session = get_session()
+    with session:
+        job = MitigationJob(
+            distro=distro,
+            profile_name=profile_name,
+            dry_run=dry_run,
+            status="pending",
+            host_count=len(hosts),
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+    job_id = job.id
 
+    # The playbook covers every host at once, so it holds a slot per host
+    targets = await asyncio.to_thread(targets_for_hosts, hosts)
+    async with scheduler.slot(f"mitigate-{job_id}", targets):
+        _set_job_status(job_id, "running")
         inventory = settings.ansible_inventory or ",".join(hosts) + ","
 
         await asyncio.to_thread(
-            _run_ansible, str(job.id), playbook_path, inventory, hosts, dry_run
+            _run_ansible, str(job_id), playbook_path, inventory, hosts, dry_run
         )
 
-        session = get_session()
-        with session:
-            job = session.get(MitigationJob, job.id)
-            if job:
-                job.status = "completed"
-                session.add(job)
-                session.commit()
-
-        return job.id, "completed"
+    _set_job_status(job_id, "completed")
+    return job_id, "completed"
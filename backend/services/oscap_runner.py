@@ -0,0 +1,241 @@
+"""Asynchronous ``oscap`` / ``oscap-ssh`` runner.
+
+Scans run as native asyncio subprocesses instead of ``subprocess.run`` in a
+worker thread, so hundreds of concurrent hosts cost no threads.  oscap's
+default stdout is read line by line while the scan runs::
+
+    Title   Ensure /tmp Located On Separate Partition
+    Rule    xccdf_org.ssgproject.content_rule_partition_for_tmp
+    Result  fail
+
+and every ``Rule``/``Result`` pair is reported to an ``on_result`` callback.
+Each scan runs in its own process group; on timeout or task cancellation the
+whole group (``oscap-ssh`` and its ``ssh`` child) is killed and reaped.
+Killing the local ssh client does not stop ``oscap`` on the target, so remote
+scans also pass an ``on_abort`` hook that kills it there
+(``kill_remote_oscap``) over the pooled connection.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import re
+import shlex
+import signal
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from services.ssh_pool import SSHEndpoint, endpoint_for, ssh_pool
+
+logger = logging.getLogger(__name__)
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1"}
+# oscap exits 0 when every rule passed and 2 when at least one failed
+_OK_RETURN_CODES = {0, 2}
+_STDERR_TAIL = 4096
+_REMOTE_KILL_TIMEOUT = 10
+
+ResultCallback = Callable[[str, str], Awaitable[None]]
+AbortHook = Callable[[], Awaitable[None]]
+StartHook = Callable[[], None]
+OutputHook = Callable[[str], None]
+
+# oscap-ssh: "Copying input file '...' to remote working directory '/tmp/tmp.x'..."
+_OSCAP_SSH_WORKDIR = re.compile(r"remote working directory '([^']+)'")
+
+
+class OscapError(RuntimeError):
+    """oscap exited with an error (not merely failing rules)."""
+
+    def __init__(self, returncode: int, stderr: str) -> None:
+        super().__init__(f"oscap exited with status {returncode}: {stderr.strip()}")
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def is_local_host(host: str) -> bool:
+    return host in LOCAL_HOSTS
+
+
+def build_oscap_command(
+    host: str,
+    profile_name: str,
+    xccdf_path: str,
+    output_path: Path,
+    tailoring_path: Optional[Path] = None,
+    endpoint: Optional[SSHEndpoint] = None,
+) -> List[str]:
+    """Return the ``oscap`` (local) or ``oscap-ssh`` (remote) command line.
+
+    ``oscap-ssh`` copies a ``--tailoring-file`` to the target itself; its
+    key, jump host and pooled connection come from ``oscap_ssh_env``.
+    """
+    eval_args = ["xccdf", "eval", "--profile", profile_name]
+    if tailoring_path is not None:
+        eval_args += ["--tailoring-file", str(tailoring_path)]
+    eval_args += ["--results", str(output_path), xccdf_path]
+    if is_local_host(host):
+        return ["oscap", *eval_args]
+    endpoint = endpoint or endpoint_for(host)
+    return ["oscap-ssh", endpoint.destination, str(endpoint.port), *eval_args]
+
+
+def oscap_ssh_env(endpoint: SSHEndpoint) -> Dict[str, str]:
+    """Environment making ``oscap-ssh`` reuse the pooled SSH master."""
+    return {
+        **os.environ,
+        "SSH_ADDITIONAL_OPTIONS": shlex.join(ssh_pool.client_options(endpoint)),
+    }
+
+
+def parse_progress_line(line: str) -> tuple[str, str] | None:
+    """Split an oscap output line into ``(field, value)`` for Rule/Result lines."""
+    parts = line.split(None, 1)
+    if len(parts) == 2 and parts[0] in {"Rule", "Result"}:
+        return parts[0], parts[1].strip()
+    return None
+
+
+class OscapSshRun:
+    """``on_output`` / ``on_abort`` pair stopping one ``oscap-ssh`` scan on its target.
+
+    ``oscap-ssh`` evaluates in a fresh ``mktemp -d`` directory on the target
+    and names it before starting ``oscap``.  Only processes whose command
+    line holds that directory are killed, so other scans of the same host
+    and profile (other jobs, queue workers) are left alone.
+    """
+
+    def __init__(self, endpoint: SSHEndpoint) -> None:
+        self.endpoint = endpoint
+        self.workdir = ""
+
+    def on_output(self, line: str) -> None:
+        match = _OSCAP_SSH_WORKDIR.search(line)
+        if match:
+            self.workdir = match.group(1)
+
+    async def on_abort(self) -> None:
+        # Without the directory, oscap was not started on the target yet
+        if self.workdir:
+            await kill_remote_oscap(self.endpoint, f"{self.workdir}/")
+
+
+async def kill_remote_oscap(endpoint: SSHEndpoint, pattern: str) -> None:
+    """Best effort: kill processes on ``endpoint`` whose command line matches ``pattern``.
+
+    ``pattern`` is an extended regex for ``pkill -f``; plain paths and ids
+    are fine.  Never raises for connection problems: the scan is already
+    being torn down.
+    """
+    # "[o]scap" matches "oscap" but not the remote shell carrying this pattern
+    pattern = f"[{pattern[0]}]{pattern[1:]}"
+    try:
+        await ssh_pool.run(
+            endpoint,
+            f"pkill -KILL -f -- {shlex.quote(pattern)}",
+            timeout=_REMOTE_KILL_TIMEOUT,
+        )
+    except (OSError, TimeoutError) as exc:
+        logger.warning("Could not stop oscap on %s: %s", endpoint.destination, exc)
+
+
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+    await process.wait()
+
+
+async def _read_tail(stream: asyncio.StreamReader) -> str:
+    tail = b""
+    while chunk := await stream.read(65536):
+        tail = (tail + chunk)[-_STDERR_TAIL:]
+    return tail.decode(errors="replace")
+
+
+async def _follow_stdout(
+    stream: asyncio.StreamReader,
+    on_result: Optional[ResultCallback],
+    on_output: Optional[OutputHook] = None,
+) -> None:
+    rule_id = ""
+    while line := await stream.readline():
+        text = line.decode(errors="replace")
+        parsed = parse_progress_line(text)
+        if parsed is None:
+            if on_output is not None:
+                on_output(text)
+            continue
+        field, value = parsed
+        if field == "Rule":
+            rule_id = value
+        elif rule_id:
+            if on_result is not None:
+                await on_result(rule_id, value.lower())
+            rule_id = ""
+
+
+async def run_oscap(
+    command: List[str],
+    on_result: Optional[ResultCallback] = None,
+    timeout: Optional[float] = None,
+    env: Optional[Dict[str, str]] = None,
+    on_abort: Optional[AbortHook] = None,
+    on_start: Optional[StartHook] = None,
+    on_output: Optional[OutputHook] = None,
+) -> int:
+    """Run an oscap command, streaming per-rule results; return its exit code.
+
+    Raises ``TimeoutError`` when ``timeout`` seconds elapse and ``OscapError``
+    on an oscap failure.  The process is killed on timeout or cancellation,
+    and ``on_abort`` is awaited afterwards to stop the scan on the target.
+    ``on_start`` is called once the process has been launched, and
+    ``on_output`` with every other stdout line than the progress ones.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+        env=env,
+    )
+    if on_start is not None:
+        on_start()
+    stderr_task = asyncio.create_task(_read_tail(process.stderr))
+    try:
+        async with asyncio.timeout(timeout):
+            await _follow_stdout(process.stdout, on_result, on_output)
+            returncode = await process.wait()
+    except BaseException:
+        await _kill(process)
+        stderr_task.cancel()
+        if on_abort is not None:
+            await on_abort()
+        raise
+    stderr = await stderr_task
+
+    if returncode not in _OK_RETURN_CODES:
+        raise OscapError(returncode, stderr)
+    return returncode
+
+
+class ProgressThrottle:
+    """Let through at most one update per ``interval`` seconds.
+
+    Updates arriving in between are dropped; callers always send the final
+    state themselves, so nothing is lost except intermediate ticks.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._last = float("-inf")
+
+    def ready(self) -> bool:
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return False
+        self._last = now
+        return True
@@ -0,0 +1,203 @@
+"""Executors for the two blocking stages of an audit.
+
+Once ``oscap`` has written a host's results file, the remaining work is
+split so that none of it runs on the event loop:
+
+- parse stage: XCCDF results are parsed in a ``ProcessPoolExecutor``
+  (``AUDIT_PARSE_WORKERS`` processes, default one per CPU), so lxml work for
+  many hosts runs in parallel and outside the GIL.  Workers only return
+  compact ``(rule_id, severity, status)`` tuples.
+- writer stage: catalog lookups and the bulk insert run on a small thread
+  pool (``AUDIT_DB_WRITERS`` threads, default 1) that owns all audit DB
+  writes, keeping writers from contending for the same tables/locks.
+
+``run_streamed()`` connects the two: the parse process sends its rows in
+batches of ``INGEST_BATCH_SIZE`` through a bounded queue, and the writer
+inserts them as they arrive, so a host's results are never held in memory
+all at once.
+
+The pools and the queue manager are created lazily and torn down by
+``shutdown_pipeline()``.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from multiprocessing.managers import SyncManager
+from queue import Empty
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+from core.config import settings
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_writer_pool: Optional[ThreadPoolExecutor] = None
+_manager: Optional[SyncManager] = None
+
+# Batches in flight between the parse and writer stages of one host
+STREAM_QUEUE_BATCHES = 4
+# End-of-stream markers; batches are lists
+_DONE = "done"
+_FAILED = "failed"
+_POLL_INTERVAL = 0.5
+
+
+def _parse_executor() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _lock:
+        if _parse_pool is None:
+            workers = settings.audit_parse_workers or os.cpu_count() or 1
+            # spawn: never fork a process that is running an event loop and
+            # DB connection pools
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+
+def _writer_executor() -> ThreadPoolExecutor:
+    global _writer_pool
+    with _lock:
+        if _writer_pool is None:
+            _writer_pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.audit_db_writers),
+                thread_name_prefix="audit-db-writer",
+            )
+        return _writer_pool
+
+
+def _queue_manager() -> SyncManager:
+    global _manager
+    with _lock:
+        if _manager is None:
+            # Plain multiprocessing queues cannot be handed to pool workers
+            _manager = multiprocessing.get_context("spawn").Manager()
+        return _manager
+
+
+async def _run(executor: Executor, func: Callable[..., T], *args) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+async def run_parse(func: Callable[..., T], *args) -> T:
+    """Run a picklable, CPU-bound ``func`` in the parse process pool."""
+    return await _run(_parse_executor(), func, *args)
+
+
+async def run_write(func: Callable[..., T], *args) -> T:
+    """Run ``func`` on the DB writer stage."""
+    return await _run(_writer_executor(), func, *args)
+
+
+class StreamError(RuntimeError):
+    """The parse stage failed part-way through a streamed result."""
+
+
+def _produce(queue, func: Callable[..., Iterable[Any]], args: tuple, batch_size: int) -> None:
+    """Parse process side of ``run_streamed``: push ``func(*args)`` in batches."""
+    try:
+        rows = iter(func(*args))
+        while batch := list(islice(rows, batch_size)):
+            queue.put(batch)
+    except Exception as exc:
+        queue.put(_FAILED)
+        # Parser errors (lxml's among them) do not always survive pickling
+        raise StreamError(f"{type(exc).__name__}: {exc}") from None
+    except BaseException:
+        queue.put(_FAILED)
+        raise
+    queue.put(_DONE)
+
+
+class _RowStream:
+    """Writer side of ``run_streamed``: rows in the order they were parsed."""
+
+    def __init__(self, queue, parse_done: threading.Event) -> None:
+        self._queue = queue
+        self._parse_done = parse_done
+        self.finished = False
+
+    def _get(self) -> Any:
+        while True:
+            try:
+                return self._queue.get(timeout=_POLL_INTERVAL)
+            except Empty:
+                # The parse worker died without getting to say so
+                if self._parse_done.is_set():
+                    self.finished = True
+                    return _FAILED
+
+    def __iter__(self) -> Iterator[Any]:
+        while not self.finished:
+            item = self._get()
+            if item == _DONE:
+                self.finished = True
+            elif item == _FAILED:
+                self.finished = True
+                raise StreamError("parsing stopped before the end of the results")
+            else:
+                yield from item
+
+    def drain(self) -> None:
+        """Discard what is left, so a blocked producer can finish."""
+        while not self.finished:
+            self.finished = self._get() in (_DONE, _FAILED)
+
+
+def _write_stream(queue, parse_done: threading.Event, func: Callable[..., T], args: tuple) -> T:
+    rows = _RowStream(queue, parse_done)
+    try:
+        return func(rows, *args)
+    finally:
+        rows.drain()
+
+
+async def run_streamed(
+    parse_func: Callable[..., Iterable[Any]],
+    parse_args: tuple,
+    write_func: Callable[..., T],
+    *write_args,
+) -> T:
+    """Run ``write_func(rows, *write_args)`` while ``parse_func(*parse_args)`` parses.
+
+    ``parse_func`` must be picklable and return an iterable; its rows reach
+    the writer in batches as they are produced.  If parsing fails, ``rows``
+    raises ``StreamError`` (so the writer's transaction is rolled back) and
+    so does this call, with the parse error as its message.
+    """
+    queue = _queue_manager().Queue(maxsize=STREAM_QUEUE_BATCHES)
+    parse_done = threading.Event()
+    parse = asyncio.ensure_future(
+        _run(_parse_executor(), _produce, queue, parse_func, parse_args, settings.ingest_batch_size)
+    )
+    parse.add_done_callback(lambda _: parse_done.set())
+    parsed, written = await asyncio.gather(
+        parse,
+        _run(_writer_executor(), _write_stream, queue, parse_done, write_func, write_args),
+        return_exceptions=True,
+    )
+    for outcome in (parsed, written):
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return written
+
+
+def shutdown_pipeline(wait: bool = True) -> None:
+    """Stop both pools and the queue manager; they are recreated on next use."""
+    global _parse_pool, _writer_pool, _manager
+    with _lock:
+        parse_pool, writer_pool, manager = _parse_pool, _writer_pool, _manager
+        _parse_pool = _writer_pool = _manager = None
+    if parse_pool is not None:
+        parse_pool.shutdown(wait=wait, cancel_futures=True)
+    if writer_pool is not None:
+        writer_pool.shutdown(wait=wait, cancel_futures=True)
+    if manager is not None:
+        manager.shutdown()
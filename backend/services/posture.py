@@ -0,0 +1,114 @@
+"""Current fleet posture, maintained as scans are stored.
+
+``HostLatestScan`` keeps one row per host (its latest completed scan) and
+``HostRulePosture`` one row per host x rule of that scan (the rule's status
+in it).  Both are updated in the transaction that persists
+a scan, so the dashboard reads the fleet's current state with small indexed
+queries instead of aggregating the whole ``ScanRuleResult`` history.
+"""
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from models.posture import HostLatestScan, HostRulePosture
+from models.rule_catalog import RuleCatalog
+from models.scan import ScanResult, ScanRuleResult
+
+_POSTURE_COLUMNS = (
+    "host_id",
+    "rule_id",
+    "rule_catalog_id",
+    "scan_result_id",
+    "severity",
+    "status",
+    "scanned_at",
+)
+
+
+def update_host_posture(session: Session, scan: ScanResult) -> None:
+    """Make ``scan`` (persisted, with its rule results) the host's current state.
+
+    Both tables are upserted, so overlapping scans of one host never hit
+    each other's primary keys; a row only moves forward, to the scan started
+    last.  Posture rows of rules ``scan`` did not evaluate (another profile,
+    or rules since dropped from the content) are deleted unless a later scan
+    wrote them.  The caller commits.
+    """
+    if scan.host_id is None:
+        return
+    dialect = session.get_bind().dialect.name
+    insert_ = pg_insert if dialect == "postgresql" else sqlite_insert
+
+    latest = insert_(HostLatestScan.__table__).values(
+        host_id=scan.host_id,
+        scan_result_id=scan.id,
+        audit_job_id=scan.audit_job_id,
+        distro=scan.distro,
+        profile_name=scan.profile_name,
+        score=scan.score,
+        passed=scan.passed,
+        failed=scan.failed,
+        other=scan.other,
+        scanned_at=scan.created_at,
+    )
+    table = HostLatestScan.__table__
+    session.execute(
+        latest.on_conflict_do_update(
+            index_elements=["host_id"],
+            set_={
+                column.name: latest.excluded[column.name]
+                for column in table.columns if column.name != "host_id"
+            },
+            where=latest.excluded.scanned_at >= table.c.scanned_at,
+        )
+    )
+
+    # The last result of each rule in this scan (a rule may be reported twice)
+    rows = (
+        select(func.max(ScanRuleResult.id))
+        .join(RuleCatalog, RuleCatalog.id == ScanRuleResult.rule_catalog_id)
+        .where(ScanRuleResult.scan_result_id == scan.id)
+        .group_by(RuleCatalog.rule_id)
+    )
+    posture = insert_(HostRulePosture.__table__).from_select(
+        list(_POSTURE_COLUMNS),
+        select(
+            literal(scan.host_id),
+            RuleCatalog.rule_id,
+            ScanRuleResult.rule_catalog_id,
+            ScanRuleResult.scan_result_id,
+            ScanRuleResult.severity,
+            ScanRuleResult.status,
+            literal(scan.created_at),
+        )
+        .join(RuleCatalog, RuleCatalog.id == ScanRuleResult.rule_catalog_id)
+        .where(ScanRuleResult.id.in_(rows)),
+    )
+    table = HostRulePosture.__table__
+    session.execute(
+        posture.on_conflict_do_update(
+            index_elements=["host_id", "rule_id"],
+            set_={column: posture.excluded[column] for column in _POSTURE_COLUMNS[2:]},
+            where=posture.excluded.scanned_at >= table.c.scanned_at,
+        )
+    )
+    scanned_rules = (
+        select(RuleCatalog.rule_id)
+        .join(ScanRuleResult, ScanRuleResult.rule_catalog_id == RuleCatalog.id)
+        .where(ScanRuleResult.scan_result_id == scan.id)
+    )
+    session.execute(
+        delete(HostRulePosture).where(
+            HostRulePosture.host_id == scan.host_id,
+            HostRulePosture.scanned_at < scan.created_at,
+            HostRulePosture.rule_id.not_in(scanned_rules),
+        )
+    )
+
+
+def clear_host_posture(session: Session, host_id: int) -> None:
+    """Forget a host's posture (host deleted).  The caller commits."""
+    session.execute(delete(HostRulePosture).where(HostRulePosture.host_id == host_id))
+    session.execute(delete(HostLatestScan).where(HostLatestScan.host_id == host_id))
@@ -0,0 +1,196 @@
+"""Remote scan driver with a content-addressed datastream cache on targets.
+
+``oscap-ssh`` copies the whole datastream (tens of MB for RHEL content) to
+the target on every scan.  With ``REMOTE_SCAN_DRIVER=cached`` the backend
+instead keeps one copy per datastream version on each target::
+
+    ~/.cache/streamguard/<sha256>/ssg-rhel9-ds.xml
+
+Before a scan the target is asked for the file's ``sha256sum``; only when it
+is missing or does not match is the datastream uploaded (gzip-compressed,
+then verified before it is moved into place).  ``oscap`` then runs on the
+target against the cached copy, its per-rule progress is streamed back
+exactly as with a local scan, and the results file comes back through
+``gzip -c``.  Every step rides on the pooled SSH master (see ``ssh_pool``).
+
+Cache directories not used for ``REMOTE_CACHE_RETENTION_DAYS`` are pruned
+whenever a new datastream version is uploaded to the host.
+"""
+
+import asyncio
+import functools
+import gzip
+import os
+import shlex
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from core.config import settings
+from services.artifacts import artifact_store
+from services.oscap_runner import ResultCallback, StartHook, kill_remote_oscap, run_oscap
+from services.rule_metadata import rule_metadata_cache
+from services.ssh_pool import SSHEndpoint, ssh_pool
+
+_CHUNK_SIZE = 1024 * 1024
+_COMMAND_TIMEOUT = 60
+
+
+class RemoteCommandError(RuntimeError):
+    """A helper command on the target failed."""
+
+    def __init__(self, step: str, returncode: int, stderr: bytes) -> None:
+        message = stderr.decode(errors="replace").strip()
+        super().__init__(f"{step} failed with status {returncode}: {message}")
+        self.returncode = returncode
+
+
+def _cache_root() -> str:
+    return settings.remote_cache_dir.rstrip("/") or "."
+
+
+def remote_datastream_path(digest: str, xccdf_path: str) -> str:
+    """Location of the cached datastream on the target."""
+    return f"{_cache_root()}/{digest}/{os.path.basename(xccdf_path)}"
+
+
+def _compressed_upload(digest: str, source: Path) -> Path:
+    """Gzip ``source`` once per digest and return the compressed copy."""
+    uploads = artifact_store.root / "uploads"
+    target = uploads / f"{digest}.xml.gz"
+    if target.exists():
+        return target
+    uploads.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=uploads, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw_out, open(source, "rb") as src:
+            with gzip.GzipFile(fileobj=raw_out, mode="wb", compresslevel=6) as writer:
+                shutil.copyfileobj(src, writer, _CHUNK_SIZE)
+        os.replace(tmp_name, target)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+    return target
+
+
+def _upload_script(digest: str, remote_path: str) -> str:
+    remote = shlex.quote(remote_path)
+    directory = shlex.quote(os.path.dirname(remote_path))
+    script = (
+        f"set -e; mkdir -p {directory}; tmp={remote}.$$; "
+        "trap 'rm -f \"$tmp\"' EXIT; "
+        'gzip -dc > "$tmp"; '
+        f'echo "{digest}  $tmp" | sha256sum -c --status; '
+        f'mv "$tmp" {remote}'
+    )
+    if settings.remote_cache_retention_days > 0:
+        script += (
+            f"; find {shlex.quote(_cache_root())} -mindepth 1 -maxdepth 1 -type d"
+            f" -mtime +{settings.remote_cache_retention_days} ! -name {digest}"
+            " -exec rm -rf {} +"
+        )
+    return script
+
+
+async def ensure_remote_datastream(endpoint: SSHEndpoint, xccdf_path: str) -> str:
+    """Make sure the target holds ``xccdf_path``; return its remote path.
+
+    Nothing is transferred when the cached copy's sha256 already matches.
+    """
+    digest = await asyncio.to_thread(rule_metadata_cache.fingerprint, xccdf_path)
+    remote_path = remote_datastream_path(digest, xccdf_path)
+    quoted = shlex.quote(remote_path)
+    returncode, stdout, _ = await ssh_pool.run(
+        endpoint,
+        # touch keeps a datastream in use safe from retention pruning
+        f"sha256sum {quoted} 2>/dev/null && touch {shlex.quote(os.path.dirname(remote_path))}",
+        timeout=_COMMAND_TIMEOUT,
+    )
+    if returncode == 0 and stdout.split()[:1] == [digest.encode()]:
+        return remote_path
+
+    upload = await asyncio.to_thread(_compressed_upload, digest, Path(xccdf_path))
+    returncode, _, stderr = await ssh_pool.run(
+        endpoint,
+        _upload_script(digest, remote_path),
+        timeout=settings.audit_host_timeout or None,
+        stdin_path=upload,
+    )
+    if returncode != 0:
+        raise RemoteCommandError("datastream upload", returncode, stderr)
+    return remote_path
+
+
+def _decompress(source: Path, target: Path) -> None:
+    with gzip.open(source, "rb") as src, open(target, "wb") as out:
+        shutil.copyfileobj(src, out, _CHUNK_SIZE)
+
+
+async def run_remote_scan(
+    endpoint: SSHEndpoint,
+    profile_name: str,
+    xccdf_path: str,
+    output_path: Path,
+    on_result: Optional[ResultCallback] = None,
+    tailoring_path: Optional[Path] = None,
+    timeout: Optional[float] = None,
+    on_start: Optional[StartHook] = None,
+) -> None:
+    """Scan ``endpoint`` against its cached datastream.
+
+    The XCCDF results are written to ``output_path``.  ``on_start`` is
+    called when ``oscap`` is launched, after any datastream upload.  Raises
+    ``ConnectionError`` for unreachable hosts and ``OscapError`` /
+    ``RemoteCommandError`` when a step fails on the target.
+    """
+    # Held for the whole scan, so the master is not evicted under it
+    async with ssh_pool.lease(endpoint):
+        remote_datastream = await ensure_remote_datastream(endpoint, xccdf_path)
+        workdir = f"{_cache_root()}/runs/{uuid.uuid4().hex}"
+        quoted_workdir = shlex.quote(workdir)
+        eval_args = ["xccdf", "eval", "--profile", profile_name]
+        try:
+            if tailoring_path is not None:
+                returncode, _, stderr = await ssh_pool.run(
+                    endpoint,
+                    f"mkdir -p {quoted_workdir} && cat > {quoted_workdir}/tailoring.xml",
+                    timeout=_COMMAND_TIMEOUT,
+                    stdin_path=tailoring_path,
+                )
+                if returncode != 0:
+                    raise RemoteCommandError("tailoring upload", returncode, stderr)
+                eval_args += ["--tailoring-file", f"{workdir}/tailoring.xml"]
+            eval_args += ["--results", f"{workdir}/results.xml", remote_datastream]
+
+            await run_oscap(
+                ssh_pool.command(
+                    endpoint, f"mkdir -p {quoted_workdir} && {shlex.join(['oscap', *eval_args])}"
+                ),
+                on_result=on_result,
+                timeout=timeout,
+                # The run's workdir is unique, so only this scan is matched
+                on_abort=functools.partial(kill_remote_oscap, endpoint, f"{workdir}/results.xml"),
+                on_start=on_start,
+            )
+
+            compressed = output_path.with_name(output_path.name + ".gz")
+            try:
+                returncode, _, stderr = await ssh_pool.run(
+                    endpoint,
+                    f"gzip -c {quoted_workdir}/results.xml",
+                    timeout=_COMMAND_TIMEOUT if timeout is None else timeout,
+                    stdout_path=compressed,
+                )
+                if returncode != 0:
+                    raise RemoteCommandError("results download", returncode, stderr)
+                await asyncio.to_thread(_decompress, compressed, output_path)
+            finally:
+                compressed.unlink(missing_ok=True)
+        finally:
+            # Best effort: a dead connection must not mask the original error
+            try:
+                await ssh_pool.run(endpoint, f"rm -rf {quoted_workdir}", timeout=_COMMAND_TIMEOUT)
+            except (OSError, TimeoutError):
+                pass
@@ -0,0 +1,103 @@
+"""Daily compliance rollups behind the dashboard timeline.
+
+Every stored scan adds itself to its ``DailyComplianceRollup`` row (day,
+distro, profile, host group) with an atomic upsert in the scan's own
+transaction, so the timeline reads at most a few thousand rollup rows for a
+year instead of grouping raw ``ScanResult`` rows.
+
+Rollups keep the host group a scan had when it was stored.  After moving
+hosts between groups, or to rebuild the table for existing scans::
+
+    cd backend && python -m services.rollups [--since 2024-01-01]
+"""
+
+import argparse
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from db import get_session
+from models.host import Host
+from models.rollup import DailyComplianceRollup
+from models.scan import ScanResult
+
+_KEY = ("day", "distro", "profile_name", "host_group")
+_TOTALS = ("scans", "score_sum", "passed", "failed", "other")
+
+
+def record_scan_rollup(session: Session, scan: ScanResult, host_group: str) -> None:
+    """Add a completed ``scan`` to its day's rollup.  The caller commits."""
+    dialect = session.get_bind().dialect.name
+    insert_ = pg_insert if dialect == "postgresql" else sqlite_insert
+    values = {
+        "day": scan.created_at.date(),
+        "distro": scan.distro,
+        "profile_name": scan.profile_name,
+        "host_group": host_group,
+        "scans": 1,
+        "score_sum": scan.score,
+        "passed": scan.passed,
+        "failed": scan.failed,
+        "other": scan.other,
+    }
+    statement = insert_(DailyComplianceRollup.__table__).values(**values)
+    table = DailyComplianceRollup.__table__
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=list(_KEY),
+            set_={column: table.c[column] + statement.excluded[column] for column in _TOTALS},
+        )
+    )
+
+
+def rebuild_rollups(since: Optional[date] = None) -> int:
+    """Recompute rollups from ``ScanResult`` (from ``since`` on); return rows written."""
+    day = func.date(ScanResult.created_at)
+    aggregate = (
+        select(
+            day,
+            ScanResult.distro,
+            ScanResult.profile_name,
+            func.coalesce(Host.host_group, ""),
+            func.count(),
+            func.sum(ScanResult.score),
+            func.sum(ScanResult.passed),
+            func.sum(ScanResult.failed),
+            func.sum(ScanResult.other),
+        )
+        .join(Host, Host.id == ScanResult.host_id, isouter=True)
+        .where(ScanResult.status == "completed")
+        .group_by(day, ScanResult.distro, ScanResult.profile_name, func.coalesce(Host.host_group, ""))
+    )
+    clear = delete(DailyComplianceRollup)
+    if since is not None:
+        aggregate = aggregate.where(
+            ScanResult.created_at >= datetime.combine(since, datetime.min.time())
+        )
+        clear = clear.where(DailyComplianceRollup.day >= since)
+    session: Session = get_session()
+    with session:
+        session.execute(clear)
+        written = session.execute(
+            insert(DailyComplianceRollup.__table__).from_select(list(_KEY + _TOTALS), aggregate)
+        ).rowcount
+        session.commit()
+    return written
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild daily compliance rollups")
+    parser.add_argument(
+        "--since", type=date.fromisoformat, help="only rebuild days from this date (YYYY-MM-DD)"
+    )
+    args = parser.parse_args(argv)
+    written = rebuild_rollups(args.since)
+    print(f"Wrote {written} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
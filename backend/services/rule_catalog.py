@@ -0,0 +1,134 @@
+"""Versioned rule catalog.
+
+Rule text (title, description, rationale, fixtext) is identical for a given
+rule and content version, so it is stored once in ``RuleCatalog`` and scan
+rows only reference it.  The ``rule_id -> catalog id`` map for each content
+version is built once per process and shared by every host and job.
+"""
+
+import threading
+from typing import Dict, Iterable, List
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from core.config import settings
+from db import get_session
+from models.rule_catalog import RuleCatalog
+from schemas.audit import RuleResult
+
+
+_catalog_ids: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def _catalog_row(content_version: str, rule: RuleResult) -> dict:
+    return {
+        "content_version": content_version,
+        "rule_id": rule.rule_id,
+        "severity": rule.severity,
+        "title": rule.title,
+        "description": rule.description,
+        "rationale": rule.rationale,
+        "fixtext": rule.fixtext,
+    }
+
+
+def _insert_missing(session: Session, rows: List[dict]) -> None:
+    """Insert catalog rows, skipping ones another writer already created."""
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    table = RuleCatalog.__table__
+    if dialect == "postgresql":
+        stmt = postgresql.insert(table).on_conflict_do_nothing(
+            index_elements=["content_version", "rule_id"]
+        )
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table).on_conflict_do_nothing(
+            index_elements=["content_version", "rule_id"]
+        )
+    else:
+        stmt = insert(table)
+    batch_size = settings.ingest_batch_size
+    for start in range(0, len(rows), batch_size):
+        session.execute(stmt, rows[start:start + batch_size])
+
+
+def _load_ids(session: Session, content_version: str) -> Dict[str, int]:
+    return dict(
+        session.exec(
+            select(RuleCatalog.rule_id, RuleCatalog.id).where(
+                RuleCatalog.content_version == content_version
+            )
+        ).all()
+    )
+
+
+def ensure_rule_catalog(
+    content_version: str, metadata: Dict[str, RuleResult]
+) -> Dict[str, int]:
+    """Create catalog rows for every rule in ``metadata``; return ``rule_id -> id``.
+
+    Runs in its own committed transaction so the ids can be cached and used
+    by any later scan transaction.
+    """
+    with _lock:
+        cached = _catalog_ids.get(content_version)
+        if cached is not None and metadata.keys() <= cached.keys():
+            return cached
+
+        session: Session = get_session()
+        with session:
+            known = _load_ids(session, content_version)
+            missing = [
+                _catalog_row(content_version, rule)
+                for rule_id, rule in metadata.items()
+                if rule_id not in known
+            ]
+            if missing:
+                _insert_missing(session, missing)
+                session.commit()
+                known = _load_ids(session, content_version)
+
+        _catalog_ids[content_version] = known
+        return known
+
+
+class CatalogResolver:
+    """Map streamed rule results to catalog ids inside a scan transaction.
+
+    Rules missing from the datastream metadata get a catalog row on the fly,
+    written through the caller's session so they commit with the scan.
+    """
+
+    def __init__(
+        self, session: Session, content_version: str, known: Dict[str, int]
+    ) -> None:
+        self.session = session
+        self.content_version = content_version
+        self._known = known
+        self._extra: Dict[str, int] = {}
+
+    def id_for(self, rule: RuleResult) -> int:
+        catalog_id = self._known.get(rule.rule_id) or self._extra.get(rule.rule_id)
+        if catalog_id is None:
+            _insert_missing(self.session, [_catalog_row(self.content_version, rule)])
+            catalog_id = self.session.exec(
+                select(RuleCatalog.id).where(
+                    (RuleCatalog.content_version == self.content_version)
+                    & (RuleCatalog.rule_id == rule.rule_id)
+                )
+            ).one()
+            self._extra[rule.rule_id] = catalog_id
+        return catalog_id
+
+
+def clear_catalog_cache(content_versions: Iterable[str] | None = None) -> None:
+    with _lock:
+        if content_versions is None:
+            _catalog_ids.clear()
+            return
+        for version in content_versions:
+            _catalog_ids.pop(version, None)
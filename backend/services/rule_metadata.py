@@ -0,0 +1,148 @@
+"""Process-wide cache of XCCDF rule metadata, keyed by datastream version.
+
+Datastreams are 50–150 MB, and every host in every audit job needs the same
+titles, descriptions, rationales and fixtexts.  Each datastream is parsed
+once per content version (identified by its sha256) and the result is shared
+by all callers; the least recently used versions are evicted when the cache
+is full.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from lxml import etree
+
+from core.config import settings
+from schemas.audit import RuleResult
+from services.content_index import open_content_index
+from services.xccdf import find_descendant, iter_elements, text_content
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# (realpath, mtime_ns, size) -> sha256 hex digest
+_StatKey = Tuple[str, int, int]
+
+
+def load_rule_metadata(xccdf_path: str) -> Dict[str, RuleResult]:
+    """Load every ``Rule`` of a datastream / XCCDF benchmark (uncached).
+
+    Reads from the precompiled content index when one can be used, and only
+    streams the XML directly when the index cannot be built.
+    """
+    metadata: Dict[str, RuleResult] = {}
+    if not xccdf_path:
+        return metadata
+    index = open_content_index(xccdf_path)
+    if index is not None:
+        with index:
+            return index.rules()
+    try:
+        for rule in iter_elements(xccdf_path, {"Rule"}):
+            rule_id = rule.get("id", "")
+            if not rule_id:
+                continue
+            metadata[rule_id] = RuleResult(
+                rule_id=rule_id,
+                severity=rule.get("severity", "unknown"),
+                status="unknown",
+                title=text_content(find_descendant(rule, "title")),
+                description=text_content(find_descendant(rule, "description")),
+                rationale=text_content(find_descendant(rule, "rationale")),
+                fixtext=text_content(find_descendant(rule, "fixtext")),
+            )
+    except (OSError, etree.XMLSyntaxError) as exc:
+        logger.warning("Failed to load rule metadata from %s: %s", xccdf_path, exc)
+    return metadata
+
+
+class RuleMetadataCache:
+    """LRU cache of rule metadata with one entry per datastream version."""
+
+    def __init__(self, max_versions: int) -> None:
+        self.max_versions = max(1, max_versions)
+        self._entries: "OrderedDict[str, Dict[str, RuleResult]]" = OrderedDict()
+        self._digests: Dict[_StatKey, str] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def fingerprint(self, path: str) -> str:
+        """Return the sha256 of ``path``, hashing only when the file changed."""
+        real = os.path.realpath(path)
+        stat = os.stat(real)
+        key: _StatKey = (real, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest:
+            return digest
+
+        sha = hashlib.sha256()
+        with open(real, "rb") as fh:
+            for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._lock:
+            # Forget digests of older versions of the same file
+            for stale in [k for k in self._digests if k[0] == real]:
+                del self._digests[stale]
+            self._digests[key] = digest
+        return digest
+
+    def get(self, path: str) -> Dict[str, RuleResult]:
+        """Return rule metadata for ``path``, parsing it at most once per version."""
+        if not path:
+            return {}
+        try:
+            digest = self.fingerprint(path)
+        except OSError:
+            return {}
+
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+            loading = self._loading.setdefault(digest, threading.Lock())
+
+        # Only one caller parses a given version; the others wait for it.
+        with loading:
+            with self._lock:
+                if digest in self._entries:
+                    self._entries.move_to_end(digest)
+                    return self._entries[digest]
+            metadata = load_rule_metadata(path)
+            with self._lock:
+                self._entries[digest] = metadata
+                self._entries.move_to_end(digest)
+                while len(self._entries) > self.max_versions:
+                    evicted, _ = self._entries.popitem(last=False)
+                    logger.info("Evicted rule metadata for content version %s", evicted[:12])
+                self._loading.pop(digest, None)
+        return metadata
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+
+
+rule_metadata_cache = RuleMetadataCache(settings.rule_metadata_cache_size)
+
+
+def get_rule_metadata(xccdf_path: str) -> Dict[str, RuleResult]:
+    """Return shared, cached rule metadata for a datastream path."""
+    return rule_metadata_cache.get(xccdf_path)
+
+
+def get_content_version(xccdf_path: str) -> str:
+    """Return a short, stable identifier for the datastream's content version."""
+    if not xccdf_path:
+        return "unknown"
+    try:
+        return rule_metadata_cache.fingerprint(xccdf_path)[:16]
+    except OSError:
+        return "unknown"
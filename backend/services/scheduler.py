@@ -0,0 +1,286 @@
+"""Host concurrency scheduler for audits and mitigations.
+
+Every scan or playbook run asks the scheduler for a slot before it opens
+SSH connections.  Slots are limited at three levels:
+
+- globally, by ``MAX_CONCURRENT_HOSTS``
+- per SSH bastion (``Host.proxy_jump``), by ``MAX_HOSTS_PER_PROXY``
+- per subnet (``/SCHEDULER_SUBNET_PREFIX`` of the host address), by
+  ``MAX_HOSTS_PER_SUBNET``
+
+When a slot frees up it goes to the waiting job that currently holds the
+fewest slots, so a 500-host audit cannot starve a 5-host one.  A request
+larger than a limit waits until it reaches the head of that queue; from
+then on nothing backfills behind it and it runs once the limit drains.
+
+Per-bastion and per-subnet limits adapt AIMD-style: a run that finishes
+with acceptable latency raises its groups' limits by roughly one slot per
+"window", while an SSH connect failure or slow start halves them (never
+below one and never above the configured ceiling).  Hosts that are neither
+behind a bastion nor addressed by IP share a single ``direct`` group.
+"""
+
+import asyncio
+import ipaddress
+import math
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from models.host import Host
+from services.hosts import hosts_by_name
+
+Group = Tuple[str, str]
+
+# ssh exits 255 when the connection itself fails
+_SSH_FAILURE_CODE = 255
+
+
+@dataclass(frozen=True)
+class ScheduleTarget:
+    """A host and the network groups it shares capacity with."""
+
+    host: str
+    proxy_jump: str = ""
+    subnet: str = ""
+
+    @property
+    def groups(self) -> Tuple[Group, ...]:
+        groups: List[Group] = []
+        if self.proxy_jump:
+            groups.append(("proxy", self.proxy_jump))
+        if self.subnet:
+            groups.append(("subnet", self.subnet))
+        return tuple(groups) or (("direct", ""),)
+
+
+class AdaptiveLimit:
+    """Additive-increase / multiplicative-decrease concurrency limit."""
+
+    def __init__(self, ceiling: int, floor: int = 1) -> None:
+        self.ceiling = max(floor, ceiling)
+        self.floor = floor
+        self.value = float(self.ceiling)
+
+    @property
+    def limit(self) -> int:
+        return max(self.floor, math.floor(self.value))
+
+    def increase(self) -> None:
+        self.value = min(float(self.ceiling), self.value + 1.0 / max(self.value, 1.0))
+
+    def decrease(self) -> None:
+        self.value = max(float(self.floor), self.value / 2.0)
+
+
+@dataclass
+class Lease:
+    """Handle for a granted slot; lets the holder report connection latency."""
+
+    latency: Optional[float] = None
+
+    def observe_latency(self, seconds: float) -> None:
+        self.latency = seconds
+
+
+@dataclass
+class _Waiter:
+    targets: Sequence[ScheduleTarget]
+    future: asyncio.Future = field(repr=False)
+
+
+def is_connection_failure(exc: BaseException) -> bool:
+    """Whether ``exc`` signals an unreachable or overloaded SSH path.
+
+    Only connect and handshake failures count: a scan that times out after
+    connecting says nothing about the bastion or subnet in front of it.
+    """
+    if isinstance(exc, ConnectionError):
+        return True
+    return getattr(exc, "returncode", None) == _SSH_FAILURE_CODE
+
+
+class HostScheduler:
+    def __init__(
+        self,
+        global_limit: int,
+        proxy_limit: int,
+        subnet_limit: int,
+        latency_threshold: float,
+    ) -> None:
+        self.global_limit = max(1, global_limit)
+        self.latency_threshold = latency_threshold
+        self._ceilings = {
+            "proxy": proxy_limit or self.global_limit,
+            "subnet": subnet_limit or self.global_limit,
+            "direct": self.global_limit,
+        }
+        self._running = 0
+        self._running_by_job: Counter = Counter()
+        self._running_by_group: Counter = Counter()
+        self._limits: Dict[Group, AdaptiveLimit] = {}
+        self._waiters: Dict[str, Deque[_Waiter]] = {}
+
+    def group_limit(self, group: Group) -> AdaptiveLimit:
+        if group not in self._limits:
+            self._limits[group] = AdaptiveLimit(self._ceilings[group[0]])
+        return self._limits[group]
+
+    def _demand(self, targets: Sequence[ScheduleTarget]) -> Counter:
+        demand: Counter = Counter()
+        for target in targets:
+            demand.update(target.groups)
+        return demand
+
+    def _oversized(self, targets: Sequence[ScheduleTarget]) -> bool:
+        if len(targets) > self.global_limit:
+            return True
+        return any(
+            count > self.group_limit(group).limit
+            for group, count in self._demand(targets).items()
+        )
+
+    def _fits(self, targets: Sequence[ScheduleTarget]) -> bool:
+        # Requests larger than a limit are let through once it has drained.
+        if self._running and self._running + len(targets) > self.global_limit:
+            return False
+        for group, count in self._demand(targets).items():
+            running = self._running_by_group[group]
+            if running and running + count > self.group_limit(group).limit:
+                return False
+        return True
+
+    def _grant(self, job_key: str, waiter: _Waiter) -> None:
+        self._running += len(waiter.targets)
+        self._running_by_job[job_key] += len(waiter.targets)
+        self._running_by_group.update(self._demand(waiter.targets))
+        waiter.future.set_result(None)
+
+    def _next_fitting(self) -> Optional[Tuple[str, _Waiter]]:
+        eligible = []
+        for job_key, queue in self._waiters.items():
+            for waiter in queue:
+                if self._fits(waiter.targets):
+                    eligible.append((self._running_by_job[job_key], job_key, waiter))
+                    break
+        if not eligible:
+            return None
+        # Fair share: the job holding the fewest slots goes first; ties
+        # keep arrival order because dicts preserve insertion order.
+        _, job_key, waiter = min(eligible, key=lambda item: item[0])
+        return job_key, waiter
+
+    def _dispatch(self) -> None:
+        while self._waiters:
+            head_job = min(self._waiters, key=lambda key: self._running_by_job[key])
+            head = self._waiters[head_job][0]
+            if self._oversized(head.targets):
+                # Nothing may backfill behind an oversized request at the
+                # head of the queue, or the limits it needs would never drain.
+                if not self._fits(head.targets):
+                    return
+                chosen = (head_job, head)
+            else:
+                chosen = self._next_fitting()
+                if chosen is None:
+                    return
+            job_key, waiter = chosen
+            queue = self._waiters[job_key]
+            queue.remove(waiter)
+            if not queue:
+                del self._waiters[job_key]
+            self._grant(job_key, waiter)
+
+    def _release(self, job_key: str, targets: Sequence[ScheduleTarget]) -> None:
+        self._running -= len(targets)
+        self._running_by_job[job_key] -= len(targets)
+        if self._running_by_job[job_key] <= 0:
+            del self._running_by_job[job_key]
+        self._running_by_group.subtract(self._demand(targets))
+        self._running_by_group += Counter()  # drop zero counts
+        self._dispatch()
+
+    def _adapt(self, targets: Sequence[ScheduleTarget], healthy: bool) -> None:
+        for group in self._demand(targets):
+            limit = self.group_limit(group)
+            if healthy:
+                limit.increase()
+            else:
+                limit.decrease()
+
+    async def _acquire(self, job_key: str, targets: Sequence[ScheduleTarget]) -> None:
+        waiter = _Waiter(targets, asyncio.get_running_loop().create_future())
+        self._waiters.setdefault(job_key, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(job_key, targets)
+            else:
+                queue = self._waiters.get(job_key)
+                if queue and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._waiters[job_key]
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self, job_key: str, targets: Sequence[ScheduleTarget]
+    ) -> AsyncIterator[Lease]:
+        """Hold one slot per target for the duration of the block.
+
+        Connection failures raised inside the block (see
+        ``is_connection_failure``) and latencies above the threshold shrink
+        the targets' group limits; clean runs grow them.
+        """
+        await self._acquire(job_key, targets)
+        lease = Lease()
+        try:
+            yield lease
+        except BaseException as exc:
+            if is_connection_failure(exc):
+                self._adapt(targets, healthy=False)
+            raise
+        else:
+            self._adapt(
+                targets,
+                healthy=lease.latency is None or lease.latency <= self.latency_threshold,
+            )
+        finally:
+            self._release(job_key, targets)
+
+
+def _subnet_of(address: str) -> str:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return ""
+    prefix = settings.scheduler_subnet_prefix if ip.version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def target_for(name: str, row: Optional[Host] = None) -> ScheduleTarget:
+    """Resolve bastion and subnet for ``name`` from its ``Host`` row."""
+    subnet = _subnet_of(name) or (_subnet_of(row.hostname) if row else "")
+    if not subnet and row and row.ip_address:
+        subnet = _subnet_of(row.ip_address)
+    return ScheduleTarget(host=name, proxy_jump=row.proxy_jump if row else "", subnet=subnet)
+
+
+def targets_for_hosts(hosts: Iterable[str]) -> List[ScheduleTarget]:
+    """Resolve bastion and subnet for each host from the ``Host`` table."""
+    names = list(hosts)
+    known = hosts_by_name(names)
+    return [target_for(name, known.get(name)) for name in names]
+
+
+scheduler = HostScheduler(
+    global_limit=settings.max_concurrent_hosts,
+    proxy_limit=settings.max_hosts_per_proxy,
+    subnet_limit=settings.max_hosts_per_subnet,
+    latency_threshold=settings.scheduler_latency_threshold,
+)
@@ -0,0 +1,319 @@
+"""Pooled SSH connections built on OpenSSH ControlMaster sockets.
+
+Opening an SSH session (key exchange, auth, and a second handshake for every
+``ProxyJump`` hop) often costs more than a short scan.  The backend keeps one
+master connection per ``(host, port, user, identity_file, proxy_jump)`` and
+every consumer multiplexes its sessions over it:
+
+- ``oscap-ssh`` via ``SSH_ADDITIONAL_OPTIONS`` (see ``client_options``)
+- the remote scan driver and ``/api/hosts/test-connection`` via ``run()``
+  and ``command()``
+
+Masters are health-checked with ``ssh -O check`` before reuse and
+re-established when the check fails.  Masters unused for
+``SSH_POOL_IDLE_SECONDS`` are closed by ``evict_idle()`` (called
+periodically by ``run_ssh_pool_maintenance``); ``ControlPersist`` is set
+slightly longer as a backstop should the backend die without cleaning up.
+Long-running sessions (a scan can take far longer than the idle timeout)
+hold a ``lease()``: a leased master is never evicted, and its idle clock
+restarts when the last lease is released.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from models.host import Host
+
+logger = logging.getLogger(__name__)
+
+_MAINTENANCE_INTERVAL = 60
+
+
+@dataclass(frozen=True)
+class SSHEndpoint:
+    """Everything that distinguishes one SSH connection from another."""
+
+    host: str
+    port: int = 22
+    user: str = ""
+    identity_file: str = ""
+    proxy_jump: str = ""
+
+    @property
+    def destination(self) -> str:
+        return f"{self.user}@{self.host}" if self.user else self.host
+
+
+def connection_options(endpoint: SSHEndpoint) -> List[str]:
+    """ssh options selecting port, key and jump host for ``endpoint``."""
+    options = [
+        "-p",
+        str(endpoint.port),
+        "-o",
+        "BatchMode=yes",
+        "-o",
+        "StrictHostKeyChecking=accept-new",
+        "-o",
+        f"ConnectTimeout={settings.ssh_connect_timeout}",
+    ]
+    if endpoint.identity_file:
+        options += ["-i", endpoint.identity_file]
+    if endpoint.proxy_jump:
+        options += ["-J", endpoint.proxy_jump]
+    return options
+
+
+class SSHConnectionPool:
+    def __init__(
+        self, control_dir: Path, idle_timeout: float, ssh_binary: str = "ssh"
+    ) -> None:
+        self.control_dir = Path(control_dir)
+        self.idle_timeout = idle_timeout
+        self.ssh_binary = ssh_binary
+        self._last_used: Dict[SSHEndpoint, float] = {}
+        self._locks: Dict[SSHEndpoint, asyncio.Lock] = {}
+        self._leases: Counter = Counter()
+
+    def control_path(self, endpoint: SSHEndpoint) -> Path:
+        # Unix socket paths are limited to ~104 bytes, so hash the key
+        key = "\0".join(
+            (endpoint.host, str(endpoint.port), endpoint.user,
+             endpoint.identity_file, endpoint.proxy_jump)
+        )
+        return self.control_dir / f"cm-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+    def client_options(self, endpoint: SSHEndpoint) -> List[str]:
+        """Options for an ssh client to ride on the pooled master.
+
+        ``ControlMaster=no`` makes the client connect directly if the master
+        has gone away, instead of failing.
+        """
+        return connection_options(endpoint) + [
+            "-o",
+            f"ControlPath={self.control_path(endpoint)}",
+            "-o",
+            "ControlMaster=no",
+        ]
+
+    async def _ssh(
+        self,
+        args: Sequence[str],
+        timeout: Optional[float] = None,
+        stdin: bytes | None = None,
+        stdin_path: Optional[Path] = None,
+        stdout_path: Optional[Path] = None,
+    ) -> Tuple[int, bytes, bytes]:
+        with contextlib.ExitStack() as files:
+            if stdin_path is not None:
+                stdin_target = files.enter_context(open(stdin_path, "rb"))
+            elif stdin is not None:
+                stdin_target = asyncio.subprocess.PIPE
+            else:
+                stdin_target = asyncio.subprocess.DEVNULL
+            stdout_target = (
+                files.enter_context(open(stdout_path, "wb"))
+                if stdout_path is not None
+                else asyncio.subprocess.PIPE
+            )
+            process = await asyncio.create_subprocess_exec(
+                self.ssh_binary,
+                *args,
+                stdin=stdin_target,
+                stdout=stdout_target,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                async with asyncio.timeout(timeout):
+                    stdout, stderr = await process.communicate(stdin)
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+        return process.returncode, stdout or b"", stderr
+
+    async def check(self, endpoint: SSHEndpoint) -> bool:
+        """Whether a live master exists for ``endpoint``."""
+        if not self.control_path(endpoint).exists():
+            return False
+        returncode, _, _ = await self._ssh(
+            ["-o", f"ControlPath={self.control_path(endpoint)}", "-O", "check",
+             endpoint.destination],
+            timeout=10,
+        )
+        return returncode == 0
+
+    async def _start_master(self, endpoint: SSHEndpoint) -> None:
+        control_path = self.control_path(endpoint)
+        self.control_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        control_path.unlink(missing_ok=True)
+        # The master backgrounds itself (-f) and may keep inherited stdio
+        # open, so stderr goes to a file rather than a pipe we would wait on.
+        with tempfile.TemporaryFile() as errors:
+            process = await asyncio.create_subprocess_exec(
+                self.ssh_binary,
+                *connection_options(endpoint),
+                "-o",
+                f"ControlPath={control_path}",
+                "-o",
+                "ControlMaster=yes",
+                "-o",
+                f"ControlPersist={int(self.idle_timeout) + _MAINTENANCE_INTERVAL}",
+                "-f",
+                "-N",
+                endpoint.destination,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=errors,
+            )
+            try:
+                async with asyncio.timeout(settings.ssh_connect_timeout + 5):
+                    returncode = await process.wait()
+            except BaseException as exc:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                if isinstance(exc, TimeoutError):
+                    # A hung handshake is a connect failure like any other
+                    raise ConnectionError(
+                        f"SSH to {endpoint.destination} timed out"
+                    ) from None
+                raise
+            if returncode != 0:
+                errors.seek(0)
+                message = errors.read().decode(errors="replace").strip()
+                raise ConnectionError(f"SSH to {endpoint.destination} failed: {message}")
+
+    async def ensure(self, endpoint: SSHEndpoint) -> None:
+        """Make sure a healthy master is running for ``endpoint``.
+
+        Raises ``ConnectionError`` when the host cannot be reached.
+        """
+        lock = self._locks.setdefault(endpoint, asyncio.Lock())
+        async with lock:
+            if not await self.check(endpoint):
+                if endpoint in self._last_used:
+                    logger.info("SSH master for %s is gone; reconnecting", endpoint.destination)
+                await self._start_master(endpoint)
+            self._last_used[endpoint] = time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def lease(self, endpoint: SSHEndpoint) -> AsyncIterator[None]:
+        """Keep ``endpoint``'s master open for as long as the block runs.
+
+        Wrap any use of ``command()`` / ``client_options()`` in a lease:
+        idle eviction skips leased masters.  Raises ``ConnectionError`` when
+        the host cannot be reached.
+        """
+        await self.ensure(endpoint)
+        self._leases[endpoint] += 1
+        try:
+            yield
+        finally:
+            self._leases[endpoint] -= 1
+            if not self._leases[endpoint]:
+                del self._leases[endpoint]
+            self._last_used[endpoint] = time.monotonic()
+
+    def command(self, endpoint: SSHEndpoint, remote_command: str) -> List[str]:
+        """Full ssh argv running ``remote_command`` over the pooled master.
+
+        The caller must hold a ``lease()`` while the command runs.
+        """
+        return [
+            self.ssh_binary,
+            *self.client_options(endpoint),
+            endpoint.destination,
+            remote_command,
+        ]
+
+    async def run(
+        self,
+        endpoint: SSHEndpoint,
+        command: str,
+        timeout: Optional[float] = None,
+        stdin: bytes | None = None,
+        stdin_path: Optional[Path] = None,
+        stdout_path: Optional[Path] = None,
+    ) -> Tuple[int, bytes, bytes]:
+        """Run a remote shell command over the pooled connection.
+
+        ``stdin_path`` / ``stdout_path`` stream a local file to or from the
+        remote command without buffering it in memory.
+        """
+        async with self.lease(endpoint):
+            return await self._ssh(
+                self.command(endpoint, command)[1:],
+                timeout=timeout,
+                stdin=stdin,
+                stdin_path=stdin_path,
+                stdout_path=stdout_path,
+            )
+
+    async def close(self, endpoint: SSHEndpoint) -> None:
+        self._last_used.pop(endpoint, None)
+        if self.control_path(endpoint).exists():
+            await self._ssh(
+                ["-o", f"ControlPath={self.control_path(endpoint)}", "-O", "exit",
+                 endpoint.destination],
+                timeout=10,
+            )
+
+    async def evict_idle(self) -> int:
+        """Close unleased masters unused for ``idle_timeout``; return how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [
+            ep for ep, used in self._last_used.items()
+            if used < cutoff and not self._leases[ep]
+        ]
+        closed = 0
+        for endpoint in idle:
+            lock = self._locks.setdefault(endpoint, asyncio.Lock())
+            async with lock:
+                if self._last_used.get(endpoint, 0) < cutoff and not self._leases[endpoint]:
+                    await self.close(endpoint)
+                    closed += 1
+        return closed
+
+    async def close_all(self) -> None:
+        for endpoint in list(self._last_used):
+            await self.close(endpoint)
+
+
+def endpoint_for(
+    host: str, row: Optional[Host] = None, user: str = "", port: Optional[int] = None
+) -> SSHEndpoint:
+    """Build the pool key for ``host`` from its ``Host`` row and defaults."""
+    return SSHEndpoint(
+        host=row.hostname if row else host,
+        port=port or (row.port if row else 22),
+        user=user or (row.ssh_user if row else "") or settings.ssh_user,
+        identity_file=(row.identity_file if row else "") or settings.ssh_key_path,
+        proxy_jump=row.proxy_jump if row else "",
+    )
+
+
+async def run_ssh_pool_maintenance() -> None:
+    """Background loop closing idle masters."""
+    while True:
+        await asyncio.sleep(_MAINTENANCE_INTERVAL)
+        try:
+            await ssh_pool.evict_idle()
+        except Exception:
+            logger.exception("SSH pool maintenance failed")
+
+
+ssh_pool = SSHConnectionPool(
+    Path(settings.ssh_control_dir or os.path.join(tempfile.gettempdir(), "streamguard-ssh")),
+    idle_timeout=settings.ssh_pool_idle_seconds,
+)
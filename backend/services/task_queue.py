@@ -0,0 +1,547 @@
+"""Database-backed queue of per-host audit tasks.
+
+With ``AUDIT_DISPATCH=queue`` the API process only records one ``AuditTask``
+row per host; ``python -m services.worker`` processes (on any number of
+machines sharing the database) claim tasks, scan, and write ``ScanResult``
+rows exactly as an in-process audit would.
+
+Claiming uses ``SELECT ... FOR UPDATE SKIP LOCKED`` on PostgreSQL, so
+concurrent workers never block on or double-claim the same row.  SQLite has
+no row locks; there a claim is a compare-and-set ``UPDATE ... WHERE status =
+'queued'`` that retries when another worker won the race.
+
+Workers heartbeat their running tasks.  The API-side monitor
+(``run_task_monitor``) requeues tasks whose worker went silent for
+``WORKER_HEARTBEAT_TIMEOUT`` seconds (up to ``WORKER_MAX_ATTEMPTS`` claims),
+relays per-host completions to ``/ws/audit/{job_id}`` and finishes the job
+once no task is left queued or running.  It also applies the job limits an
+in-process audit applies: tasks still queued or running
+``AUDIT_JOB_TIMEOUT`` seconds after the job was submitted fail as
+``timeout``, and once every task of a job has finished, hosts that timed
+out or were unreachable are requeued (up to ``AUDIT_STRAGGLER_RETRIES``
+times) while the deadline allows.  Delivery is at-least-once: a
+worker that dies after writing its scan but before marking the task done
+causes the host to be scanned again.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, func, select
+
+from core.config import settings
+from db import get_session
+from models.job import AuditJob, AuditTask
+from models.scan import ScanResult
+from services.dashboard_cache import dashboard_cache
+from services.dashboard_feed import dashboard_feed
+from services.hosts import get_or_create_host
+from services.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+# Host failures worth another round: the host may answer next time
+RETRYABLE_HOST_STATUSES = {"timeout", "unreachable"}
+DEADLINE_ERROR = "audit job deadline exceeded"
+_CLAIM_RETRIES = 5
+
+
+def enqueue_audit_tasks(
+    job_id: int,
+    hosts: Iterable[str],
+    distro: str,
+    profile_name: str,
+    profile_path: str,
+    reaudit: bool = False,
+    rule_ids: Optional[List[str]] = None,
+) -> int:
+    """Queue one task per host of ``job_id``; return how many were added.
+
+    Each task records the id of the ``Host`` its name resolves to (by
+    hostname, alias or IP address), which is the row the worker's scan is
+    stored against.
+    """
+    session: Session = get_session()
+    with session:
+        tasks = [
+            AuditTask(
+                audit_job_id=job_id,
+                host=host,
+                host_id=get_or_create_host(session, host).id,
+                distro=distro,
+                profile_name=profile_name,
+                profile_path=profile_path,
+                reaudit=reaudit,
+                rule_ids="\n".join(rule_ids or []),
+            )
+            for host in hosts
+        ]
+        session.add_all(tasks)
+        session.commit()
+    return len(tasks)
+
+
+def task_rule_ids(task: AuditTask) -> List[str]:
+    return [rule_id for rule_id in task.rule_ids.split("\n") if rule_id]
+
+
+def claim_statement():
+    """Oldest queued task, locked for update and skipping rows others hold."""
+    return (
+        select(AuditTask)
+        .where(AuditTask.status == "queued")
+        .order_by(AuditTask.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def _mark_claimed(session: Session, task_id: int, worker_id: str):
+    now = datetime.utcnow()
+    return session.execute(
+        update(AuditTask)
+        .where(AuditTask.id == task_id, AuditTask.status == "queued")
+        .values(
+            status="running",
+            worker_id=worker_id,
+            attempts=AuditTask.attempts + 1,
+            claimed_at=now,
+            heartbeat_at=now,
+        )
+    )
+
+
+def _mark_job_running(session: Session, job_id: int) -> None:
+    session.execute(
+        update(AuditJob)
+        .where(AuditJob.id == job_id, AuditJob.status == "queued")
+        .values(status="running", updated_at=datetime.utcnow())
+    )
+
+
+def claim_task(worker_id: str) -> Optional[AuditTask]:
+    """Claim the next queued task for ``worker_id``, or return ``None``."""
+    session: Session = get_session()
+    with session:
+        if session.get_bind().dialect.name == "postgresql":
+            task = session.exec(claim_statement()).first()
+            if task is None:
+                return None
+            _mark_claimed(session, task.id, worker_id)
+            _mark_job_running(session, task.audit_job_id)
+            session.commit()
+            session.refresh(task)
+            return task
+
+        # SQLite: no row locks, so claim with a compare-and-set update
+        for _ in range(_CLAIM_RETRIES):
+            candidate = session.exec(
+                select(AuditTask.id, AuditTask.audit_job_id)
+                .where(AuditTask.status == "queued")
+                .order_by(AuditTask.id)
+                .limit(1)
+            ).first()
+            if candidate is None:
+                return None
+            task_id, job_id = candidate
+            if _mark_claimed(session, task_id, worker_id).rowcount == 1:
+                _mark_job_running(session, job_id)
+                session.commit()
+                return session.get(AuditTask, task_id)
+            session.rollback()
+        return None
+
+
+def heartbeat(worker_id: str, task_ids: Iterable[int]) -> Set[int]:
+    """Refresh ``worker_id``'s running tasks.
+
+    Returns the ids it no longer owns (cancelled, or requeued after a missed
+    heartbeat); the worker should stop working on them.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return set()
+    session: Session = get_session()
+    with session:
+        session.execute(
+            update(AuditTask)
+            .where(
+                AuditTask.id.in_(task_ids),
+                AuditTask.worker_id == worker_id,
+                AuditTask.status == "running",
+            )
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        session.commit()
+        owned = set(
+            session.exec(
+                select(AuditTask.id).where(
+                    AuditTask.id.in_(task_ids),
+                    AuditTask.worker_id == worker_id,
+                    AuditTask.status == "running",
+                )
+            ).all()
+        )
+    return set(task_ids) - owned
+
+
+def finish_task(task_id: int, worker_id: str, status: str, error: str = "") -> bool:
+    """Record the outcome of a task the worker still owns."""
+    session: Session = get_session()
+    with session:
+        result = session.execute(
+            update(AuditTask)
+            .where(
+                AuditTask.id == task_id,
+                AuditTask.worker_id == worker_id,
+                AuditTask.status == "running",
+            )
+            .values(status=status, error=error, finished_at=datetime.utcnow())
+        )
+        session.commit()
+    return result.rowcount == 1
+
+
+def _fail_tasks(session: Session, where, status: str, error: str) -> int:
+    """Fail the tasks matching ``where``, recording a ``status`` scan for each.
+
+    The ``ScanResult`` says why the host has no results in the job.
+    """
+    failed = session.execute(
+        update(AuditTask)
+        .where(*where)
+        .values(status="failed", error=error, finished_at=datetime.utcnow())
+        .returning(
+            AuditTask.audit_job_id, AuditTask.host_id, AuditTask.distro, AuditTask.profile_name
+        )
+    ).all()
+    session.add_all(
+        ScanResult(
+            audit_job_id=job_id,
+            host_id=host_id,
+            distro=distro,
+            profile_name=profile_name,
+            status=status,
+            error=error,
+        )
+        for job_id, host_id, distro, profile_name in failed
+    )
+    return len(failed)
+
+
+def fail_task(task_id: int, worker_id: str, scan_status: str, error: str) -> bool:
+    """Record that a task the worker still owns left its host unscanned.
+
+    ``scan_status`` (timeout / unreachable / error) goes to the host's
+    ``ScanResult``, written in the same transaction.
+    """
+    session: Session = get_session()
+    with session:
+        failed = _fail_tasks(
+            session,
+            (
+                AuditTask.id == task_id,
+                AuditTask.worker_id == worker_id,
+                AuditTask.status == "running",
+            ),
+            scan_status,
+            error,
+        )
+        session.commit()
+    return failed == 1
+
+
+def release_task(task_id: int, worker_id: str) -> bool:
+    """Hand a task back to the queue (worker shutting down)."""
+    session: Session = get_session()
+    with session:
+        result = session.execute(
+            update(AuditTask)
+            .where(
+                AuditTask.id == task_id,
+                AuditTask.worker_id == worker_id,
+                AuditTask.status == "running",
+            )
+            .values(
+                status="queued",
+                worker_id="",
+                attempts=AuditTask.attempts - 1,
+                heartbeat_at=None,
+            )
+        )
+        session.commit()
+    return result.rowcount == 1
+
+
+def cancel_job_tasks(job_id: int) -> int:
+    """Cancel the job's queued and running tasks; return how many."""
+    session: Session = get_session()
+    with session:
+        result = session.execute(
+            update(AuditTask)
+            .where(AuditTask.audit_job_id == job_id, AuditTask.status.in_(ACTIVE_STATUSES))
+            .values(status="cancelled", finished_at=datetime.utcnow())
+        )
+        session.commit()
+    return result.rowcount
+
+
+def requeue_stale_tasks(
+    timeout: Optional[float] = None, max_attempts: Optional[int] = None
+) -> int:
+    """Requeue (or fail, after ``max_attempts``) tasks of silent workers."""
+    timeout = settings.worker_heartbeat_timeout if timeout is None else timeout
+    max_attempts = settings.worker_max_attempts if max_attempts is None else max_attempts
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    stale = (AuditTask.status == "running", AuditTask.heartbeat_at < cutoff)
+    session: Session = get_session()
+    with session:
+        failed = _fail_tasks(
+            session,
+            (*stale, AuditTask.attempts >= max_attempts),
+            "error",
+            "worker stopped responding",
+        )
+        requeued = session.execute(
+            update(AuditTask)
+            .where(*stale)
+            .values(status="queued", worker_id="", heartbeat_at=None)
+        ).rowcount
+        session.commit()
+    if requeued or failed:
+        logger.warning("Requeued %d and failed %d tasks of unresponsive workers", requeued, failed)
+    return requeued + failed
+
+
+def _deadline_cutoff(timeout: Optional[float]) -> Optional[datetime]:
+    """Jobs submitted before the returned time are past their deadline."""
+    timeout = settings.audit_job_timeout if timeout is None else timeout
+    if not timeout:
+        return None
+    return datetime.utcnow() - timedelta(seconds=timeout)
+
+
+def expire_overdue_tasks(timeout: Optional[float] = None) -> int:
+    """Fail the queued and running tasks of jobs past ``AUDIT_JOB_TIMEOUT``.
+
+    Each host is recorded as ``timeout``; workers scanning one of them drop
+    it on their next heartbeat.
+    """
+    cutoff = _deadline_cutoff(timeout)
+    if cutoff is None:
+        return 0
+    session: Session = get_session()
+    with session:
+        expired = _fail_tasks(
+            session,
+            (
+                AuditTask.audit_job_id.in_(
+                    select(AuditJob.id).where(AuditJob.created_at < cutoff)
+                ),
+                AuditTask.status.in_(ACTIVE_STATUSES),
+            ),
+            "timeout",
+            DEADLINE_ERROR,
+        )
+        session.commit()
+    if expired:
+        logger.warning("Timed out %d tasks of audit jobs past their deadline", expired)
+    return expired
+
+
+def requeue_stragglers(
+    job_id: int, retries: Optional[int] = None, timeout: Optional[float] = None
+) -> List[Tuple[int, str]]:
+    """Start another round for the job's timed-out and unreachable hosts.
+
+    Only once no task of the job is queued or running, for hosts retried
+    fewer than ``retries`` times, and while the job is within its deadline.
+    The failed scans of the requeued hosts are dropped, since the new round
+    records their outcome.  Returns the requeued ``(task id, host)`` pairs.
+    """
+    retries = settings.audit_straggler_retries if retries is None else retries
+    if not retries:
+        return []
+    cutoff = _deadline_cutoff(timeout)
+    session: Session = get_session()
+    with session:
+        job = session.get(AuditJob, job_id)
+        if job is None or (cutoff is not None and job.created_at < cutoff):
+            return []
+        active = session.exec(
+            select(func.count())
+            .select_from(AuditTask)
+            .where(AuditTask.audit_job_id == job_id, AuditTask.status.in_(ACTIVE_STATUSES))
+        ).one()
+        if active:
+            return []
+        stragglers = session.exec(
+            select(AuditTask, ScanResult)
+            .join(
+                ScanResult,
+                (ScanResult.audit_job_id == AuditTask.audit_job_id)
+                & (ScanResult.host_id == AuditTask.host_id),
+            )
+            .where(
+                AuditTask.audit_job_id == job_id,
+                AuditTask.status == "failed",
+                AuditTask.retries < retries,
+                ScanResult.status.in_(RETRYABLE_HOST_STATUSES),
+            )
+        ).all()
+        requeued: Dict[int, str] = {}
+        for task, scan in stragglers:
+            session.delete(scan)
+            if task.id in requeued:
+                continue
+            requeued[task.id] = task.host
+            task.status = "queued"
+            task.worker_id = ""
+            task.error = ""
+            # ``attempts`` bounds the claims of one round
+            task.attempts = 0
+            task.retries += 1
+            task.claimed_at = task.heartbeat_at = task.finished_at = None
+            session.add(task)
+        session.commit()
+    return list(requeued.items())
+
+
+def _final_status(counts: Dict[str, int]) -> Optional[str]:
+    if any(counts.get(status) for status in ACTIVE_STATUSES):
+        return None
+    if counts.get("cancelled"):
+        return "cancelled"
+    if counts.get("failed"):
+        # Same outcomes as an in-process job (see ``audit.job_outcome``)
+        return "partial" if counts.get("completed") else "failed"
+    return "completed"
+
+
+def refresh_job_status(job_id: int) -> Optional[str]:
+    """Finish ``job_id`` when none of its tasks is left; return the new status."""
+    session: Session = get_session()
+    with session:
+        counts = dict(
+            session.exec(
+                select(AuditTask.status, func.count())
+                .where(AuditTask.audit_job_id == job_id)
+                .group_by(AuditTask.status)
+            ).all()
+        )
+        status = _final_status(counts) if counts else None
+        if status is None:
+            return None
+        result = session.execute(
+            update(AuditJob)
+            .where(AuditJob.id == job_id, AuditJob.status.in_(("queued", "running")))
+            .values(status=status, updated_at=datetime.utcnow())
+        )
+        session.commit()
+    return status if result.rowcount == 1 else None
+
+
+class TaskMonitor:
+    """API-side view of queued jobs, turning table changes into ws events."""
+
+    def __init__(self) -> None:
+        self._job_status: Dict[int, str] = {}
+        self._reported: Dict[int, Set[int]] = {}
+
+    def _poll(self) -> List[Tuple[int, dict]]:
+        requeue_stale_tasks()
+        expire_overdue_tasks()
+        events: List[Tuple[int, dict]] = []
+        session: Session = get_session()
+        with session:
+            jobs = session.exec(
+                select(AuditJob.id, AuditJob.status).where(
+                    AuditJob.status.in_(ACTIVE_STATUSES),
+                    AuditJob.id.in_(select(AuditTask.audit_job_id)),
+                )
+            ).all()
+            job_ids = [job_id for job_id, _ in jobs]
+            finished = session.exec(
+                select(AuditTask, ScanResult)
+                .join(
+                    ScanResult,
+                    (ScanResult.audit_job_id == AuditTask.audit_job_id)
+                    & (ScanResult.host_id == AuditTask.host_id),
+                    isouter=True,
+                )
+                .where(
+                    AuditTask.audit_job_id.in_(job_ids),
+                    AuditTask.status.in_(("completed", "failed")),
+                )
+            ).all() if job_ids else []
+
+        for job_id, status in jobs:
+            if status == "running" and self._job_status.get(job_id) != "running":
+                events.append((job_id, {"event": "audit.job", "status": "running"}))
+            self._job_status[job_id] = status
+        for task, scan in finished:
+            reported = self._reported.setdefault(task.audit_job_id, set())
+            if task.id in reported:
+                continue
+            reported.add(task.id)
+            if task.status == "completed" and scan is not None:
+                events.append((task.audit_job_id, {
+                    "event": "audit.complete",
+                    "host": task.host,
+                    "score": scan.score,
+                    "passed": scan.passed,
+                    "failed": scan.failed,
+                    "other": scan.other,
+                }))
+            elif task.status == "failed":
+                events.append((task.audit_job_id, {
+                    "event": "audit.error",
+                    "host": task.host,
+                    "status": scan.status if scan is not None else "error",
+                    "error": task.error,
+                }))
+        for job_id in job_ids:
+            requeued = requeue_stragglers(job_id)
+            if requeued:
+                events.append((job_id, {
+                    "event": "audit.retry", "hosts": [host for _, host in requeued]
+                }))
+                # The retried hosts report their new outcome
+                self._reported.get(job_id, set()).difference_update(
+                    task_id for task_id, _ in requeued
+                )
+                continue
+            status = refresh_job_status(job_id)
+            if status is not None:
+                event = {"event": "audit.job", "status": status}
+                if status in ("partial", "failed"):
+                    event["error"] = "one or more hosts were not scanned"
+                events.append((job_id, event))
+                self._job_status.pop(job_id, None)
+                self._reported.pop(job_id, None)
+        return events
+
+    async def poll(self) -> None:
+        events = await asyncio.to_thread(self._poll)
+        if events:
+            # Workers store scans in their own processes
+            dashboard_cache.invalidate()
+        for job_id, event in events:
+            await manager.broadcast(str(job_id), event)
+            if event["event"] == "audit.complete":
+                await dashboard_feed.scan_stored(event["host"], event["score"])
+
+
+async def run_task_monitor() -> None:
+    """Background loop of the API process in ``AUDIT_DISPATCH=queue`` mode."""
+    monitor = TaskMonitor()
+    while True:
+        try:
+            await monitor.poll()
+        except Exception:
+            logger.exception("Audit task monitor failed")
+        await asyncio.sleep(settings.worker_poll_interval)
@@ -0,0 +1,165 @@
+"""Standalone audit worker: ``python -m services.worker``.
+
+Run from ``backend/`` with the same settings (``DATABASE_URL_SYNC``, SSH
+key, content cache) as the API.  Each worker claims queued ``AuditTask``
+rows (see ``services.task_queue``), scans up to ``--concurrency`` hosts at
+once through the usual scheduler / SSH pool / parse pipeline, and writes
+``ScanResult`` rows.  SIGTERM or Ctrl-C stops claiming, kills in-flight
+scans and hands their tasks back to the queue.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import socket
+from typing import Dict, Optional
+
+from core.config import settings
+from models.job import AuditTask
+from services.audit import audit_host
+from services.hosts import hosts_by_name
+from services.pipeline import shutdown_pipeline
+from services.scheduler import target_for
+from services.ssh_pool import endpoint_for, ssh_pool
+from services.task_queue import (
+    claim_task,
+    fail_task,
+    finish_task,
+    heartbeat,
+    release_task,
+    task_rule_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWorker:
+    def __init__(
+        self,
+        worker_id: str,
+        concurrency: int,
+        poll_interval: float,
+        heartbeat_interval: float,
+    ) -> None:
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._running: Dict[int, asyncio.Task] = {}
+        self._stopping = False
+
+    async def _execute(self, task: AuditTask) -> None:
+        try:
+            known = await asyncio.to_thread(hosts_by_name, [task.host])
+            result = await audit_host(
+                task.host,
+                task.distro,
+                task.profile_name,
+                task.profile_path,
+                task.audit_job_id,
+                target_for(task.host, known.get(task.host)),
+                reaudit=task.reaudit,
+                rule_ids=task_rule_ids(task),
+                endpoint=endpoint_for(task.host, known.get(task.host)),
+            )
+        except asyncio.CancelledError:
+            if self._stopping:
+                await asyncio.to_thread(release_task, task.id, self.worker_id)
+            raise
+        if result.status == "completed":
+            await asyncio.to_thread(finish_task, task.id, self.worker_id, "completed")
+            return
+        await asyncio.to_thread(
+            fail_task, task.id, self.worker_id, result.status, result.error
+        )
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                lost = await asyncio.to_thread(heartbeat, self.worker_id, list(self._running))
+            except Exception:
+                logger.exception("Heartbeat failed")
+                continue
+            for task_id in lost:
+                # Cancelled through the API, or requeued after we went silent
+                running = self._running.get(task_id)
+                if running is not None:
+                    running.cancel()
+
+    async def run_once(self) -> bool:
+        """Claim and start one task if capacity allows; return whether one was."""
+        if len(self._running) >= self.concurrency:
+            return False
+        task = await asyncio.to_thread(claim_task, self.worker_id)
+        if task is None:
+            return False
+        logger.info("Claimed %s of audit job %s", task.host, task.audit_job_id)
+        running = asyncio.create_task(self._execute(task), name=f"audit-task-{task.id}")
+        self._running[task.id] = running
+        running.add_done_callback(lambda _: self._running.pop(task.id, None))
+        return True
+
+    async def run(self, stop: asyncio.Event) -> None:
+        heartbeats = asyncio.create_task(self._heartbeat_loop())
+        try:
+            while not stop.is_set():
+                if await self.run_once():
+                    continue
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+        finally:
+            self._stopping = True
+            heartbeats.cancel()
+            running = list(self._running.values())
+            for task in running:
+                task.cancel()
+            await asyncio.gather(heartbeats, *running, return_exceptions=True)
+
+
+async def _main(worker: AuditWorker) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    logger.info(
+        "Audit worker %s started (concurrency %d)", worker.worker_id, worker.concurrency
+    )
+    try:
+        await worker.run(stop)
+    finally:
+        await ssh_pool.close_all()
+        shutdown_pipeline()
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="StreamGuard audit worker")
+    parser.add_argument(
+        "--worker-id", default=f"{socket.gethostname()}-{os.getpid()}"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.worker_concurrency or settings.max_concurrent_hosts,
+        help="hosts scanned at once by this worker",
+    )
+    parser.add_argument("--poll-interval", type=float, default=settings.worker_poll_interval)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    worker = AuditWorker(
+        args.worker_id,
+        args.concurrency,
+        args.poll_interval,
+        heartbeat_interval=max(1.0, settings.worker_heartbeat_timeout / 4),
+    )
+    asyncio.run(_main(worker))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,9 @@ class ConnectionManager:
             if not self._connections[job_id]:
                 del self._connections[job_id]
 
+    def subscribers(self, job_id: str) -> int:
+        return len(self._connections.get(job_id, ()))
+
     async def broadcast(self, job_id: str, message: dict) -> None:
         for websocket in list(self._connections.get(job_id, [])):
             await websocket.send_json(message)
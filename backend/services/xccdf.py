@@ -0,0 +1,121 @@
+"""Streaming helpers for XCCDF results files and SCAP datastreams."""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Tuple, Union
+
+from lxml import etree
+
+
+XmlSource = Union[str, Path, IO[bytes]]
+
+XCCDF_NS = "http://checklists.nist.gov/xccdf/1.2"
+
+# (rule_id, severity, status) as read from a ``rule-result`` element
+RuleResultRow = Tuple[str, str, str]
+
+
+def local_name(tag: str) -> str:
+    """Return the tag name without its ``{namespace}`` prefix."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def text_content(element: etree._Element | None) -> str:
+    """Collapse all text under ``element`` into a single whitespace-joined line."""
+    if element is None:
+        return ""
+    return " ".join(chunk.strip() for chunk in element.itertext() if chunk.strip()).strip()
+
+
+def find_descendant(element: etree._Element, name: str) -> etree._Element | None:
+    """Return the first element below ``element`` with local name ``name``."""
+    for child in element.iter():
+        if child is element or not isinstance(child.tag, str):
+            continue
+        if local_name(child.tag) == name:
+            return child
+    return None
+
+
+def iter_elements(source: XmlSource, names: Iterable[str]) -> Iterator[etree._Element]:
+    """Yield every complete element whose local name is in ``names``.
+
+    Matching subtrees are kept intact until the caller has consumed them;
+    every other element is cleared as soon as it closes, together with any
+    already-processed siblings, so the partially built tree never grows past
+    a single branch and memory stays flat regardless of document size.
+    """
+    wanted = set(names)
+    depth_in_match = 0
+    if isinstance(source, Path):
+        source = str(source)
+    for event, element in etree.iterparse(
+        source, events=("start", "end"), resolve_entities=False
+    ):
+        matched = local_name(element.tag) in wanted
+        if event == "start":
+            if matched:
+                depth_in_match += 1
+            continue
+
+        if matched:
+            depth_in_match -= 1
+            if not depth_in_match:
+                yield element
+        if depth_in_match:
+            continue
+
+        element.clear(keep_tail=False)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def iter_rule_result_rows(source: XmlSource) -> Iterator[RuleResultRow]:
+    """Stream ``(rule_id, severity, status)`` for every ``rule-result``."""
+    for element in iter_elements(source, {"rule-result"}):
+        status = "unknown"
+        for child in element:
+            if isinstance(child.tag, str) and local_name(child.tag) == "result":
+                status = (child.text or "unknown").strip().lower() or "unknown"
+                break
+        yield element.get("idref", ""), element.get("severity", "unknown"), status
+
+
+def build_tailoring(
+    benchmark_href: str,
+    base_profile: str,
+    profile_id: str,
+    select: Iterable[str],
+    deselect: Iterable[str],
+) -> bytes:
+    """Return an XCCDF 1.2 tailoring document.
+
+    The tailored profile ``profile_id`` extends ``base_profile`` (keeping its
+    values and refinements), switches off every rule in ``deselect`` and
+    switches on every rule in ``select``.
+    """
+    ns = f"{{{XCCDF_NS}}}"
+    tailoring = etree.Element(
+        f"{ns}Tailoring",
+        nsmap={"xccdf": XCCDF_NS},
+        id="xccdf_org.streamguard_tailoring_" + profile_id.rsplit("_", 1)[-1],
+    )
+    etree.SubElement(tailoring, f"{ns}benchmark", href=benchmark_href)
+    version = etree.SubElement(
+        tailoring,
+        f"{ns}version",
+        time=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+    )
+    version.text = "1"
+    profile = etree.SubElement(
+        tailoring, f"{ns}Profile", id=profile_id, extends=base_profile
+    )
+    etree.SubElement(profile, f"{ns}title").text = f"{base_profile} (tailored)"
+    selected = set(select)
+    for rule_id in sorted(set(deselect) - selected):
+        etree.SubElement(profile, f"{ns}select", idref=rule_id, selected="false")
+    for rule_id in sorted(selected):
+        etree.SubElement(profile, f"{ns}select", idref=rule_id, selected="true")
+    return etree.tostring(tailoring, xml_declaration=True, encoding="UTF-8", pretty_print=True)
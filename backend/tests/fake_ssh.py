@@ -0,0 +1,40 @@
+"""Stand-in for the ``ssh`` binary used by SSH pool tests.
+
+Masters are simulated by creating the ControlPath file; every invocation is
+appended to ``$FAKE_SSH_LOG``.  When ``$FAKE_SSH_EXEC`` is set, session
+commands run locally through ``sh -c`` (with stdio passed through), so the
+"remote" side is this machine.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+with open(os.environ["FAKE_SSH_LOG"], "a") as log:
+    log.write(" ".join(args) + "\n")
+
+options = {}
+for flag, value in zip(args, args[1:]):
+    if flag == "-o" and "=" in value:
+        key, _, val = value.partition("=")
+        options[key] = val
+control_path = Path(options.get("ControlPath", "/nonexistent"))
+
+if any("unreachable" in arg for arg in args[-2:]):
+    sys.stderr.write("ssh: connect to host unreachable port 22: No route to host\n")
+    sys.exit(255)
+if "-O" in args:
+    command = args[args.index("-O") + 1]
+    if command == "check":
+        sys.exit(0 if control_path.exists() else 255)
+    if command == "exit":
+        control_path.unlink(missing_ok=True)
+    sys.exit(0)
+if options.get("ControlMaster") == "yes":
+    control_path.touch()
+    sys.exit(0)
+if os.environ.get("FAKE_SSH_EXEC"):
+    sys.exit(subprocess.call(["sh", "-c", args[-1]]))
+sys.exit(0)
@@ -0,0 +1,99 @@
+"""Tests for the raw scan result artifact store."""
+
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from services import artifacts
+from services.artifacts import ArtifactStore, collect_garbage, iter_artifact_rows
+
+
+_RESULTS = b"""<?xml version="1.0"?>
+<TestResult xmlns="http://checklists.nist.gov/xccdf/1.2">
+  <rule-result idref="rule_a" severity="high"><result>fail</result></rule-result>
+</TestResult>
+"""
+
+
+def _write(path: Path, data: bytes = _RESULTS) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_put_compresses_dedupes_and_streams_back(tmp_path: Path):
+    store = ArtifactStore(tmp_path)
+
+    first = store.put(_write(tmp_path / "scratch" / "1" / "a.xml"))
+    second = store.put(_write(tmp_path / "scratch" / "2" / "b.xml"))
+
+    assert first == second
+    objects = list(store.objects_dir.glob("*/*.xml.*"))
+    assert len(objects) == 1
+    assert objects[0].stat().st_size < len(_RESULTS) * 2
+    assert not (tmp_path / "scratch" / "1" / "a.xml").exists()
+    assert b"".join(store.iter_chunks(first)) == _RESULTS
+    assert list(iter_artifact_rows(str(tmp_path), first)) == [("rule_a", "high", "fail")]
+
+
+def test_gzip_codec_is_used_when_configured(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(artifacts.settings, "artifact_compression", "gzip")
+    store = ArtifactStore(tmp_path)
+
+    digest = store.put(_write(tmp_path / "r.xml"))
+
+    assert store.path_for(digest).name.endswith(".xml.gz")
+    with store.open(digest) as stream:
+        assert stream.read() == _RESULTS
+
+
+def test_zstd_codec_is_used_when_configured(monkeypatch, tmp_path: Path):
+    pytest.importorskip("zstandard")
+    monkeypatch.setattr(artifacts.settings, "artifact_compression", "zstd")
+    store = ArtifactStore(tmp_path)
+
+    digest = store.put(_write(tmp_path / "r.xml"))
+
+    assert store.path_for(digest).name.endswith(".xml.zst")
+    with store.open(digest) as stream:
+        assert stream.read() == _RESULTS
+
+
+def test_collect_garbage_applies_retention(monkeypatch, tmp_path: Path):
+    from db import get_session
+    from models.scan import ScanResult
+
+    monkeypatch.setattr(artifacts.settings, "artifact_retention_days", 30)
+    store = ArtifactStore(tmp_path)
+    kept = store.put(_write(tmp_path / "kept.xml"))
+    expired = store.put(_write(tmp_path / "old.xml", _RESULTS.replace(b"rule_a", b"rule_b")))
+    orphan = store.put(_write(tmp_path / "orphan.xml", _RESULTS.replace(b"rule_a", b"rule_c")))
+
+    # Age every object past the GC grace period
+    old = time.time() - 2 * 86400
+    for path in store.objects_dir.glob("*/*.xml.*"):
+        os.utime(path, (old, old))
+
+    with get_session() as session:
+        session.add(ScanResult(distro="rhel9", profile_name="stig", artifact_digest=kept))
+        stale = ScanResult(
+            distro="rhel9",
+            profile_name="stig",
+            artifact_digest=expired,
+            created_at=datetime.utcnow() - timedelta(days=90),
+        )
+        session.add(stale)
+        session.commit()
+        stale_id = stale.id
+
+    removed = collect_garbage(store)
+
+    assert removed == 2
+    assert store.path_for(kept) is not None
+    assert store.path_for(expired) is None
+    assert store.path_for(orphan) is None
+    with get_session() as session:
+        assert session.get(ScanResult, stale_id).artifact_digest == ""
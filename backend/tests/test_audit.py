@@ -0,0 +1,550 @@
+"""Tests for XCCDF result parsing in the audit service."""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from lxml import etree
+from sqlalchemy import text
+from sqlmodel import select
+
+from core.config import settings
+from db import get_session
+from main import app
+from models.host import Host
+from models.job import AuditJob
+from models.rule_catalog import RuleCatalog
+from models.scan import ScanResult, ScanRuleResult
+from routers import audit as audit_router
+from services import audit, pipeline, rule_metadata
+from services.artifacts import ArtifactStore
+from services.xccdf import iter_rule_result_rows
+
+
+_RESULTS_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2" id="xccdf_bench">
+  <Rule id="xccdf_rule_one" severity="high">
+    <title>Rule one</title>
+  </Rule>
+  <TestResult id="xccdf_result">
+    <target>host-1</target>
+    <rule-result idref="xccdf_rule_one" severity="high">
+      <result>pass</result>
+      <check system="urn:xccdf:check"><check-content-ref name="oval:1"/></check>
+    </rule-result>
+    <rule-result idref="xccdf_rule_two" severity="medium">
+      <result>fail</result>
+    </rule-result>
+    <rule-result idref="xccdf_rule_three">
+      <result>notapplicable</result>
+    </rule-result>
+  </TestResult>
+</Benchmark>
+"""
+
+_BENCHMARK_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2" id="xccdf_bench">
+  <Rule id="xccdf_rule_three" severity="low">
+    <title>Rule three</title>
+    <description>Third rule</description>
+    <rationale>Because</rationale>
+    <fixtext>Fix it</fixtext>
+  </Rule>
+</Benchmark>
+"""
+
+
+def test_iter_rule_result_rows_streams_rule_results(tmp_path: Path):
+    results_path = tmp_path / "results.xml"
+    results_path.write_text(_RESULTS_XML)
+
+    assert list(iter_rule_result_rows(results_path)) == [
+        ("xccdf_rule_one", "high", "pass"),
+        ("xccdf_rule_two", "medium", "fail"),
+        ("xccdf_rule_three", "unknown", "notapplicable"),
+    ]
+
+
+def test_enrich_results_fills_rule_text_from_benchmark(tmp_path: Path):
+    results_path = tmp_path / "results.xml"
+    results_path.write_text(_RESULTS_XML)
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+
+    tally = audit.ScanTally()
+    rules = list(
+        audit._enrich_results(
+            (
+                audit.RuleResult(rule_id=rule_id, severity=severity, status=status)
+                for rule_id, severity, status in iter_rule_result_rows(results_path)
+            ),
+            audit.get_rule_metadata(str(benchmark_path)),
+            tally,
+        )
+    )
+
+    assert (tally.passed, tally.failed, tally.other) == (1, 1, 1)
+    third = rules[2]
+    assert third.severity == "low"
+    assert third.title == "Rule three"
+    assert third.fixtext == "Fix it"
+
+
+def test_rule_metadata_cache_parses_each_version_once(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+    calls = []
+    real_loader = rule_metadata.load_rule_metadata
+
+    def counting_loader(path):
+        calls.append(path)
+        return real_loader(path)
+
+    monkeypatch.setattr(rule_metadata, "load_rule_metadata", counting_loader)
+    cache = rule_metadata.RuleMetadataCache(max_versions=1)
+
+    first = cache.get(str(benchmark_path))
+    second = cache.get(str(benchmark_path))
+    assert first is second
+    assert first["xccdf_rule_three"].title == "Rule three"
+    assert len(calls) == 1
+
+    # A new content version is parsed again and evicts the old one
+    benchmark_path.write_text(_BENCHMARK_XML.replace("Rule three", "Rule 3"))
+    updated = cache.get(str(benchmark_path))
+    assert updated["xccdf_rule_three"].title == "Rule 3"
+    assert len(calls) == 2
+    assert len(cache._entries) == 1
+
+
+def test_persist_scan_result_streams_rules_into_db():
+    tally = audit.ScanTally()
+    results = (
+        audit.RuleResult(rule_id=f"xccdf_rule_{idx}", severity="medium", status=status)
+        for idx, status in enumerate(["pass", "fail", "error"] * 5)
+    )
+    enriched = audit._enrich_results(results, {}, tally)
+
+    metadata = {
+        "xccdf_rule_0": audit.RuleResult(
+            rule_id="xccdf_rule_0", severity="high", status="unknown", title="Rule zero"
+        )
+    }
+    catalog_ids = audit.ensure_rule_catalog("ingest-test", metadata)
+    scan = audit._persist_scan_result(
+        "ingest-host", "rhel9", "stig", None, "ingest-test", catalog_ids, enriched, tally
+    )
+
+    assert (scan.passed, scan.failed, scan.other) == (5, 5, 5)
+    assert scan.score == round(5 / 15 * 100, 2)
+    with get_session() as session:
+        rows = session.exec(
+            select(ScanRuleResult, RuleCatalog)
+            .join(RuleCatalog, RuleCatalog.id == ScanRuleResult.rule_catalog_id)
+            .where(ScanRuleResult.scan_result_id == scan.id)
+        ).all()
+        catalog_count = len(
+            session.exec(
+                select(RuleCatalog).where(RuleCatalog.content_version == "ingest-test")
+            ).all()
+        )
+    assert len(rows) == 15
+    assert {row.status for row, _ in rows} == {"pass", "fail", "error"}
+    assert {catalog.rule_id for _, catalog in rows} == {f"xccdf_rule_{i}" for i in range(15)}
+    # Rule text is stored once per (content version, rule)
+    assert catalog_count == 15
+
+
+@pytest.fixture
+def api_job(monkeypatch, tmp_path: Path):
+    """A one-host audit submitted through the API and run to completion.
+
+    Yields ``(client, job_id, submit response)`` with the client still open.
+    """
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(_RESULTS_XML)
+
+    store = ArtifactStore(tmp_path / "scan_results")
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "artifact_store", store)
+    monkeypatch.setattr(audit_router, "artifact_store", store)
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/audit",
+            json={
+                "hosts": ["audit-host"],
+                "distro": "rhel9",
+                "profile_name": "stig",
+                "profile_path": str(benchmark_path),
+            },
+        )
+        job_id = response.json()["job_id"]
+        deadline = time.monotonic() + 10
+        while client.get(f"/api/audit/results/{job_id}").json()["status"] not in {
+            "completed", "failed"
+        } and time.monotonic() < deadline:
+            time.sleep(0.05)
+        yield client, job_id, response
+
+
+def test_audit_submission_returns_job_id_and_runs_in_background(api_job):
+    client, job_id, response = api_job
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+    results = client.get(f"/api/audit/results/{job_id}").json()
+    assert client.get("/api/audit/results/999999").status_code == 404
+
+    assert results["status"] == "completed"
+    host_result = results["results"][0]
+    assert host_result["host"] == "audit-host"
+    assert (host_result["passed"], host_result["failed"], host_result["other"]) == (1, 1, 1)
+    third = next(r for r in host_result["rules"] if r["rule_id"] == "xccdf_rule_three")
+    assert third["title"] == "Rule three"
+
+
+def test_raw_results_are_downloadable_per_host(api_job):
+    client, job_id, _ = api_job
+
+    raw = client.get(f"/api/audit/results/{job_id}/artifacts/audit-host")
+    assert raw.status_code == 200
+    assert raw.text == _RESULTS_XML
+    assert client.get(f"/api/audit/results/{job_id}/artifacts/nope").status_code == 404
+
+
+def test_compact_results_expand_to_the_full_rows(api_job):
+    client, job_id, _ = api_job
+    full = client.get(f"/api/audit/results/{job_id}").json()["results"][0]
+
+    compact = client.get(f"/api/audit/results/{job_id}", params={"format": "compact"})
+    assert compact.status_code == 200
+    assert client.get("/api/audit/results/999999?format=compact").status_code == 404
+
+    compact = compact.json()
+    assert len(compact["rules"]) == 3
+    [compact_host] = compact["results"]
+    expanded = [
+        (compact["rules"][rule]["rule_id"], compact["rules"][rule]["severity"],
+         compact["statuses"][status])
+        for rule, status in compact_host["results"]
+    ]
+    assert expanded == [(r["rule_id"], r["severity"], r["status"]) for r in full["rules"]]
+    assert compact["rules"][2]["fixtext"] == "Fix it"
+    assert compact_host["passed"] == 1
+
+
+def test_compact_results_are_sent_as_msgpack_when_accepted(api_job):
+    msgpack = pytest.importorskip("msgpack")
+    client, job_id, _ = api_job
+    url = f"/api/audit/results/{job_id}?format=compact"
+
+    packed = client.get(url, headers={"Accept": "application/msgpack"})
+
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert packed.headers["vary"] == "Accept"
+    assert msgpack.unpackb(packed.content, raw=False) == client.get(url).json()
+
+
+def test_large_responses_are_compressed(api_job):
+    client, _, _ = api_job
+
+    gzipped = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+
+    pytest.importorskip("brotli_asgi")
+    brotli = client.get("/openapi.json", headers={"Accept-Encoding": "br, gzip"})
+    assert brotli.headers["content-encoding"] == "br"
+
+
+def _collect_on_writer(rows, batches):
+    received = []
+    for row in rows:
+        received.append(row)
+        batches.append(len(received))
+    return received, threading.current_thread().name
+
+
+def test_pipeline_streams_rows_from_worker_process_to_writer_thread(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(pipeline.settings, "ingest_batch_size", 2)
+    results_path = tmp_path / "results.xml"
+    results_path.write_text(_RESULTS_XML)
+    seen = []
+
+    try:
+        rows, writer_thread = asyncio.run(
+            pipeline.run_streamed(
+                iter_rule_result_rows, (str(results_path),), _collect_on_writer, seen
+            )
+        )
+    finally:
+        pipeline.shutdown_pipeline()
+
+    assert rows == [
+        ("xccdf_rule_one", "high", "pass"),
+        ("xccdf_rule_two", "medium", "fail"),
+        ("xccdf_rule_three", "unknown", "notapplicable"),
+    ]
+    assert seen == [1, 2, 3]
+    assert writer_thread.startswith("audit-db-writer")
+
+
+def test_pipeline_stream_fails_the_writer_when_parsing_fails(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(pipeline.settings, "ingest_batch_size", 1)
+    results_path = tmp_path / "results.xml"
+    # Truncated after the first rule-result
+    results_path.write_text(_RESULTS_XML[: _RESULTS_XML.index("<rule-result idref=\"xccdf_rule_two\"")])
+    seen = []
+
+    try:
+        with pytest.raises(pipeline.StreamError, match="XMLSyntaxError"):
+            asyncio.run(
+                pipeline.run_streamed(
+                    iter_rule_result_rows, (str(results_path),), _collect_on_writer, seen
+                )
+            )
+    finally:
+        pipeline.shutdown_pipeline()
+
+    # The writer saw the rows parsed before the error, then failed too
+    assert seen == [1]
+
+
+def test_reaudit_rechecks_failed_rules_and_merges_with_latest_scan(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    # The job names the profile by its short name, "stig"
+    benchmark_path.write_text(
+        _BENCHMARK_XML.replace(
+            "  <Rule ",
+            '  <Profile id="xccdf_org.ssgproject.content_profile_stig">'
+            "<title>STIG</title></Profile>\n  <Rule ",
+            1,
+        )
+    )
+
+    monkeypatch.setattr(audit, "artifact_store", ArtifactStore(tmp_path / "scan_results"))
+
+    recheck_xml = _RESULTS_XML.replace(
+        "<result>pass</result>", "<result>notselected</result>"
+    ).replace("<result>fail</result>", "<result>pass</result>").replace(
+        "<result>notapplicable</result>", "<result>notselected</result>"
+    )
+    calls = []
+
+    async def fake_eval(
+        host, profile_name, xccdf_path, output_path, tailoring_path=None, **kwargs
+    ):
+        calls.append((profile_name, tailoring_path.read_bytes() if tailoring_path else None))
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(recheck_xml if tailoring_path else _RESULTS_XML)
+
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+
+    async def scan(reaudit):
+        job_id = audit.create_audit_job(["reaudit-host"], "rhel9", "stig")
+        return await audit.run_audit_for_host(
+            "reaudit-host", "rhel9", "stig", str(benchmark_path), job_id, reaudit=reaudit
+        )
+
+    try:
+        full = asyncio.run(scan(reaudit=False))
+        rechecked = asyncio.run(scan(reaudit=True))
+    finally:
+        pipeline.shutdown_pipeline()
+
+    assert (full.passed, full.failed, full.other) == (1, 1, 1)
+    # Only the failed rule was re-run; the others were carried over
+    assert (rechecked.passed, rechecked.failed, rechecked.other) == (2, 0, 1)
+    assert rechecked.score > full.score
+
+    profile, tailoring_xml = calls[-1]
+    assert profile == audit.REAUDIT_PROFILE_ID
+    tailoring = etree.fromstring(tailoring_xml)
+    base = tailoring.find("{http://checklists.nist.gov/xccdf/1.2}Profile").get("extends")
+    assert base == "xccdf_org.ssgproject.content_profile_stig"
+    selects = {
+        el.get("idref"): el.get("selected")
+        for el in tailoring.iter("{http://checklists.nist.gov/xccdf/1.2}select")
+    }
+    assert selects["xccdf_rule_two"] == "true"
+    assert selects["xccdf_rule_one"] == "false"
+
+
+def _host_scans(job_id: int):
+    session = get_session()
+    with session:
+        scans = session.exec(
+            select(Host.hostname, ScanResult.status)
+            .join(Host, Host.id == ScanResult.host_id)
+            .where(ScanResult.audit_job_id == job_id)
+        ).all()
+        return session.get(AuditJob, job_id).status, dict(scans)
+
+
+def test_slow_and_unreachable_hosts_do_not_hold_or_fail_the_job(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        if host == "slow-host":
+            await asyncio.sleep(3600)
+        if host == "down-host":
+            raise ConnectionError("No route to host")
+        if host == "broken-host":
+            raise RuntimeError("oscap crashed")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(_RESULTS_XML)
+
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "artifact_store", ArtifactStore(tmp_path / "scan_results"))
+    monkeypatch.setattr(settings, "audit_host_timeout", 0.2)
+
+    hosts = ["ok-host", "slow-host", "down-host", "broken-host"]
+    job_id = audit.create_audit_job(hosts, "rhel9", "stig")
+    results = asyncio.run(
+        audit.execute_audit_job(job_id, hosts, "rhel9", "stig", str(benchmark_path))
+    )
+
+    assert [r.status for r in results] == ["completed", "timeout", "unreachable", "error"]
+    assert results[3].error == "oscap crashed"
+    status, scans = _host_scans(job_id)
+    assert status == "partial"
+    assert scans == {
+        "ok-host": "completed",
+        "slow-host": "timeout",
+        "down-host": "unreachable",
+        "broken-host": "error",
+    }
+
+
+def test_failed_scans_leave_no_scratch_results(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text("<partial")
+        if host == "crashing-host":
+            raise RuntimeError("oscap crashed")
+        await asyncio.sleep(3600)
+
+    store = ArtifactStore(tmp_path / "scan_results")
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "artifact_store", store)
+    monkeypatch.setattr(settings, "audit_host_timeout", 0.2)
+
+    hosts = ["crashing-host", "stuck-host"]
+    job_id = audit.create_audit_job(hosts, "rhel9", "stig")
+    results = asyncio.run(
+        audit.execute_audit_job(job_id, hosts, "rhel9", "stig", str(benchmark_path))
+    )
+
+    assert [r.status for r in results] == ["error", "timeout"]
+    assert list((store.root / "scratch").rglob("*.xml")) == []
+
+
+def test_job_deadline_bounds_stragglers_and_retries_them(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+    attempts = {}
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        attempts[host] = attempts.get(host, 0) + 1
+        if host == "hung-host":
+            await asyncio.sleep(3600)
+        if host == "flaky-host" and attempts[host] == 1:
+            raise ConnectionError("Connection reset")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(_RESULTS_XML)
+
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "artifact_store", ArtifactStore(tmp_path / "scan_results"))
+    monkeypatch.setattr(settings, "audit_host_timeout", 0.3)
+    monkeypatch.setattr(settings, "audit_job_timeout", 1)
+    monkeypatch.setattr(settings, "audit_straggler_retries", 10)
+
+    hosts = ["flaky-host", "hung-host"]
+    job_id = audit.create_audit_job(hosts, "rhel9", "stig")
+    started = time.monotonic()
+    results = asyncio.run(
+        audit.execute_audit_job(job_id, hosts, "rhel9", "stig", str(benchmark_path))
+    )
+
+    # Retries stop at the job deadline rather than after ten rounds
+    assert time.monotonic() - started < 3
+    assert [r.status for r in results] == ["completed", "timeout"]
+    assert attempts["flaky-host"] == 2
+    assert 2 <= attempts["hung-host"] <= 4
+    assert _host_scans(job_id) == ("partial", {"flaky-host": "completed", "hung-host": "timeout"})
+
+
+def test_scan_being_stored_at_the_job_deadline_counts_as_completed(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_BENCHMARK_XML)
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(_RESULTS_XML)
+
+    store_scan_rows = audit._store_scan_rows
+
+    def slow_store(rows, *args):
+        rows = list(rows)
+        time.sleep(1.5)
+        return store_scan_rows(rows, *args)
+
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "_store_scan_rows", slow_store)
+    monkeypatch.setattr(audit, "artifact_store", ArtifactStore(tmp_path / "scan_results"))
+    monkeypatch.setattr(settings, "audit_job_timeout", 1)
+
+    job_id = audit.create_audit_job(["deadline-store-host"], "rhel9", "stig")
+    results = asyncio.run(
+        audit.execute_audit_job(
+            job_id, ["deadline-store-host"], "rhel9", "stig", str(benchmark_path)
+        )
+    )
+
+    assert [r.status for r in results] == ["completed"]
+    session = get_session()
+    with session:
+        statuses = session.exec(
+            select(ScanResult.status).where(ScanResult.audit_job_id == job_id)
+        ).all()
+    assert statuses == ["completed"]
+    assert _host_scans(job_id) == ("completed", {"deadline-store-host": "completed"})
+
+
+def test_rule_severity_and_status_are_stored_as_normalized_codes():
+    tally = audit.ScanTally()
+    rules = [
+        audit.RuleResult(rule_id="xccdf_rule_code_a", severity="CAT1", status="FAIL"),
+        audit.RuleResult(rule_id="xccdf_rule_code_b", severity="critical", status="pass"),
+        audit.RuleResult(rule_id="xccdf_rule_code_c", severity="", status="bogus"),
+    ]
+    catalog_ids = audit.ensure_rule_catalog("codes-test", {})
+    scan = audit._persist_scan_result(
+        "codes-host", "rhel9", "stig", None, "codes-test", catalog_ids,
+        audit._enrich_results(rules, {}, tally), tally,
+    )
+
+    with get_session() as session:
+        raw = session.execute(
+            text("SELECT severity, status FROM scanruleresult WHERE scan_result_id = :id ORDER BY id"),
+            {"id": scan.id},
+        ).all()
+        labels = session.exec(
+            select(ScanRuleResult.severity, ScanRuleResult.status)
+            .where(ScanRuleResult.scan_result_id == scan.id, ScanRuleResult.severity == "cat1")
+            .order_by(ScanRuleResult.id)
+        ).all()
+    assert [tuple(row) for row in raw] == [(3, 2), (3, 1), (0, 0)]
+    # Any spelling binds to the same code; rows read back as canonical labels
+    assert [tuple(row) for row in labels] == [("high", "fail"), ("high", "pass")]
@@ -362,3 +362,80 @@ def test_legacy_ensure_cac_cache(monkeypatch, tmp_path: Path):
     )
     assert repo_path.exists()
     assert any(a.artifact_type == "datastream" for a in artifacts)
+
+
+# ---------------------------------------------------------------------------
+# Content index tests
+# ---------------------------------------------------------------------------
+
+
+_DATASTREAM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2" id="xccdf_bench">
+  <Profile id="xccdf_profile_base">
+    <title>Base</title>
+    <select idref="xccdf_rule_a" selected="true"/>
+  </Profile>
+  <Profile id="xccdf_profile_stig" extends="xccdf_profile_base">
+    <title>STIG</title>
+    <select idref="xccdf_group_net" selected="true"/>
+  </Profile>
+  <Rule id="xccdf_rule_a" severity="high" selected="false">
+    <title>Rule A</title>
+    <fixtext>Fix A</fixtext>
+  </Rule>
+  <Group id="xccdf_group_net">
+    <Rule id="xccdf_rule_b" severity="low" selected="false">
+      <title>Rule B</title>
+    </Rule>
+  </Group>
+</Benchmark>
+"""
+
+
+class TestContentIndex:
+    def test_fetch_builds_index_and_profiles_read_from_it(self, monkeypatch, tmp_path: Path):
+        from services import content_index
+
+        ds_file = tmp_path / "ssg-rhel9-ds.xml"
+        ds_file.write_text(_DATASTREAM_XML)
+        monkeypatch.setattr(cac_fetch, "CAC_CACHE_DIR", tmp_path)
+        monkeypatch.setattr(cac_fetch, "METADATA_PATH", tmp_path / "metadata.json")
+        monkeypatch.setattr(
+            cac_fetch, "get_supported_products", lambda: set(cac_fetch.SUPPORTED_PRODUCTS)
+        )
+
+        artifacts = [
+            cac_fetch.CACArtifact(path=str(ds_file), artifact_type="datastream", product="rhel9")
+        ]
+        cac_fetch._update_metadata_from_artifacts(artifacts, "0.1.73", "online")
+
+        index_file = tmp_path / "ssg-rhel9-ds.index.sqlite"
+        assert index_file.exists()
+        assert cac_fetch._read_metadata()["distros"]["rhel9"]["index"] == str(index_file)
+
+        # Profile listing and rule lookups must not touch the XML again
+        monkeypatch.setattr(
+            content_index, "build_content_index", MagicMock(side_effect=AssertionError)
+        )
+        profiles = cac_fetch._parse_profiles_from_datastream("rhel9")
+        assert [p.title for p in profiles] == ["Base", "STIG"]
+
+        assert [r.rule_id for r in cac_fetch.get_profile_rules("rhel9", "xccdf_profile_base")] == [
+            "xccdf_rule_a"
+        ]
+        stig_rules = cac_fetch.get_profile_rules("rhel9", "xccdf_profile_stig")
+        assert [r.rule_id for r in stig_rules] == ["xccdf_rule_a", "xccdf_rule_b"]
+        assert stig_rules[0].fixtext == "Fix A"
+
+    def test_index_resolves_short_profile_names(self, tmp_path: Path):
+        from services.content_index import build_content_index, ContentIndex
+
+        ds_file = tmp_path / "ssg-rhel9-ds.xml"
+        ds_file.write_text(
+            _DATASTREAM_XML.replace("xccdf_profile_", "xccdf_org.ssgproject.content_profile_")
+        )
+        with ContentIndex(build_content_index(ds_file)) as index:
+            full = index.profile_rule_ids("xccdf_org.ssgproject.content_profile_stig")
+            assert full == ["xccdf_rule_a", "xccdf_rule_b"]
+            assert index.profile_rule_ids("stig") == full
+            assert index.profile_rule_ids("missing") == []
@@ -1,12 +1,17 @@
 from datetime import datetime, timedelta
 
 from fastapi.testclient import TestClient
+from sqlmodel import select
 
 from db import get_session
 from main import app
 from models.host import Host
 from models.job import AuditJob
+from models.posture import HostLatestScan
+from models.rule_catalog import RuleCatalog
 from models.scan import ScanResult, ScanRuleResult
+from services import audit
+from services.posture import update_host_posture
 
 
 client = TestClient(app)
@@ -45,15 +50,26 @@ def test_dashboard_endpoints():
         session.commit()
         session.refresh(scan)
 
+        rule = RuleCatalog(
+            content_version="test",
+            rule_id="V-1",
+            severity="high",
+            title="Disable root login",
+        )
+        session.add(rule)
+        session.commit()
+        session.refresh(rule)
+
         session.add(
             ScanRuleResult(
                 scan_result_id=scan.id,
-                rule_id="V-1",
+                rule_catalog_id=rule.id,
                 severity="high",
                 status="fail",
-                title="Disable root login",
             )
         )
+        session.flush()
+        update_host_posture(session, scan)
         session.commit()
 
     summary = client.get("/api/dashboard/summary")
@@ -71,3 +87,323 @@ def test_dashboard_endpoints():
     timeline = client.get("/api/dashboard/timeline")
     assert timeline.status_code == 200
     assert len(timeline.json()) == 30
+
+
+def _persist(host: str, statuses: dict) -> ScanResult:
+    metadata = {
+        rule_id: audit.RuleResult(rule_id=rule_id, severity="high", status="unknown", title=rule_id)
+        for rule_id in statuses
+    }
+    catalog_ids = audit.ensure_rule_catalog("posture-test", metadata)
+    tally = audit.ScanTally()
+    rules = [
+        audit.RuleResult(rule_id=rule_id, severity="high", status=status)
+        for rule_id, status in statuses.items()
+    ]
+    return audit._persist_scan_result(
+        host, "rhel9", "stig", None, "posture-test", catalog_ids,
+        audit._enrich_results(rules, metadata, tally), tally,
+    )
+
+
+def test_dashboard_reads_current_posture_not_history():
+    before = client.get("/api/dashboard/summary").json()["critical_fails"]
+
+    _persist("posture-1", {"xccdf_rule_posture_a": "fail", "xccdf_rule_posture_b": "fail"})
+    _persist("posture-2", {"xccdf_rule_posture_a": "fail"})
+    assert client.get("/api/dashboard/summary").json()["critical_fails"] == before + 3
+
+    # Fixed on posture-1, and rule b is no longer evaluated there
+    _persist("posture-1", {"xccdf_rule_posture_a": "pass"})
+    assert client.get("/api/dashboard/summary").json()["critical_fails"] == before + 1
+    top = {row["rule_id"]: row["count"] for row in client.get("/api/dashboard/top-failures").json()}
+    assert top["xccdf_rule_posture_a"] == 1
+    assert "xccdf_rule_posture_b" not in top
+
+    session = get_session()
+    with session:
+        latest = session.get(
+            HostLatestScan,
+            session.exec(select(Host.id).where(Host.hostname == "posture-1")).one(),
+        )
+        assert (latest.passed, latest.failed, latest.score) == (1, 0, 100.0)
+
+
+def test_posture_drops_rules_the_latest_scan_did_not_evaluate():
+    from models.posture import HostRulePosture
+
+    # Profile A, then profile B sharing one rule with it
+    _persist("posture-profiles", {"xccdf_rule_only_a": "fail", "xccdf_rule_shared": "fail"})
+    scan_b = _persist("posture-profiles", {"xccdf_rule_shared": "pass", "xccdf_rule_only_b": "fail"})
+
+    session = get_session()
+    with session:
+        rules = session.exec(
+            select(HostRulePosture.rule_id, HostRulePosture.status)
+            .where(HostRulePosture.host_id == scan_b.host_id)
+            .order_by(HostRulePosture.rule_id)
+        ).all()
+    assert rules == [("xccdf_rule_only_b", "fail"), ("xccdf_rule_shared", "pass")]
+
+
+def test_overlapping_scans_upsert_posture_and_keep_the_latest():
+    from models.posture import HostRulePosture
+
+    older = _persist("posture-overlap", {"xccdf_rule_overlap": "fail"})
+    newer = _persist("posture-overlap", {"xccdf_rule_overlap": "pass"})
+
+    # The older scan's transaction finishing last finds the rows already there
+    session = get_session()
+    with session:
+        update_host_posture(session, older)
+        session.commit()
+        latest = session.get(HostLatestScan, newer.host_id)
+        rule = session.get(HostRulePosture, (newer.host_id, "xccdf_rule_overlap"))
+        assert (latest.scan_result_id, latest.score) == (newer.id, 100.0)
+        assert (rule.scan_result_id, rule.status) == (newer.id, "pass")
+
+
+def test_dashboard_polls_are_cached_and_revalidated_with_etags():
+    from sqlalchemy import event
+
+    from db import engine
+
+    first = client.get("/api/dashboard/severity-breakdown")
+    etag = first.headers["etag"]
+    statements = []
+
+    def count(*args):
+        statements.append(args)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        cached = client.get("/api/dashboard/severity-breakdown")
+        unchanged = client.get(
+            "/api/dashboard/severity-breakdown", headers={"If-None-Match": etag}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert cached.json() == first.json() and cached.headers["etag"] == etag
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert statements == []
+
+    # A stored scan invalidates every cached endpoint
+    _persist("etag-host", {"xccdf_rule_etag": "fail"})
+    changed = client.get("/api/dashboard/severity-breakdown", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["high"] == first.json()["high"] + 1
+
+
+def test_cached_timeline_expires_at_day_rollover(monkeypatch):
+    from datetime import date
+
+    from services import dashboard as widgets
+
+    first = client.get("/api/dashboard/timeline")
+    etag = first.headers["etag"]
+    assert first.json()[-1]["date"] == date.today().isoformat()
+
+    tomorrow = date.today() + timedelta(days=1)
+    monkeypatch.setattr(widgets, "today", lambda: tomorrow)
+    rolled = client.get("/api/dashboard/timeline", headers={"If-None-Match": etag})
+
+    assert rolled.status_code == 200
+    assert rolled.headers["etag"] != etag
+    assert rolled.json()[-1]["date"] == tomorrow.isoformat()
+
+
+def _rollup_rows():
+    from models.rollup import DailyComplianceRollup
+
+    session = get_session()
+    with session:
+        return sorted(
+            tuple(row) for row in session.exec(
+                select(
+                    DailyComplianceRollup.day,
+                    DailyComplianceRollup.distro,
+                    DailyComplianceRollup.profile_name,
+                    DailyComplianceRollup.host_group,
+                    DailyComplianceRollup.scans,
+                    DailyComplianceRollup.score_sum,
+                )
+            ).all()
+        )
+
+
+def test_timeline_reads_rollups_by_range_and_group():
+    from services.rollups import rebuild_rollups
+
+    for hostname, group in (("rollup-web", "web"), ("rollup-db", "databases")):
+        client.post("/api/hosts", json={"hostname": hostname, "host_group": group})
+    _persist("rollup-web", {"xccdf_rule_rollup": "pass"})
+    _persist("rollup-web", {"xccdf_rule_rollup": "fail"})
+    _persist("rollup-db", {"xccdf_rule_rollup": "pass"})
+
+    series = client.get("/api/dashboard/timeline", params={"range": "90d", "group_by": "host_group"}).json()
+    today = [point for point in series if point["date"] == series[-1]["date"]]
+    scores = {point["group"]: point["score"] for point in today}
+    assert scores["web"] == 50.0 and scores["databases"] == 100.0
+    assert len([point for point in series if point["group"] == "web"]) == 90
+
+    assert len(client.get("/api/dashboard/timeline", params={"range": "1y"}).json()) == 365
+    assert client.get("/api/dashboard/timeline", params={"group_by": "rack"}).status_code == 422
+
+    # Rebuilding from the scan history gives the incrementally kept rows
+    incremental = [row for row in _rollup_rows() if row[3] in ("web", "databases")]
+    rebuild_rollups()
+    assert [row for row in _rollup_rows() if row[3] in ("web", "databases")] == incremental
+
+
+def test_combined_dashboard_matches_widgets_in_one_snapshot():
+    from sqlalchemy import event
+
+    from db import engine
+    from services.dashboard_cache import dashboard_cache
+
+    dashboard_cache.invalidate()
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        combined = client.get("/api/dashboard", params={"range": "90d"}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # Summary + breakdown, top failures and the timeline
+    assert len(statements) == 3
+    assert combined["summary"] == client.get("/api/dashboard/summary").json()
+    assert combined["severity_breakdown"] == client.get("/api/dashboard/severity-breakdown").json()
+    assert combined["top_failures"] == client.get("/api/dashboard/top-failures").json()
+    assert combined["timeline"] == client.get("/api/dashboard/timeline", params={"range": "90d"}).json()
+    assert combined["summary"]["critical_fails"] == combined["severity_breakdown"]["high"]
+
+
+def test_dashboard_feed_pushes_one_delta_to_every_viewer():
+    from sqlalchemy import event
+
+    from db import engine
+    from services.dashboard_feed import dashboard_feed
+
+    with client.websocket_connect("/ws/dashboard") as first, \
+            client.websocket_connect("/ws/dashboard") as second:
+        snapshot = first.receive_json()
+        assert snapshot["event"] == "dashboard.snapshot"
+        assert second.receive_json() == snapshot
+        high = snapshot["severity_breakdown"]["high"]
+
+        _persist("feed-1", {"xccdf_rule_feed_a": "fail", "xccdf_rule_feed_b": "pass"})
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            first.portal.call(dashboard_feed.scan_stored, "feed-1", 50.0)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        delta = first.receive_json()
+        assert second.receive_json() == delta
+        # Computed once for both viewers
+        assert len(statements) == 3
+        assert delta["event"] == "dashboard.delta"
+        assert delta["host"] == {"host": "feed-1", "score": 50.0}
+        # The first delta after connecting carries every value
+        assert delta["severity_breakdown"]["high"] == high + 1
+        assert delta["summary"]["total_hosts"] == snapshot["summary"]["total_hosts"] + 1
+
+        # Nothing changed since: only the host is reported
+        first.portal.call(dashboard_feed.scan_stored, "feed-1", 50.0)
+        assert first.receive_json() == {
+            "event": "dashboard.delta", "host": {"host": "feed-1", "score": 50.0},
+        }
+        second.receive_json()
+
+
+def test_dashboard_viewer_is_unsubscribed_when_its_snapshot_fails(monkeypatch):
+    import pytest
+
+    from services.dashboard_cache import dashboard_cache
+    from services.dashboard_feed import DASHBOARD_CHANNEL
+    from services.ws_manager import manager
+
+    def broken(*args):
+        raise RuntimeError("database is gone")
+
+    monkeypatch.setattr(dashboard_cache, "get", broken)
+    with pytest.raises(RuntimeError, match="database is gone"):
+        with client.websocket_connect("/ws/dashboard") as viewer:
+            viewer.receive_json()
+    assert manager.subscribers(DASHBOARD_CHANNEL) == 0
+
+
+def test_dashboard_feed_repeats_changes_after_a_failed_broadcast():
+    import asyncio
+
+    from services.dashboard_feed import DASHBOARD_CHANNEL, DashboardFeed
+    from services.ws_manager import manager
+
+    class Viewer:
+        def __init__(self, fail):
+            self.fail = fail
+            self.sent = []
+
+        async def accept(self):
+            pass
+
+        async def send_json(self, message):
+            if self.fail:
+                raise RuntimeError("connection reset")
+            self.sent.append(message)
+
+    feed = DashboardFeed()
+    viewer = Viewer(fail=True)
+
+    async def run():
+        await manager.connect(DASHBOARD_CHANNEL, viewer)
+        try:
+            await feed.scan_stored("feed-retry", 10.0)
+            viewer.fail = False
+            await feed.scan_stored("feed-retry", 10.0)
+        finally:
+            manager.disconnect(DASHBOARD_CHANNEL, viewer)
+
+    asyncio.run(run())
+    # The failed delta was not taken as delivered: the next one has every value
+    assert {"summary", "severity_breakdown", "timeline"} <= set(viewer.sent[0])
+
+
+def test_dashboard_feed_diff_reports_changed_ranks():
+    from services.dashboard_feed import diff_state
+
+    old = {
+        "summary": {"fleet_score": 80.0, "total_hosts": 2, "critical_fails": 1},
+        "severity_breakdown": {"high": 1, "medium": 0, "low": 3},
+        "top_failures": [
+            {"rule_id": "a", "title": "A", "count": 3},
+            {"rule_id": "b", "title": "B", "count": 2},
+            {"rule_id": "c", "title": "C", "count": 1},
+        ],
+        "timeline": {"date": "2026-01-01", "score": 80.0},
+    }
+    new = {
+        "summary": {"fleet_score": 75.0, "total_hosts": 2, "critical_fails": 1},
+        "severity_breakdown": {"high": 1, "medium": 0, "low": 4},
+        "top_failures": [
+            {"rule_id": "a", "title": "A", "count": 3},
+            {"rule_id": "c", "title": "C", "count": 2},
+        ],
+        "timeline": {"date": "2026-01-01", "score": 80.0},
+    }
+    assert diff_state(old, new) == {
+        "summary": {"fleet_score": 75.0},
+        "severity_breakdown": {"low": 4},
+        "top_failures": {"size": 2, "ranks": [{"rank": 2, "rule_id": "c", "title": "C", "count": 2}]},
+    }
@@ -0,0 +1,157 @@
+"""Tests for the streaming audit result export."""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from main import app
+from services import audit, export
+
+
+@pytest.fixture(scope="module")
+def export_job():
+    job_id = audit.create_audit_job(["export-a", "export-b"], "rhel9", "stig")
+    metadata = {
+        "xccdf_rule_export_high": audit.RuleResult(
+            rule_id="xccdf_rule_export_high", severity="high", status="unknown", title="High"
+        )
+    }
+    catalog_ids = audit.ensure_rule_catalog("export-test", metadata)
+    for host, statuses in (("export-a", ["fail", "pass"]), ("export-b", ["fail", "fail"])):
+        tally = audit.ScanTally()
+        rules = [
+            audit.RuleResult(rule_id="xccdf_rule_export_high", severity="high", status=statuses[0]),
+            audit.RuleResult(rule_id="xccdf_rule_export_low", severity="low", status=statuses[1]),
+        ]
+        audit._persist_scan_result(
+            host, "rhel9", "stig", job_id, "export-test", catalog_ids,
+            audit._enrich_results(rules, metadata, tally), tally,
+        )
+    return job_id
+
+
+def test_csv_export_streams_every_rule_result(export_job):
+    client = TestClient(app)
+    response = client.get(f"/api/audit/results/{export_job}/export/csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 4
+    assert list(rows[0]) == export.EXPORT_COLUMNS
+    assert {row["host"] for row in rows} == {"export-a", "export-b"}
+    assert {row["audit_job_id"] for row in rows} == {str(export_job)}
+    assert {row["title"] for row in rows if row["rule_id"] == "xccdf_rule_export_high"} == {"High"}
+
+
+def test_ndjson_and_json_exports_apply_filters(export_job):
+    client = TestClient(app)
+    response = client.get(
+        f"/api/audit/results/{export_job}/export/ndjson",
+        params={"status": "fail", "severity": "low,high", "host": ["export-b"]},
+    )
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 2
+    assert {(row["host"], row["status"]) for row in rows} == {("export-b", "fail")}
+
+    rows = client.get(
+        f"/api/audit/results/{export_job}/export/json", params={"severity": "high"}
+    ).json()
+    assert sorted(row["status"] for row in rows) == ["fail", "fail"]
+
+
+def test_export_rejects_unknown_format_and_job(export_job):
+    client = TestClient(app)
+    assert client.get(f"/api/audit/results/{export_job}/export/xml").status_code == 400
+    assert client.get("/api/audit/results/999999/export/csv").status_code == 404
+    # No matching rows still yields a header-only CSV
+    response = client.get(
+        f"/api/audit/results/{export_job}/export/csv", params={"status": "notchecked"}
+    )
+    assert response.text.strip() == ",".join(export.EXPORT_COLUMNS)
+
+
+def test_export_rejects_unknown_filter_values(export_job):
+    client = TestClient(app)
+    for params in ({"severity": "bogus"}, {"status": "fail,bogus"}):
+        response = client.get(f"/api/audit/results/{export_job}/export/csv", params=params)
+        assert response.status_code == 400
+        assert "bogus" in response.json()["detail"]
+    response = client.get(
+        "/api/audit/results/export/ndjson", params={"job_id": export_job, "severity": "bogus"}
+    )
+    assert response.status_code == 400
+
+    # Aliases are still accepted, as they are at ingest
+    response = client.get(
+        f"/api/audit/results/{export_job}/export/json", params={"severity": "CAT1"}
+    )
+    assert sorted(row["severity"] for row in response.json()) == ["high", "high"]
+
+
+def test_export_encodes_in_chunks_and_filters_in_sql(monkeypatch, export_job):
+    monkeypatch.setattr(export, "_ROWS_PER_CHUNK", 1)
+    chunks = list(export.iter_ndjson(export.iter_export_rows(export.ExportFilters(job_ids=[export_job]))))
+
+    assert len(chunks) == 4
+    assert "scanruleresult.status IN" not in str(
+        export.export_statement(export.ExportFilters(job_ids=[export_job])).compile()
+    )
+    filtered = export.export_statement(
+        export.ExportFilters(job_ids=[export_job], statuses=["fail"])
+    )
+    assert "scanruleresult.status IN" in str(filtered.compile())
+
+
+def test_range_export_covers_several_jobs(export_job):
+    client = TestClient(app)
+    other_job = audit.create_audit_job(["export-a"], "rhel9", "stig")
+
+    response = client.get(
+        "/api/audit/results/export/ndjson",
+        params={"job_id": [export_job, other_job], "status": "pass"},
+    )
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["audit_job_id"], row["host"]) for row in rows] == [(export_job, "export-a")]
+
+    scanned_at = datetime.fromisoformat(rows[0]["scanned_at"])
+    response = client.get(
+        "/api/audit/results/export/csv",
+        params={"since": scanned_at.isoformat(), "until": (scanned_at + timedelta(days=1)).isoformat()},
+    )
+    assert len(list(csv.DictReader(io.StringIO(response.text)))) >= 1
+    assert client.get("/api/audit/results/export/csv").status_code == 400
+
+
+def test_columnar_exports_are_dictionary_encoded(monkeypatch, export_job):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    monkeypatch.setattr(settings, "export_batch_size", 3)
+    client = TestClient(app)
+
+    response = client.get(f"/api/audit/results/{export_job}/export/arrow")
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    reader = pyarrow.ipc.open_stream(response.content)
+    batches = list(reader)
+    assert [batch.num_rows for batch in batches] == [3, 1]
+    table = pyarrow.Table.from_batches(batches)
+    assert pyarrow.types.is_dictionary(table.schema.field("rule_id").type)
+    assert sorted(table.column("status").to_pylist()) == ["fail", "fail", "fail", "pass"]
+
+    response = client.get(
+        f"/api/audit/results/{export_job}/export/parquet", params={"host": "export-b"}
+    )
+    parquet = pyarrow.parquet.ParquetFile(io.BytesIO(response.content))
+    table = parquet.read()
+    assert table.num_rows == 2
+    assert set(table.column("host").to_pylist()) == {"export-b"}
+    assert pyarrow.types.is_dictionary(table.schema.field("severity").type)
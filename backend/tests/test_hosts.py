@@ -34,18 +34,21 @@ def test_hosts_crud():
     assert response.status_code == 200
 
 
-def test_hosts_test_connection(monkeypatch):
-    class FakeClient:
-        def set_missing_host_key_policy(self, policy):
-            pass
+def test_hosts_test_connection(monkeypatch, tmp_path):
+    import stat
+    import sys
+    from pathlib import Path
 
-        def connect(self, **kwargs):
-            return None
+    from services.ssh_pool import ssh_pool
 
-        def close(self):
-            return None
-
-    monkeypatch.setattr("paramiko.SSHClient", lambda: FakeClient())
+    fake_ssh = tmp_path / "ssh"
+    fake_ssh.write_text(
+        f"#!/bin/sh\nexec {sys.executable} {Path(__file__).with_name('fake_ssh.py')} \"$@\"\n"
+    )
+    fake_ssh.chmod(fake_ssh.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("FAKE_SSH_LOG", str(tmp_path / "ssh.log"))
+    monkeypatch.setattr(ssh_pool, "ssh_binary", str(fake_ssh))
+    monkeypatch.setattr(ssh_pool, "control_dir", tmp_path / "cm")
 
     response = client.post(
         "/api/hosts/test-connection",
@@ -53,3 +56,10 @@ def test_hosts_test_connection(monkeypatch):
     )
     assert response.status_code == 200
     assert response.json()["success"] is True
+
+    response = client.post(
+        "/api/hosts/test-connection",
+        json={"hostname": "unreachable", "ssh_user": "root"},
+    )
+    assert response.json()["success"] is False
+    assert "No route to host" in response.json()["error"]
@@ -0,0 +1,130 @@
+"""Tests for the asyncio oscap runner."""
+
+import asyncio
+import sys
+import time
+
+import pytest
+
+from services import oscap_runner
+from services.oscap_runner import (
+    OscapError,
+    OscapSshRun,
+    ProgressThrottle,
+    build_oscap_command,
+    parse_progress_line,
+    run_oscap,
+)
+from services.ssh_pool import SSHEndpoint
+
+
+_FAKE_OSCAP = """
+import sys
+for rule, result in [("rule_a", "pass"), ("rule_b", "fail"), ("rule_c", "notapplicable")]:
+    print("Title\\tSome rule")
+    print("Rule\\t" + rule)
+    print("Ident\\tCCE-1234")
+    print("Result\\t" + result, flush=True)
+sys.exit(2)
+"""
+
+
+def test_build_oscap_command_uses_oscap_ssh_for_remote_hosts(tmp_path):
+    local = build_oscap_command("localhost", "stig", "ds.xml", tmp_path / "r.xml")
+    remote = build_oscap_command("web-1", "stig", "ds.xml", tmp_path / "r.xml")
+
+    assert local[:3] == ["oscap", "xccdf", "eval"]
+    assert remote[:3] == ["oscap-ssh", "root@web-1", "22"]
+    assert remote[-1] == "ds.xml"
+
+
+def test_parse_progress_line():
+    assert parse_progress_line("Rule\txccdf_rule_one\n") == ("Rule", "xccdf_rule_one")
+    assert parse_progress_line("Result   pass") == ("Result", "pass")
+    assert parse_progress_line("Title\tSomething") is None
+
+
+def test_run_oscap_streams_rule_results_and_accepts_failing_rules():
+    seen = []
+
+    async def on_result(rule_id, result):
+        seen.append((rule_id, result))
+
+    returncode = asyncio.run(
+        run_oscap([sys.executable, "-c", _FAKE_OSCAP], on_result=on_result)
+    )
+
+    assert returncode == 2
+    assert seen == [("rule_a", "pass"), ("rule_b", "fail"), ("rule_c", "notapplicable")]
+
+
+def test_run_oscap_raises_on_error_exit():
+    script = "import sys; sys.stderr.write('no such profile'); sys.exit(1)"
+    with pytest.raises(OscapError, match="no such profile"):
+        asyncio.run(run_oscap([sys.executable, "-c", script]))
+
+
+def test_run_oscap_kills_hung_scan_on_timeout():
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            run_oscap([sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.5)
+        )
+    assert time.monotonic() - started < 10
+
+
+def test_run_oscap_runs_abort_hook_after_killing_the_scan():
+    aborted = []
+
+    async def on_abort():
+        aborted.append(True)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            run_oscap(
+                [sys.executable, "-c", "import time; time.sleep(30)"],
+                timeout=0.5,
+                on_abort=on_abort,
+            )
+        )
+    assert aborted == [True]
+
+    # Not on a normal exit
+    asyncio.run(run_oscap([sys.executable, "-c", _FAKE_OSCAP], on_abort=on_abort))
+    assert aborted == [True]
+
+
+def test_oscap_ssh_abort_kills_only_its_own_remote_workdir(monkeypatch):
+    killed = []
+
+    async def fake_kill(endpoint, pattern):
+        killed.append(pattern)
+
+    monkeypatch.setattr(oscap_runner, "kill_remote_oscap", fake_kill)
+    script = (
+        "import time; print(\"Copying input file 'ds.xml' to remote working directory "
+        "'/tmp/tmp.Xa81'...\", flush=True); time.sleep(30)"
+    )
+    run = OscapSshRun(SSHEndpoint(host="web-1", port=22, user="root"))
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            run_oscap(
+                [sys.executable, "-c", script],
+                timeout=0.5,
+                on_abort=run.on_abort,
+                on_output=run.on_output,
+            )
+        )
+    assert killed == ["/tmp/tmp.Xa81/"]
+
+    # Aborted before oscap-ssh reached the target: nothing to kill there
+    asyncio.run(OscapSshRun(run.endpoint).on_abort())
+    assert killed == ["/tmp/tmp.Xa81/"]
+
+
+def test_progress_throttle_drops_updates_within_interval():
+    throttle = ProgressThrottle(interval=60)
+    assert throttle.ready()
+    assert not throttle.ready()
+    assert ProgressThrottle(interval=0).ready()
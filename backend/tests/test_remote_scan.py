@@ -0,0 +1,182 @@
+"""Tests for the cached-datastream remote scan driver."""
+
+import asyncio
+import hashlib
+import os
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+from core.config import settings
+from services import remote_scan
+from services.artifacts import ArtifactStore
+from services.ssh_pool import SSHEndpoint, ssh_pool
+
+FAKE_SSH = Path(__file__).with_name("fake_ssh.py")
+
+FAKE_OSCAP = """#!/bin/sh
+# Minimal oscap: print progress and write the datastream + tailoring as results
+results=""; tailoring=""
+while [ $# -gt 1 ]; do
+  case "$1" in
+    --results) results="$2"; shift ;;
+    --tailoring-file) tailoring="$2"; shift ;;
+  esac
+  shift
+done
+printf 'Title\\tFirst\\nRule\\trule_a\\nResult\\tpass\\n'
+printf 'Rule\\trule_b\\nResult\\tfail\\n'
+{ cat "$1"; [ -n "$tailoring" ] && cat "$tailoring"; } > "$results"
+exit 2
+"""
+
+
+def _executable(path: Path, content: str) -> Path:
+    path.write_text(content)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return path
+
+
+@pytest.fixture
+def remote(monkeypatch, tmp_path: Path) -> Path:
+    """Route the pool through fake ssh running commands locally; return the cache dir."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ssh = _executable(bin_dir / "ssh", f"#!/bin/sh\nexec {sys.executable} {FAKE_SSH} \"$@\"\n")
+    _executable(bin_dir / "oscap", FAKE_OSCAP)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_SSH_LOG", str(tmp_path / "ssh.log"))
+    monkeypatch.setenv("FAKE_SSH_EXEC", "1")
+    monkeypatch.setattr(ssh_pool, "ssh_binary", str(ssh))
+    monkeypatch.setattr(ssh_pool, "control_dir", tmp_path / "cm")
+    monkeypatch.setattr(remote_scan, "artifact_store", ArtifactStore(tmp_path / "store"))
+    cache = tmp_path / "remote-cache"
+    monkeypatch.setattr(settings, "remote_cache_dir", str(cache))
+    return cache
+
+
+def _uploads(tmp_path: Path) -> int:
+    return (tmp_path / "ssh.log").read_text().count("gzip -dc")
+
+
+def test_datastream_is_uploaded_once_and_reused(remote: Path, tmp_path: Path):
+    datastream = tmp_path / "ssg-test-ds.xml"
+    datastream.write_text("<Benchmark/>\n")
+    digest = hashlib.sha256(datastream.read_bytes()).hexdigest()
+    endpoint = SSHEndpoint("web-1", user="root")
+    seen = []
+
+    async def on_result(rule_id: str, result: str) -> None:
+        seen.append((rule_id, result))
+
+    async def scan(name: str) -> Path:
+        output = tmp_path / name
+        await remote_scan.run_remote_scan(
+            endpoint, "xccdf_profile", str(datastream), output, on_result=on_result
+        )
+        return output
+
+    first = asyncio.run(scan("first.xml"))
+    second = asyncio.run(scan("second.xml"))
+
+    assert first.read_text() == second.read_text() == "<Benchmark/>\n"
+    assert (remote / digest / "ssg-test-ds.xml").read_text() == "<Benchmark/>\n"
+    assert _uploads(tmp_path) == 1
+    assert seen == [("rule_a", "pass"), ("rule_b", "fail")] * 2
+    # Per-run work directories are removed on the target
+    assert not any((remote / "runs").iterdir())
+
+
+def test_changed_or_corrupt_datastream_is_uploaded_again(remote: Path, tmp_path: Path):
+    datastream = tmp_path / "ds.xml"
+    datastream.write_text("<v1/>")
+    endpoint = SSHEndpoint("web-1")
+
+    async def ensure() -> str:
+        return await remote_scan.ensure_remote_datastream(endpoint, str(datastream))
+
+    first = asyncio.run(ensure())
+    Path(first).write_text("corrupted")
+    assert asyncio.run(ensure()) == first
+    assert Path(first).read_text() == "<v1/>"
+
+    datastream.write_text("<v2/>")
+    os.utime(datastream, ns=(0, 1))  # force a fresh fingerprint
+    second = asyncio.run(ensure())
+    assert second != first
+    assert Path(second).read_text() == "<v2/>"
+    assert _uploads(tmp_path) == 3
+
+
+def test_tailoring_file_is_sent_to_target(remote: Path, tmp_path: Path):
+    datastream = tmp_path / "ds.xml"
+    datastream.write_text("<ds/>")
+    tailoring = tmp_path / "tailoring.xml"
+    tailoring.write_text("<Tailoring/>")
+    output = tmp_path / "out.xml"
+
+    asyncio.run(
+        remote_scan.run_remote_scan(
+            SSHEndpoint("web-1"), "reaudit", str(datastream), output,
+            tailoring_path=tailoring,
+        )
+    )
+    assert output.read_text() == "<ds/><Tailoring/>"
+
+
+def test_timed_out_scan_is_killed_on_the_target(remote: Path, tmp_path: Path):
+    import subprocess
+
+    # Like a real remote oscap, it is outside the local ssh process group
+    # and does not hold the local pipes
+    _executable(
+        tmp_path / "bin" / "oscap",
+        f"#!/bin/sh\nexec setsid {sys.executable} -c 'import time; time.sleep(60)' \"$@\""
+        " </dev/null >/dev/null 2>&1\n",
+    )
+    datastream = tmp_path / "ds.xml"
+    datastream.write_text("<ds/>")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(
+            remote_scan.run_remote_scan(
+                SSHEndpoint("web-1"), "stig", str(datastream), tmp_path / "out.xml",
+                timeout=1,
+            )
+        )
+
+    leftover = subprocess.run(
+        ["pgrep", "-f", f"{remote}/runs/.*/results.xml"], capture_output=True
+    )
+    assert leftover.stdout == b""
+    assert "pkill -KILL -f" in (tmp_path / "ssh.log").read_text()
+
+
+def test_latency_reported_to_scheduler_excludes_datastream_upload(
+    monkeypatch, remote: Path, tmp_path: Path
+):
+    from services import audit
+    from services.scheduler import Lease
+
+    real_upload = remote_scan.ensure_remote_datastream
+
+    async def slow_upload(endpoint, xccdf_path):
+        await asyncio.sleep(1.5)
+        return await real_upload(endpoint, xccdf_path)
+
+    monkeypatch.setattr(remote_scan, "ensure_remote_datastream", slow_upload)
+    datastream = tmp_path / "ds.xml"
+    datastream.write_text("<ds/>")
+    lease = Lease()
+    progress = audit._ProgressReporter(1, "web-1", 2, lease)
+
+    asyncio.run(
+        remote_scan.run_remote_scan(
+            SSHEndpoint("web-1"), "stig", str(datastream), tmp_path / "out.xml",
+            on_result=progress, on_start=progress.start,
+        )
+    )
+    assert lease.latency is not None
+    assert lease.latency < 1.5
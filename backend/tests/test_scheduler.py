@@ -0,0 +1,189 @@
+"""Tests for the host concurrency scheduler."""
+
+import asyncio
+
+import pytest
+
+from services.scheduler import (
+    AdaptiveLimit,
+    HostScheduler,
+    ScheduleTarget,
+    targets_for_hosts,
+)
+
+
+def _scheduler(global_limit=2, proxy_limit=0, subnet_limit=0, latency=60.0):
+    return HostScheduler(global_limit, proxy_limit, subnet_limit, latency)
+
+
+def test_slots_go_to_the_job_holding_the_fewest():
+    scheduler = _scheduler(global_limit=2)
+    order = []
+
+    async def work(job, host, release):
+        async with scheduler.slot(job, [ScheduleTarget(host)]):
+            order.append((job, host))
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(work("big", f"b{i}", release)) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(work("small", "s0", release)))
+        await asyncio.sleep(0)
+        assert order == [("big", "b0"), ("big", "b1")]
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    # The small job is served before the rest of the big one
+    assert order[2] == ("small", "s0")
+
+
+def test_proxy_limit_caps_hosts_behind_one_bastion():
+    scheduler = _scheduler(global_limit=10, proxy_limit=2)
+    running = peak = 0
+
+    async def work(host, proxy):
+        nonlocal running, peak
+        async with scheduler.slot("job", [ScheduleTarget(host, proxy_jump=proxy)]):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def run():
+        await asyncio.gather(*[work(f"h{i}", "bastion") for i in range(6)])
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_connection_failures_shrink_group_limit_and_successes_grow_it():
+    scheduler = _scheduler(global_limit=10, proxy_limit=8)
+    target = ScheduleTarget("h1", proxy_jump="bastion")
+
+    async def fail(exc):
+        async with scheduler.slot("job", [target]):
+            raise exc
+
+    async def succeed(latency):
+        async with scheduler.slot("job", [target]) as lease:
+            lease.observe_latency(latency)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(fail(ConnectionError("refused")))
+    limit = scheduler.group_limit(("proxy", "bastion"))
+    assert limit.limit == 2
+
+    # A scan that times out after connecting is not the bastion's fault
+    with pytest.raises(TimeoutError):
+        asyncio.run(fail(TimeoutError()))
+    assert limit.limit == 2
+
+    asyncio.run(succeed(latency=120.0))  # slow start counts as congestion
+    assert limit.limit == 1
+
+    for _ in range(3):
+        asyncio.run(succeed(latency=1.0))
+    assert limit.limit == 2
+
+
+def test_oversized_request_runs_when_idle():
+    scheduler = _scheduler(global_limit=2)
+    targets = [ScheduleTarget(f"h{i}") for i in range(5)]
+
+    async def run():
+        async with scheduler.slot("mitigate", targets):
+            return True
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=1))
+
+
+def test_oversized_request_at_the_head_stops_backfill():
+    scheduler = _scheduler(global_limit=2)
+    order = []
+
+    async def work(job, hosts, release):
+        async with scheduler.slot(job, [ScheduleTarget(h) for h in hosts]):
+            order.append(job)
+            await release.wait()
+
+    async def run():
+        first, second = asyncio.Event(), asyncio.Event()
+        held = [
+            asyncio.create_task(work("audit", ["a0"], first)),
+            asyncio.create_task(work("audit", ["a1"], second)),
+        ]
+        await asyncio.sleep(0)
+        mitigate = asyncio.create_task(work("mitigate", ["m0", "m1", "m2"], asyncio.Event()))
+        await asyncio.sleep(0)
+        late = asyncio.create_task(work("late", ["l0"], asyncio.Event()))
+        await asyncio.sleep(0)
+
+        first.set()
+        await held[0]
+        # The freed slot is kept for the oversized request, not backfilled
+        assert order == ["audit", "audit"]
+        second.set()
+        await held[1]
+        await asyncio.sleep(0)
+        assert order == ["audit", "audit", "mitigate"]
+        assert not late.done()
+        mitigate.cancel()
+        late.cancel()
+        await asyncio.gather(mitigate, late, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(run(), timeout=1))
+
+
+def test_cancelled_waiter_is_removed_from_queue():
+    scheduler = _scheduler(global_limit=1)
+
+    async def run():
+        hold = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("a", [ScheduleTarget("h1")]):
+                await hold.wait()
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        hold.set()
+        await first
+
+    asyncio.run(run())
+    assert scheduler._running == 0
+    assert not scheduler._waiters
+
+
+def test_adaptive_limit_bounds():
+    limit = AdaptiveLimit(ceiling=4)
+    for _ in range(10):
+        limit.decrease()
+    assert limit.limit == 1
+    for _ in range(100):
+        limit.increase()
+    assert limit.limit == 4
+
+
+def test_targets_for_hosts_resolves_proxy_and_subnet():
+    from db import get_session
+    from models.host import Host
+
+    with get_session() as session:
+        session.add(Host(alias="sched-web", hostname="10.20.30.40", proxy_jump="jump-1"))
+        session.commit()
+
+    by_host = {t.host: t for t in targets_for_hosts(["sched-web", "10.9.8.7", "unknown"])}
+
+    assert by_host["sched-web"].proxy_jump == "jump-1"
+    assert by_host["sched-web"].subnet == "10.20.30.0/24"
+    assert by_host["10.9.8.7"].subnet == "10.9.8.0/24"
+    assert by_host["unknown"].groups == (("direct", ""),)
@@ -0,0 +1,113 @@
+"""Tests for the pooled SSH (ControlMaster) layer."""
+
+import asyncio
+import os
+import shlex
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+from services.oscap_runner import build_oscap_command, oscap_ssh_env
+from services.ssh_pool import SSHConnectionPool, SSHEndpoint
+
+FAKE_SSH = Path(__file__).with_name("fake_ssh.py")
+
+
+@pytest.fixture
+def fake_ssh(monkeypatch, tmp_path: Path) -> Path:
+    """Executable ``ssh`` wrapper around fake_ssh.py; returns its log file."""
+    log = tmp_path / "ssh.log"
+    log.touch()
+    wrapper = tmp_path / "ssh"
+    wrapper.write_text(f"#!/bin/sh\nexec {sys.executable} {FAKE_SSH} \"$@\"\n")
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("FAKE_SSH_LOG", str(log))
+    return wrapper
+
+
+def _calls(fake_ssh: Path) -> list:
+    log = Path(os.environ["FAKE_SSH_LOG"])
+    return log.read_text().splitlines()
+
+
+def test_master_is_started_once_and_reused(fake_ssh, tmp_path: Path):
+    pool = SSHConnectionPool(tmp_path / "cm", idle_timeout=300, ssh_binary=str(fake_ssh))
+    endpoint = SSHEndpoint("10.0.0.5", user="root", identity_file="/k", proxy_jump="bastion")
+
+    async def run():
+        for _ in range(3):
+            returncode, _, _ = await pool.run(endpoint, "true")
+            assert returncode == 0
+
+    asyncio.run(run())
+
+    calls = _calls(fake_ssh)
+    masters = [c for c in calls if "ControlMaster=yes" in c]
+    assert len(masters) == 1
+    assert "-J bastion" in masters[0] and "-i /k" in masters[0]
+    sessions = [c for c in calls if c.endswith("root@10.0.0.5 true")]
+    assert len(sessions) == 3
+    assert all("ControlMaster=no" in c for c in sessions)
+
+
+def test_dead_master_is_replaced(fake_ssh, tmp_path: Path):
+    pool = SSHConnectionPool(tmp_path / "cm", idle_timeout=300, ssh_binary=str(fake_ssh))
+    endpoint = SSHEndpoint("web-1")
+
+    async def run():
+        await pool.ensure(endpoint)
+        pool.control_path(endpoint).unlink()  # master died
+        await pool.ensure(endpoint)
+
+    asyncio.run(run())
+    assert sum("ControlMaster=yes" in c for c in _calls(fake_ssh)) == 2
+
+
+def test_unreachable_host_raises_connection_error(fake_ssh, tmp_path: Path):
+    pool = SSHConnectionPool(tmp_path / "cm", idle_timeout=300, ssh_binary=str(fake_ssh))
+
+    with pytest.raises(ConnectionError, match="No route to host"):
+        asyncio.run(pool.ensure(SSHEndpoint("unreachable")))
+
+
+def test_idle_masters_are_evicted(fake_ssh, tmp_path: Path):
+    pool = SSHConnectionPool(tmp_path / "cm", idle_timeout=0, ssh_binary=str(fake_ssh))
+    endpoint = SSHEndpoint("web-2")
+
+    async def run():
+        await pool.ensure(endpoint)
+        return await pool.evict_idle()
+
+    assert asyncio.run(run()) == 1
+    assert not pool.control_path(endpoint).exists()
+    assert any("-O exit" in c for c in _calls(fake_ssh))
+
+
+def test_leased_master_is_not_evicted_during_a_long_command(fake_ssh, tmp_path: Path):
+    pool = SSHConnectionPool(tmp_path / "cm", idle_timeout=0, ssh_binary=str(fake_ssh))
+    endpoint = SSHEndpoint("web-3")
+
+    async def run():
+        async with pool.lease(endpoint):
+            scan = await asyncio.create_subprocess_exec(*pool.command(endpoint, "oscap xccdf eval"))
+            # Maintenance runs while the scan is still in flight
+            evicted_during_scan = await pool.evict_idle()
+            master_alive = pool.control_path(endpoint).exists()
+            await scan.wait()
+        return evicted_during_scan, master_alive, await pool.evict_idle()
+
+    assert asyncio.run(run()) == (0, True, 1)
+    assert not pool.control_path(endpoint).exists()
+
+
+def test_oscap_ssh_rides_on_pooled_master(tmp_path: Path):
+    endpoint = SSHEndpoint("10.0.0.5", port=2222, user="admin", identity_file="/k")
+
+    command = build_oscap_command("10.0.0.5", "stig", "ds.xml", tmp_path / "r.xml", endpoint=endpoint)
+    options = shlex.split(oscap_ssh_env(endpoint)["SSH_ADDITIONAL_OPTIONS"])
+
+    assert command[:3] == ["oscap-ssh", "admin@10.0.0.5", "2222"]
+    assert "-i" in options and "/k" in options
+    assert any(opt.startswith("ControlPath=") for opt in options)
@@ -0,0 +1,268 @@
+"""Tests for the audit task queue and the standalone worker."""
+
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql
+from sqlmodel import func, select
+
+from core.config import settings
+from db import get_session
+from models.host import Host
+from models.job import AuditJob, AuditTask
+from models.scan import ScanResult
+from services import audit, task_queue
+from services.artifacts import ArtifactStore
+from services.worker import AuditWorker
+
+_RESULTS_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2" id="xccdf_bench">
+  <TestResult id="xccdf_result">
+    <rule-result idref="xccdf_rule_one" severity="high"><result>pass</result></rule-result>
+    <rule-result idref="xccdf_rule_two" severity="low"><result>fail</result></rule-result>
+  </TestResult>
+</Benchmark>
+"""
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    session = get_session()
+    with session:
+        session.execute(delete(AuditTask))
+        session.commit()
+
+
+def _job(hosts) -> int:
+    job_id = audit.create_audit_job(hosts, "rhel9", "stig")
+    task_queue.enqueue_audit_tasks(job_id, hosts, "rhel9", "stig", "/ds.xml")
+    return job_id
+
+
+def _job_status(job_id: int) -> str:
+    session = get_session()
+    with session:
+        return session.get(AuditJob, job_id).status
+
+
+def test_claim_uses_skip_locked_on_postgres():
+    sql = str(task_queue.claim_statement().compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_each_task_is_claimed_by_one_worker():
+    job_id = _job(["q-1", "q-2", "q-3"])
+
+    claimed = [task_queue.claim_task(f"worker-{i}") for i in range(4)]
+
+    assert sorted(task.host for task in claimed[:3]) == ["q-1", "q-2", "q-3"]
+    assert claimed[3] is None
+    assert {task.worker_id for task in claimed[:3]} == {"worker-0", "worker-1", "worker-2"}
+    assert all(task.attempts == 1 for task in claimed[:3])
+    assert _job_status(job_id) == "running"
+
+
+def test_stale_tasks_are_requeued_then_failed():
+    _job(["stale-host"])
+    task = task_queue.claim_task("dead-worker")
+    session = get_session()
+    with session:
+        row = session.get(AuditTask, task.id)
+        row.heartbeat_at = datetime.utcnow() - timedelta(minutes=10)
+        session.add(row)
+        session.commit()
+
+    assert task_queue.requeue_stale_tasks(timeout=60, max_attempts=2) == 1
+    # The dead worker has lost the task and may not finish it any more
+    assert task_queue.heartbeat("dead-worker", [task.id]) == {task.id}
+    assert not task_queue.finish_task(task.id, "dead-worker", "completed")
+
+    again = task_queue.claim_task("worker-b")
+    assert again.id == task.id and again.attempts == 2
+    session = get_session()
+    with session:
+        row = session.get(AuditTask, task.id)
+        row.heartbeat_at = datetime.utcnow() - timedelta(minutes=10)
+        session.add(row)
+        session.commit()
+    task_queue.requeue_stale_tasks(timeout=60, max_attempts=2)
+    session = get_session()
+    with session:
+        assert session.get(AuditTask, task.id).status == "failed"
+        scans = session.exec(
+            select(ScanResult.status, ScanResult.error).where(
+                ScanResult.audit_job_id == task.audit_job_id,
+                ScanResult.host_id == task.host_id,
+            )
+        ).all()
+    assert scans == [("error", "worker stopped responding")]
+
+
+def test_worker_scans_queued_hosts_and_monitor_completes_job(monkeypatch, tmp_path: Path):
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_RESULTS_XML)
+    scanned = []
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        scanned.append(host)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(_RESULTS_XML)
+
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "artifact_store", ArtifactStore(tmp_path / "scan_results"))
+    monkeypatch.setattr(settings, "audit_dispatch", "queue")
+
+    job_id = audit.submit_audit(
+        ["worker-host-1", "worker-host-2"], "rhel9", "stig", str(benchmark_path)
+    )
+    assert _job_status(job_id) == "queued"
+    monitor = task_queue.TaskMonitor()
+    assert monitor._poll() == []
+
+    async def run_worker():
+        worker = AuditWorker("w-1", concurrency=2, poll_interval=0.05, heartbeat_interval=1)
+        stop = asyncio.Event()
+        runner = asyncio.create_task(worker.run(stop))
+        while task_queue.refresh_job_status(job_id) is None:
+            await asyncio.sleep(0.05)
+        stop.set()
+        await runner
+
+    asyncio.run(asyncio.wait_for(run_worker(), 30))
+
+    assert sorted(scanned) == ["worker-host-1", "worker-host-2"]
+    assert _job_status(job_id) == "completed"
+    results = audit.load_audit_results(job_id)
+    assert sorted(r.host for r in results.results) == ["worker-host-1", "worker-host-2"]
+
+
+def test_monitor_reports_host_completions_and_job_status(monkeypatch, tmp_path: Path):
+    job_id = _job(["mon-1", "mon-2"])
+    monitor = task_queue.TaskMonitor()
+    first = task_queue.claim_task("w")
+    second = task_queue.claim_task("w")
+
+    assert monitor._poll() == [(job_id, {"event": "audit.job", "status": "running"})]
+
+    task_queue.finish_task(first.id, "w", "failed", "boom")
+    assert monitor._poll() == [
+        (job_id, {"event": "audit.error", "host": first.host, "status": "error", "error": "boom"})
+    ]
+    task_queue.finish_task(second.id, "w", "completed")
+    events = monitor._poll()
+    assert events[-1] == (
+        job_id,
+        {"event": "audit.job", "status": "partial", "error": "one or more hosts were not scanned"},
+    )
+    assert _job_status(job_id) == "partial"
+
+
+def test_monitor_matches_hosts_queued_by_alias_or_ip(monkeypatch, tmp_path: Path):
+    session = get_session()
+    with session:
+        session.add(Host(alias="alias-short", hostname="alias-long.example.com"))
+        session.add(Host(hostname="ip-host.example.com", ip_address="192.0.2.14"))
+        session.commit()
+    benchmark_path = tmp_path / "ds.xml"
+    benchmark_path.write_text(_RESULTS_XML)
+
+    async def fake_eval(host, profile_name, xccdf_path, output_path, **kwargs):
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(_RESULTS_XML)
+
+    monkeypatch.setattr(audit, "_run_oscap_eval", fake_eval)
+    monkeypatch.setattr(audit, "artifact_store", ArtifactStore(tmp_path / "scan_results"))
+    job_id = _job(["alias-short", "192.0.2.14"])
+    monitor = task_queue.TaskMonitor()
+    monitor._poll()
+
+    for _ in range(2):
+        task = task_queue.claim_task("w")
+        asyncio.run(
+            audit.audit_host(task.host, "rhel9", "stig", str(benchmark_path), job_id)
+        )
+        task_queue.finish_task(task.id, "w", "completed")
+
+    completed = sorted(
+        event["host"] for _, event in monitor._poll() if event["event"] == "audit.complete"
+    )
+    assert completed == ["192.0.2.14", "alias-short"]
+    session = get_session()
+    with session:
+        assert session.exec(select(func.count(Host.id)).where(
+            Host.hostname.in_(["alias-short", "192.0.2.14"])
+        )).one() == 0
+
+
+def _host_scans(job_id: int):
+    session = get_session()
+    with session:
+        return session.exec(
+            select(Host.hostname, ScanResult.status)
+            .join(Host, Host.id == ScanResult.host_id)
+            .where(ScanResult.audit_job_id == job_id)
+            .order_by(Host.hostname)
+        ).all()
+
+
+def test_tasks_past_the_job_deadline_time_out(monkeypatch):
+    monkeypatch.setattr(settings, "audit_job_timeout", 60)
+    job_id = _job(["late-1", "late-2"])
+    running = task_queue.claim_task("w")
+    monitor = task_queue.TaskMonitor()
+    monitor._poll()
+    session = get_session()
+    with session:
+        job = session.get(AuditJob, job_id)
+        job.created_at = datetime.utcnow() - timedelta(minutes=5)
+        session.add(job)
+        session.commit()
+
+    events = monitor._poll()
+
+    assert _host_scans(job_id) == [("late-1", "timeout"), ("late-2", "timeout")]
+    # The worker loses the running host on its next heartbeat
+    assert task_queue.heartbeat("w", [running.id]) == {running.id}
+    assert events[-1][1]["status"] == "failed"
+    assert _job_status(job_id) == "failed"
+
+
+def test_monitor_requeues_unreachable_hosts_for_straggler_rounds(monkeypatch):
+    monkeypatch.setattr(settings, "audit_straggler_retries", 1)
+    job_id = _job(["retry-ok", "retry-down"])
+    monitor = task_queue.TaskMonitor()
+    ok, down = task_queue.claim_task("w"), task_queue.claim_task("w")
+    task_queue.finish_task(ok.id, "w", "completed")
+    assert task_queue.fail_task(down.id, "w", "unreachable", "no route to host")
+
+    events = monitor._poll()
+
+    assert (job_id, {"event": "audit.retry", "hosts": ["retry-down"]}) in events
+    assert _job_status(job_id) == "running"
+    # The failed scan is dropped until the retry records a new outcome
+    assert _host_scans(job_id) == []
+    again = task_queue.claim_task("w")
+    assert (again.id, again.retries, again.attempts) == (down.id, 1, 1)
+
+    task_queue.fail_task(again.id, "w", "unreachable", "no route to host")
+    events = monitor._poll()
+
+    assert (job_id, {
+        "event": "audit.error", "host": "retry-down", "status": "unreachable",
+        "error": "no route to host",
+    }) in events
+    assert _job_status(job_id) == "partial"
+    assert _host_scans(job_id) == [("retry-down", "unreachable")]
+
+
+def test_cancel_marks_queued_tasks_and_signals_workers():
+    job_id = _job(["c-1", "c-2"])
+    running = task_queue.claim_task("w")
+
+    assert audit.cancel_audit(job_id)
+    assert task_queue.heartbeat("w", [running.id]) == {running.id}
+    assert task_queue.refresh_job_status(job_id) == "cancelled"
+    assert not audit.cancel_audit(job_id)
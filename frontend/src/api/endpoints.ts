@@ -25,8 +25,13 @@ export const runAudit = (payload: {
   distro: string;
   profile_name: string;
   profile_path: string;
+  mode?: "full" | "reaudit";
+  rule_ids?: string[];
 }) => client.post("/api/audit", payload);
 
+export const auditResults = (jobId: number, format: "full" | "compact" = "full") =>
+  client.get(`/api/audit/results/${jobId}`, { params: { format } });
+
 export const auditHistory = () => client.get("/api/audit/history");
 
 // ---- Mitigate ----
@@ -66,9 +71,22 @@ export const testHostConnection = (payload: {
 
 // ---- Dashboard ----
 
+export const dashboard = (
+  range: "30d" | "90d" | "1y" = "30d",
+  groupBy?: "distro" | "profile" | "host_group"
+) =>
+  client.get("/api/dashboard", {
+    params: { range, ...(groupBy ? { group_by: groupBy } : {}) },
+  });
 export const dashboardSummary = () => client.get("/api/dashboard/summary");
 export const dashboardSeverity = () =>
   client.get("/api/dashboard/severity-breakdown");
 export const dashboardTopFailures = () =>
   client.get("/api/dashboard/top-failures");
-export const dashboardTimeline = () => client.get("/api/dashboard/timeline");
+export const dashboardTimeline = (
+  range: "30d" | "90d" | "1y" = "30d",
+  groupBy?: "distro" | "profile" | "host_group"
+) =>
+  client.get("/api/dashboard/timeline", {
+    params: { range, ...(groupBy ? { group_by: groupBy } : {}) },
+  });
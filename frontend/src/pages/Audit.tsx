@@ -7,6 +7,7 @@ import {
   Chip,
   CircularProgress,
   Grid,
+  LinearProgress,
   MenuItem,
   TextField,
   Typography,
@@ -15,11 +16,13 @@ import { GridColDef } from "@mui/x-data-grid";
 
 import {
   runAudit,
+  auditResults,
   getCacDistros,
   getCacProfiles,
   listHosts,
 } from "../api/endpoints";
 import ReportDataGrid from "../components/ReportDataGrid";
+import useWebSocket from "../hooks/useWebSocket";
 
 interface HostOption {
   id: number;
@@ -56,6 +59,12 @@ export default function Audit() {
   const [rows, setRows] = useState<Record<string, unknown>[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  const [jobId, setJobId] = useState<number | null>(null);
+
+  const wsUrl = jobId
+    ? `${window.location.protocol === "https:" ? "wss:" : "ws:"}//${window.location.host}/ws/audit/${jobId}`
+    : "";
+  const { messages } = useWebSocket(wsUrl);
 
   // Load host list + distro list on mount
   useEffect(() => {
@@ -87,7 +96,7 @@ export default function Audit() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [distro]);
 
-  const checkAndSubmit = async () => {
+  const checkAndSubmit = async (mode: "full" | "reaudit" = "full") => {
     setError("");
 
     if (!selectedHosts.length) {
@@ -99,39 +108,95 @@ export default function Audit() {
       return;
     }
 
-    return handleSubmit();
+    return handleSubmit(mode);
   };
 
-  const handleSubmit = async () => {
+  // Audits run in the background; load results once the job finishes
+  useEffect(() => {
+    if (!jobId) return;
+    const finished = messages.find(
+      (msg) =>
+        msg.event === "audit.job" &&
+        (msg.status === "completed" ||
+          msg.status === "partial" ||
+          msg.status === "failed" ||
+          msg.status === "cancelled")
+    );
+    if (!finished) return;
+    if (finished.status === "failed") {
+      setError(`Audit failed: ${String(finished.error ?? "unknown error")}`);
+    } else if (finished.status === "cancelled") {
+      setError("Audit was cancelled.");
+    }
+    // Compact format: rule text once, then [rule index, status index] per host
+    auditResults(jobId, "compact")
+      .then((response) => {
+        const data = response.data as {
+          statuses: string[];
+          rules: { rule_id: string; severity: string }[];
+          results: {
+            host: string;
+            status: string;
+            error: string;
+            results: [number, number][];
+          }[];
+        };
+        const unscanned = data.results.filter((result) => result.status !== "completed");
+        if (unscanned.length && finished.status !== "cancelled") {
+          setError(
+            `Not scanned: ${unscanned
+              .map((result) => `${result.host} (${result.status})`)
+              .join(", ")}`
+          );
+        }
+        const flattened = data.results.flatMap((result) =>
+          result.results.map(([ruleIndex, statusIndex]) => {
+            const rule = data.rules[ruleIndex];
+            return {
+              id: `${result.host}-${rule.rule_id}`,
+              host: result.host,
+              rule_id: rule.rule_id,
+              severity: rule.severity,
+              status: data.statuses[statusIndex],
+            };
+          })
+        );
+        setRows(flattened);
+      })
+      .catch((err: unknown) => {
+        const msg = err instanceof Error ? err.message : String(err);
+        setError(`Loading results failed: ${msg}`);
+      })
+      .finally(() => setLoading(false));
+  }, [jobId, messages]);
+
+  // Latest per-rule progress for each host while the scan runs
+  const progress = new Map<string, { done: number; total: number }>();
+  for (const msg of messages) {
+    if (msg.event === "audit.progress") {
+      progress.set(String(msg.host), {
+        done: Number(msg.done),
+        total: Number(msg.total),
+      });
+    }
+  }
+
+  const handleSubmit = async (mode: "full" | "reaudit") => {
     setLoading(true);
     setError("");
+    setRows([]);
     try {
       const response = await runAudit({
         hosts: selectedHosts.map((h) => h.hostname),
         distro,
         profile_name: profileName,
         profile_path: profilePath,
+        mode,
       });
-      const data = response.data as {
-        results: {
-          host: string;
-          rules: { rule_id: string; severity: string; status: string }[];
-        }[];
-      };
-      const flattened = data.results.flatMap((result) =>
-        result.rules.map((rule) => ({
-          id: `${result.host}-${rule.rule_id}`,
-          host: result.host,
-          rule_id: rule.rule_id,
-          severity: rule.severity,
-          status: rule.status,
-        }))
-      );
-      setRows(flattened);
+      setJobId(response.data.job_id);
     } catch (err: unknown) {
       const msg = err instanceof Error ? err.message : String(err);
       setError(`Audit failed: ${msg}`);
-    } finally {
       setLoading(false);
     }
   };
@@ -242,10 +307,10 @@ export default function Audit() {
           />
         </Grid>
 
-        <Grid size={{ xs: 12, md: 1 }} sx={{ display: "flex", alignItems: "center" }}>
+        <Grid size={{ xs: 12, md: 1 }} sx={{ display: "flex", alignItems: "center", gap: 1 }}>
           <Button
             variant="contained"
-            onClick={checkAndSubmit}
+            onClick={() => checkAndSubmit("full")}
             disabled={loading}
             startIcon={
               loading ? <CircularProgress size={16} /> : undefined
@@ -253,9 +318,31 @@ export default function Audit() {
           >
             Run
           </Button>
+          <Button
+            variant="outlined"
+            onClick={() => checkAndSubmit("reaudit")}
+            disabled={loading}
+            title="Re-check only the rules that failed in each host's latest scan"
+          >
+            Re-audit
+          </Button>
         </Grid>
       </Grid>
 
+      {loading &&
+        Array.from(progress.entries()).map(([host, { done, total }]) => (
+          <Box key={host} sx={{ mb: 1 }}>
+            <Typography variant="body2">
+              {host}: {done}
+              {total ? ` / ${total}` : ""} rules
+            </Typography>
+            <LinearProgress
+              variant={total ? "determinate" : "indeterminate"}
+              value={total ? Math.min(100, (done / total) * 100) : undefined}
+            />
+          </Box>
+        ))}
+
       <ReportDataGrid rows={rows} columns={columns} />
     </Box>
   );
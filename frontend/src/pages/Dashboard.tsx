@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Alert, Grid, Typography } from "@mui/material";
 
 import ComplianceGauge from "../components/ComplianceGauge";
@@ -6,12 +6,14 @@ import SeverityPie from "../components/SeverityPie";
 import TopFailsTable from "../components/TopFailsTable";
 import TimelineChart from "../components/TimelineChart";
 import HostMatrix from "../components/HostMatrix";
-import {
-  dashboardSeverity,
-  dashboardSummary,
-  dashboardTimeline,
-  dashboardTopFailures,
-} from "../api/endpoints";
+import useWebSocket from "../hooks/useWebSocket";
+
+const toTopFail = (item: { rule_id: string; title: string; count: number }) => ({
+  id: item.rule_id,
+  title: item.title || item.rule_id,
+  failures: item.count,
+  trend: [item.count],
+});
 
 export default function Dashboard() {
   const [summary, setSummary] = useState({
@@ -31,35 +33,57 @@ export default function Dashboard() {
     { id: string; title: string; failures: number; trend: number[] }[]
   >([]);
 
+  const applySnapshot = (data: any) => {
+    setSummary(data.summary);
+    setSeverity(data.severity_breakdown);
+    setTimeline(
+      data.timeline.map((item: { date: string; score: number }) => ({
+        time: item.date,
+        score: item.score,
+      }))
+    );
+    setTopFails(data.top_failures.map(toTopFail));
+  };
+
+  // The page loads from the snapshot sent on connect (and on every
+  // reconnect), then applies one delta per stored scan
+  const { messages } = useWebSocket(
+    `${window.location.protocol === "https:" ? "wss:" : "ws:"}//${window.location.host}/ws/dashboard`
+  );
+  const applied = useRef(0);
   useEffect(() => {
-    const load = async () => {
-      const [summaryRes, severityRes, timelineRes, topRes] = await Promise.all([
-        dashboardSummary(),
-        dashboardSeverity(),
-        dashboardTimeline(),
-        dashboardTopFailures(),
-      ]);
-      setSummary(summaryRes.data);
-      setSeverity(severityRes.data);
-      setTimeline(
-        timelineRes.data.map((item: { date: string; score: number }) => ({
-          time: item.date,
-          score: item.score,
-        }))
-      );
-      setTopFails(
-        topRes.data.map(
-          (item: { rule_id: string; title: string; count: number }) => ({
-            id: item.rule_id,
-            title: item.title || item.rule_id,
-            failures: item.count,
-            trend: [item.count],
-          })
-        )
-      );
-    };
-    load();
-  }, []);
+    for (const message of messages.slice(applied.current) as any[]) {
+      if (message.event === "dashboard.snapshot") {
+        applySnapshot(message);
+      } else if (message.event === "dashboard.delta") {
+        if (message.summary) {
+          setSummary((prev) => ({ ...prev, ...message.summary }));
+        }
+        if (message.severity_breakdown) {
+          setSeverity((prev) => ({ ...prev, ...message.severity_breakdown }));
+        }
+        if (message.top_failures) {
+          const { size, ranks } = message.top_failures;
+          setTopFails((prev) => {
+            const next = prev.slice(0, size);
+            for (const entry of ranks) {
+              next[entry.rank - 1] = toTopFail(entry);
+            }
+            return next;
+          });
+        }
+        if (message.timeline) {
+          const point = { time: message.timeline.date, score: message.timeline.score };
+          setTimeline((prev) =>
+            prev.length && prev[prev.length - 1].time === point.time
+              ? [...prev.slice(0, -1), point]
+              : [...prev.slice(1), point]
+          );
+        }
+      }
+    }
+    applied.current = messages.length;
+  }, [messages]);
 
   const severityData = [
     { name: "High", value: severity.high },